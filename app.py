@@ -1,5 +1,6 @@
 import logging
 import pandas as pd
+import psycopg2
 import streamlit as st
 
 logging.basicConfig(
@@ -9,28 +10,33 @@ logging.basicConfig(
 _log = logging.getLogger(__name__)
 
 from data.database import (
-    init_db,
+    ConnectionPool,
     archivo_ya_procesado,
-    registrar_archivo_procesado,
-    insertar_transacciones,
+    estados_cargados,
     fetch_transacciones,
-    update_clasificacion,
-    marcar_fact_kame,
-    upsert_estado_cuenta,
+    fetch_transacciones_pagina,
+    contar_transacciones,
+    fetch_resumen_tipo_gasto,
+    guardar_clasificacion,
     fetch_estados_cuenta,
     marcar_traspaso,
+    marcar_traspasos,
     desmarcar_traspaso,
+    version_conciliacion,
     fetch_traspaso_nacional_disponibles,
     fetch_estados_intl_pendientes,
     fetch_traspaso_suggestions,
     auto_match_traspasos,
     reset_db,
+    reconstruir_resumen,
+    verificar_resumen,
     fetch_tipo_gasto_map,
-    auto_tipo_gasto,
-    propagar_clasificacion,
 )
-from data.extractor_nacional import leer_cartola_nacional
-from data.extractor_internacional import leer_cartola_internacional
+from data.cache_extraccion import CacheExtraccion
+from data.conciliacion import proponer_asignacion
+from data.migraciones import VERSION_ACTUAL, reintentar_trgm, version_esquema
+from data.deteccion import detectar_cartola
+from data.ingest import EXTRACTORES, default_workers, extractor_para, extraer_lote, guardar_extraccion
 from dashboard import show_dashboard
 
 # ============================================================
@@ -54,33 +60,23 @@ TIPO_GASTO_OPTIONS_INTL = [
 ]
 
 # ============================================================
-# DB connection — cached for the lifetime of the server process
+# DB connection pool — cached for the lifetime of the server process.
+# Each script run checks out its own connection, so a slow query in
+# one session no longer blocks the others.
 # ============================================================
 @st.cache_resource
-def get_conn():
+def get_pool() -> ConnectionPool:
     db_url = st.secrets.get("supabase_db_url") or st.secrets.get("SUPABASE_DB_URL")
     if not db_url:
         st.error("Falta `supabase_db_url` en los secrets. Configúrala en .streamlit/secrets.toml")
         st.stop()
-    conn = init_db(db_url)
+    pool = ConnectionPool(
+        str(db_url),
+        minconn=int(st.secrets.get("db_pool_min", 1)),
+        maxconn=int(st.secrets.get("db_pool_max", 5)),
+    )
     _log.info("Connected to PostgreSQL")
-    return conn, str(db_url)
-
-
-def _ensure_conn(conn, db_url: str):
-    """Return a live connection, reconnecting if Neon closed the idle connection."""
-    try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT 1")
-        return conn
-    except Exception:
-        _log.warning("Connection lost, reconnecting...")
-        try:
-            conn.close()
-        except Exception:
-            pass
-        st.cache_resource.clear()
-        return init_db(db_url)
+    return pool
 
 
 # ============================================================
@@ -117,46 +113,185 @@ def require_password() -> None:
 # ============================================================
 # Ingest (upload → DB)
 # ============================================================
-def _ingest(conn, uploaded, extractor, exclude_terms: list[str]) -> None:
+def _ingest_workers() -> int:
+    try:
+        n = int(st.secrets.get("ingest_workers", 0))
+    except (TypeError, ValueError):
+        n = 0
+    return n if n > 0 else default_workers()
+
+
+@st.cache_resource
+def get_extraction_cache() -> CacheExtraccion | None:
+    try:
+        return CacheExtraccion(st.secrets.get("extraction_cache_dir"))
+    except OSError:
+        _log.exception("Extraction cache disabled")
+        return None
+
+
+def _ingest(conn, uploaded, origen: str, exclude_terms: list[str]) -> int:
     ingested = skipped = 0
+    pendientes, origenes, cabeceras = [], [], []
     for f in uploaded:
         if archivo_ya_procesado(conn, f.name):
             st.warning(f"⚠️ **{f.name}** ya fue procesado anteriormente — omitido.")
             skipped += 1
             continue
-
+        data = f.read()
+        # Page-1 sniff: route a file dropped in the wrong tab to the right
+        # extractor, and catch renamed re-uploads before the full parse.
         try:
-            rows, meta = extractor(f.read(), filename=f.name)
-        except Exception as e:
-            _log.exception("PDF extraction failed: %s", f.name)
-            st.error(f"Error leyendo {f.name}: {e}")
-            continue
-
-        if exclude_terms:
-            rows = [
-                r for r in rows
-                if not any(t in r.get("DESCRIPCION", "").lower() for t in exclude_terms)
-            ]
-
-        # Auto-categorize using history + static rules (only fills empty TIPO_GASTO)
-        historic = fetch_tipo_gasto_map(conn)
-        for r in rows:
-            if not r.get("TIPO_GASTO"):
-                r["TIPO_GASTO"] = auto_tipo_gasto(
-                    r.get("DESCRIPCION", ""), historic, origen=r.get("ORIGEN", "")
+            cab = detectar_cartola(data, f.name)
+        except Exception:
+            _log.exception("Sniffing failed: %s", f.name)
+            cab = None
+        if cab is not None and cab["ORIGEN"] != origen:
+            st.info(f"ℹ️ **{f.name}** es un estado {cab['ORIGEN'].lower()} — se procesa como tal.")
+        pendientes.append((f.name, data))
+        origenes.append(cab["ORIGEN"] if cab else origen)
+        cabeceras.append(cab)
+
+    cargados = estados_cargados(conn, [c["ARCHIVO_ORIGEN"] for c in cabeceras if c])
+    if cargados:
+        keep = []
+        for i, cab in enumerate(cabeceras):
+            if cab and cab["ARCHIVO_ORIGEN"] in cargados:
+                st.warning(
+                    f"⚠️ **{pendientes[i][0]}** ya está cargado como "
+                    f"{cab['ARCHIVO_ORIGEN']} — omitido."
                 )
+                skipped += 1
+            else:
+                keep.append(i)
+        pendientes = [pendientes[i] for i in keep]
+        origenes = [origenes[i] for i in keep]
+
+    # Parse in parallel (one batch per extractor); DB writes below stay
+    # sequential and in upload order
+    resultados = [None] * len(pendientes)
+    with st.spinner(f"Procesando {len(pendientes)} PDF(s)..."):
+        for org in EXTRACTORES:
+            idx = [i for i, o in enumerate(origenes) if o == org]
+            lote = extraer_lote(
+                extractor_para(org), [pendientes[i] for i in idx],
+                workers=_ingest_workers(), cache=get_extraction_cache(),
+            )
+            for i, res in zip(idx, lote, strict=True):
+                resultados[i] = res
 
-        if rows:
-            insertar_transacciones(conn, rows)
-            upsert_estado_cuenta(conn, meta)
-            registrar_archivo_procesado(conn, f.name)
-            ingested += 1
-        else:
-            st.warning(f"Sin filas válidas en {f.name}. No se registra como procesado.")
+    # Learned classifications: one lookup per batch, extended as files are stored
+    historic = fetch_tipo_gasto_map(conn) if resultados else {}
+
+    for res in resultados:
+        if not res.ok:
+            st.error(f"Error leyendo {res.nombre}: {res.error}")
+            continue
+
+        guardado = guardar_extraccion(conn, res, historic, exclude_terms)
+        if guardado is None:
+            st.warning(f"Sin filas válidas en {res.nombre}. No se registra como procesado.")
             skipped += 1
+            continue
+        nuevas, repetidas = guardado
+        if repetidas:
+            st.info(
+                f"ℹ️ **{res.nombre}**: {repetidas} fila(s) ya estaban cargadas "
+                f"(¿archivo renombrado?) — omitidas, {nuevas} nueva(s)."
+            )
+        ingested += 1
 
     if ingested:
         st.success(f"✅ {ingested} archivo(s) procesado(s) correctamente.")
+    return ingested
+
+
+# ============================================================
+# Traspaso reconciliation — event-driven, cached on shared state.
+# Auto-matching runs only after an ingest. The pending/available/
+# suggestion lists are cached across sessions, keyed on a DB-side
+# data-version counter (version_conciliacion), so plain widget
+# reruns read one row and any session's ingest, match or undo
+# invalidates every session's lists.
+# ============================================================
+def _reconciliar(conn) -> None:
+    """Auto-match unambiguous traspasos by amount + date."""
+    n = auto_match_traspasos(conn)
+    if n:
+        st.session_state["_auto_match_n"] = n
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _conciliacion(_conn, version: int) -> dict:
+    pend_est = fetch_estados_intl_pendientes(_conn)
+    disponibles = fetch_traspaso_nacional_disponibles(_conn) if pend_est else []
+    suggestions, amb = (
+        fetch_traspaso_suggestions(_conn) if disponibles else ({}, set())
+    )
+    # Ambiguous dates: propose one consistent assignment for all statements
+    propuesta = proponer_asignacion(_conn) if amb else []
+    return {
+        "pend_est": pend_est,
+        "disponibles": disponibles,
+        "suggestions": suggestions,
+        "propuesta": propuesta,
+    }
+
+
+def _estado_conciliacion(conn) -> dict:
+    return _conciliacion(conn, version_conciliacion(conn))
+
+
+def _avisar_conflictos(conflictos) -> None:
+    """Remember skipped pairs for the warning shown after the rerun."""
+    if conflictos:
+        st.session_state["_conflictos_traspaso"] = len(conflictos)
+
+
+# ============================================================
+# Keyset pagination — a stack of (fecha, id) cursors per table
+# ============================================================
+PAGE_SIZE_PENDIENTES = 20
+PAGE_SIZE_KAME = 50
+
+
+def _cursor_pagina(key: str, filtros: tuple):
+    """Cursor for the current page; resets to page 1 when the filters change."""
+    state = st.session_state.get(key)
+    if state is None or state["filtros"] != filtros:
+        state = {"filtros": filtros, "cursores": [None]}
+        st.session_state[key] = state
+    return state["cursores"][-1]
+
+
+def _nav_pagina(key: str, page: pd.DataFrame, total: int, page_size: int) -> None:
+    state = st.session_state[key]
+    n = len(state["cursores"])
+    inicio = (n - 1) * page_size
+    c1, c2, c3 = st.columns([1, 1, 4])
+    c3.caption(f"Filas {inicio + 1}–{inicio + len(page)} de {total}")
+    if c1.button("◀ Anterior", disabled=n == 1, key=f"{key}_prev"):
+        state["cursores"].pop()
+        st.rerun()
+    if c2.button("Siguiente ▶", disabled=inicio + len(page) >= total, key=f"{key}_next"):
+        last = page.iloc[-1]
+        fecha = last["FECHA_OPERACION_DT"]
+        state["cursores"].append((None if pd.isna(fecha) else fecha, int(last["_RID_"])))
+        st.rerun()
+
+
+def _filas_modificadas(original: pd.DataFrame, edited: pd.DataFrame) -> pd.DataFrame:
+    """Rows of `edited` whose TIPO_GASTO or CONCILIADO differ from `original`.
+
+    The editor cannot add/delete rows, so both frames are aligned by position.
+    """
+    o = original.reset_index(drop=True)
+    e = edited.reset_index(drop=True)
+    changed = (
+        o["TIPO_GASTO"].fillna("").astype(str).ne(e["TIPO_GASTO"].fillna("").astype(str))
+        | o["CONCILIADO"].astype(bool).ne(e["CONCILIADO"].astype(bool))
+    )
+    return e[changed]
 
 
 # ============================================================
@@ -164,7 +299,6 @@ def _ingest(conn, uploaded, extractor, exclude_terms: list[str]) -> None:
 # ============================================================
 def render_transactions_page(conn, origen: str) -> None:
     is_intl = origen == "INTERNACIONAL"
-    extractor = leer_cartola_internacional if is_intl else leer_cartola_nacional
 
     st.subheader(f"1) Cargar PDFs — {'Internacional (USD)' if is_intl else 'Nacional (CLP)'}")
     uploaded = st.file_uploader(
@@ -179,24 +313,28 @@ def render_transactions_page(conn, origen: str) -> None:
         sig = tuple(sorted(f.name for f in uploaded))
         if st.session_state.get(f"_sig_{origen}") != sig:
             st.session_state[f"_sig_{origen}"] = sig
-            _ingest(conn, uploaded, extractor, exclude_terms)
-
-    # ---- Load from DB ----
-    cols, rows = fetch_transacciones(conn, origen=origen)
-    df = pd.DataFrame(rows, columns=cols)
+            # New statements of either origin can complete a traspaso chain
+            if _ingest(conn, uploaded, origen, exclude_terms):
+                _reconciliar(conn)
 
     # ---- International: assign CLP cost via national traspaso match ----
     if is_intl:
-        # Learned behaviour: auto-match unambiguous traspasos by amount + date
-        auto_n = auto_match_traspasos(conn)
+        conc = _estado_conciliacion(conn)
+        auto_n = st.session_state.pop("_auto_match_n", 0)
         if auto_n:
             st.toast(f"{auto_n} traspaso(s) emparejado(s) automáticamente.")
-            cols, rows = fetch_transacciones(conn, origen=origen)
-            df = pd.DataFrame(rows, columns=cols)
+        conflictos_n = st.session_state.pop("_conflictos_traspaso", 0)
+        if conflictos_n:
+            st.warning(
+                f"{conflictos_n} asignación(es) omitida(s): el estado o la línea nacional ya "
+                "estaba emparejada, posiblemente desde otra sesión. La lista está actualizada."
+            )
 
-        pend_est    = fetch_estados_intl_pendientes(conn)
-        disponibles = fetch_traspaso_nacional_disponibles(conn)
-        suggestions, _amb = fetch_traspaso_suggestions(conn)
+        pend_est    = conc["pend_est"]
+        disponibles = conc["disponibles"]
+        suggestions = conc["suggestions"]
+        propuesta   = conc["propuesta"]
+        global_por_estado = {p["estado_id"]: p for p in propuesta}
 
         if pend_est:
             st.divider()
@@ -207,6 +345,51 @@ def render_transactions_page(conn, origen: str) -> None:
                     "Sube el estado de cuenta nacional donde aparece el traspaso."
                 )
             else:
+                if propuesta:
+                    with st.expander(
+                        f"🧩 Asignación global propuesta ({len(propuesta)} estado(s))",
+                        expanded=True,
+                    ):
+                        st.dataframe(
+                            pd.DataFrame([
+                                {
+                                    "Estado": p["estado_archivo"],
+                                    "Titular": p["titular"],
+                                    "US$": p["deuda"],
+                                    "Fecha traspaso": p["fecha"],
+                                    "CLP": p["clp"],
+                                    "Tasa": round(p["tasa"], 2),
+                                    "Monto confirmado": "✅" if p["monto_ok"] else "⚠️",
+                                }
+                                for p in propuesta
+                            ]),
+                            hide_index=True,
+                            use_container_width=True,
+                        )
+                        # Only amount-confirmed pairs are applied in bulk; ⚠️ pairs are
+                        # just pre-selected below, to be confirmed one statement at a time.
+                        confirmadas = [p for p in propuesta if p["monto_ok"]]
+                        if len(confirmadas) < len(propuesta):
+                            st.caption(
+                                f"⚠️ {len(propuesta) - len(confirmadas)} par(es) sin monto confirmado "
+                                "no se aplican aquí: revísalos y asígnalos en su estado más abajo."
+                            )
+                        if st.button(
+                            f"✅ Aplicar asignación global ({len(confirmadas)} confirmado(s))",
+                            key="clp_global_btn",
+                            disabled=not confirmadas,
+                        ):
+                            try:
+                                n, conflictos = marcar_traspasos(
+                                    conn, [(p["estado_id"], p["rid"], p["archivo"]) for p in confirmadas]
+                                )
+                                st.success(f"{n} traspaso(s) asignado(s).")
+                                _avisar_conflictos(conflictos)
+                                st.rerun()
+                            except Exception as e:
+                                _log.exception("global traspaso assignment failed")
+                                st.error(f"Error al asignar traspasos: {e}")
+
                 def _fmt_opt(rid, _opts=disponibles):
                     o = next((x for x in _opts if x["rid"] == rid), None)
                     if o is None:
@@ -224,7 +407,7 @@ def render_transactions_page(conn, origen: str) -> None:
                         )
                         # Pre-select the suggested national line (amount + date chain)
                         default_idx = 0
-                        sug = suggestions.get(int(est["id"]))
+                        sug = suggestions.get(int(est["id"])) or global_por_estado.get(int(est["id"]))
                         if sug and sug["rid"] in opt_rids:
                             default_idx = opt_rids.index(sug["rid"])
                         sel = st.selectbox(
@@ -242,8 +425,10 @@ def render_transactions_page(conn, origen: str) -> None:
                             st.caption(f"Tasa resultante: **{tasa:,.2f} CLP/US$**{warn}")
                         if st.button("✅ Asignar costo CLP", key=f"clp_btn_{est['id']}"):
                             try:
-                                marcar_traspaso(conn, int(est["id"]), int(sel), o["archivo"])
-                                st.success("Costo en CLP asignado.")
+                                if marcar_traspaso(conn, int(est["id"]), int(sel), o["archivo"]):
+                                    st.success("Costo en CLP asignado.")
+                                else:
+                                    _avisar_conflictos([(int(est["id"]), int(sel))])
                                 st.rerun()
                             except Exception as e:
                                 _log.exception("marcar_traspaso failed")
@@ -251,25 +436,20 @@ def render_transactions_page(conn, origen: str) -> None:
 
     st.divider()
 
-    if not df.empty:
+    monto_col = "MONTO_OPERACION" if is_intl else "MONTO_TOTAL"
+    cur_label = "US$" if is_intl else "CLP"
+
+    resumen_rows, n_sin_tipo = fetch_resumen_tipo_gasto(conn, origen)
+    if resumen_rows or n_sin_tipo:
         import plotly.express as px
-        monto_col_summary = "MONTO_OPERACION" if is_intl else "MONTO_TOTAL"
-        cur_label = "US$" if is_intl else "CLP"
         st.subheader("2) Resumen por Tipo de Gasto")
-        df_gastos   = df[df[monto_col_summary] > 0].copy()
-        df_con_tipo = df_gastos[df_gastos["TIPO_GASTO"].fillna("") != ""]
-        df_sin_tipo = df_gastos[df_gastos["TIPO_GASTO"].fillna("") == ""]
-
-        if not df_con_tipo.empty:
-            resumen = (
-                df_con_tipo.groupby("TIPO_GASTO")[monto_col_summary]
-                .sum().sort_values().reset_index()
-            )
+        if resumen_rows:
+            resumen = pd.DataFrame(resumen_rows, columns=["TIPO_GASTO", "N", monto_col])
             fmt = (lambda v: f"${v:,.2f}") if is_intl else (lambda v: f"${int(v):,}")
             fig = px.bar(
-                resumen, x=monto_col_summary, y="TIPO_GASTO", orientation="h",
-                text=resumen[monto_col_summary].apply(fmt),
-                labels={monto_col_summary: cur_label, "TIPO_GASTO": ""},
+                resumen, x=monto_col, y="TIPO_GASTO", orientation="h",
+                text=resumen[monto_col].apply(fmt),
+                labels={monto_col: cur_label, "TIPO_GASTO": ""},
             )
             fig.update_traces(textposition="outside")
             fig.update_layout(
@@ -279,22 +459,24 @@ def render_transactions_page(conn, origen: str) -> None:
                 showlegend=False,
             )
             st.plotly_chart(fig, use_container_width=True)
-            if len(df_sin_tipo) > 0:
-                st.caption(f"⚠️ {len(df_sin_tipo)} transacción(es) sin Tipo de Gasto.")
+            if n_sin_tipo > 0:
+                st.caption(f"⚠️ {n_sin_tipo} transacción(es) sin Tipo de Gasto.")
         else:
             st.info("No hay transacciones clasificadas aún.")
 
     st.divider()
     st.subheader("3) Conciliación / Kame")
 
-    if df.empty:
-        st.info("No hay transacciones aún.")
-        return
+    rango = st.date_input("Rango de fechas", value=(), key=f"rango_{origen}")
+    desde = rango[0] if len(rango) > 0 else None
+    hasta = rango[1] if len(rango) > 1 else None
 
-    pending = df[df["FACT_KAME"] == 0].copy()
-    done    = df[df["FACT_KAME"] == 1].copy()
+    n_pending = contar_transacciones(conn, origen, fact_kame=0, desde=desde, hasta=hasta)
+    n_done    = contar_transacciones(conn, origen, fact_kame=1, desde=desde, hasta=hasta)
 
-    monto_col = "MONTO_OPERACION" if is_intl else "MONTO_TOTAL"
+    if not (n_pending or n_done) and desde is None:
+        st.info("No hay transacciones aún.")
+        return
 
     # Columns shown in the editable pending table
     display_cols = ["_RID_", "TITULAR_NOMBRE", "FECHA_OPERACION", "DESCRIPCION"]
@@ -309,20 +491,26 @@ def render_transactions_page(conn, origen: str) -> None:
     display_cols += ["FACT_KAME"]
 
     st.markdown("### Pendientes (no ingresadas en Kame)")
-    if pending.empty:
+    if not n_pending:
         st.success("No hay pendientes 🎉")
     else:
-        pending["_FECHA_DT"] = pd.to_datetime(pending["FECHA_OPERACION"], format="%m/%d/%y", errors="coerce")
-        pending = pending.sort_values(["_FECHA_DT"], ascending=True).drop(columns=["_FECHA_DT"]).reset_index(drop=True)
+        show_all = st.checkbox(
+            "Mostrar todas las filas pendientes", value=False, key=f"all_{origen}"
+        )
+        page_size = None if show_all else PAGE_SIZE_PENDIENTES
+        pag_key = f"_pag_pend_{origen}"
+        cursor = _cursor_pagina(pag_key, (desde, hasta, page_size))
+        cols, rows = fetch_transacciones_pagina(
+            conn, origen, fact_kame=0, desde=desde, hasta=hasta,
+            despues=cursor, limite=page_size,
+        )
+        pending = pd.DataFrame(rows, columns=cols)
         pending["FACT_KAME"] = False          # UI checkbox — selection only
         pending["CONCILIADO"] = pending["CONCILIADO"].astype(bool)
         if is_intl:
             pending["TRASPASADO"] = pending["TRASPASADO"].astype(bool)
 
-        show_all = st.checkbox(
-            "Mostrar todas las filas pendientes", value=False, key=f"all_{origen}"
-        )
-        view = pending[display_cols].head(None if show_all else 20).copy()
+        view = pending[display_cols].copy()
 
         # Pre-format the amount column as string so thousands separator is guaranteed.
         # The column is disabled (read-only) so storing it as text doesn't affect saves.
@@ -371,8 +559,10 @@ def render_transactions_page(conn, origen: str) -> None:
             use_container_width=True,
             hide_index=True,
             column_config=col_cfg,
-            key=f"editor_{origen}",
+            key=f"editor_{origen}_{cursor}",
         )
+        if page_size is not None:
+            _nav_pagina(pag_key, pending, n_pending, page_size)
 
         # Selection for "Mover a Kame"
         selected = edited[edited["FACT_KAME"] == True].copy()
@@ -382,14 +572,19 @@ def render_transactions_page(conn, origen: str) -> None:
             and not selected["TIPO_GASTO"].fillna("").str.strip().eq("").any()
         )
 
+        # Only rows whose TIPO_GASTO / CONCILIADO changed in the editor are written
+        dirty = _filas_modificadas(view, edited)
+        records = dirty[["_RID_", "TIPO_GASTO", "CONCILIADO"]].to_dict("records")
+
         c1, c2 = st.columns(2)
         with c1:
-            if st.button("💾 Guardar cambios", key=f"save_{origen}"):
-                records = edited[["_RID_", "TIPO_GASTO", "CONCILIADO"]].to_dict("records")
+            if st.button("💾 Guardar cambios", disabled=dirty.empty, key=f"save_{origen}"):
                 try:
-                    update_clasificacion(conn, records)
-                    propagar_clasificacion(conn, records)
-                    st.success("Cambios guardados.")
+                    n_prop = guardar_clasificacion(conn, records)
+                    st.success(
+                        f"{len(records)} cambio(s) guardado(s)."
+                        + (f" Tipo propagado a {n_prop} fila(s) con la misma descripción." if n_prop else "")
+                    )
                     st.rerun()
                 except Exception as e:
                     _log.exception("guardar cambios failed")
@@ -397,11 +592,10 @@ def render_transactions_page(conn, origen: str) -> None:
 
         with c2:
             if st.button("➡️ Mover a Kame", disabled=not all_ready, key=f"move_{origen}"):
-                records = edited[["_RID_", "TIPO_GASTO", "CONCILIADO"]].to_dict("records")
                 try:
-                    update_clasificacion(conn, records)
-                    propagar_clasificacion(conn, records)
-                    marcar_fact_kame(conn, selected["_RID_"].astype(int).tolist())
+                    guardar_clasificacion(
+                        conn, records, kame_ids=selected["_RID_"].astype(int).tolist()
+                    )
                     st.success(f"{len(selected)} transacción(es) movida(s) a Kame.")
                     st.rerun()
                 except Exception as e:
@@ -412,14 +606,20 @@ def render_transactions_page(conn, origen: str) -> None:
                 st.info("Para mover: todas deben estar CONCILIADAS y con TIPO_GASTO definido.")
 
     st.markdown("### ✅ Ingresado en Kame")
-    if done.empty:
+    if not n_done:
         st.info("Aún no hay transacciones ingresadas.")
     else:
+        pag_key = f"_pag_done_{origen}"
+        cursor = _cursor_pagina(pag_key, (desde, hasta, PAGE_SIZE_KAME))
+        cols, rows = fetch_transacciones_pagina(
+            conn, origen, fact_kame=1, desde=desde, hasta=hasta,
+            despues=cursor, limite=PAGE_SIZE_KAME,
+        )
+        done = pd.DataFrame(rows, columns=cols)
         # Show same columns minus _RID_ and FACT_KAME, plus ARCHIVO_ORIGEN
         view_done = [c for c in display_cols if c not in ("_RID_", "FACT_KAME")] + ["ARCHIVO_ORIGEN"]
         view_done = [c for c in view_done if c in done.columns]
-        done["_FECHA_DT"] = pd.to_datetime(done["FECHA_OPERACION"], format="%m/%d/%y", errors="coerce")
-        done_view = done.sort_values("_FECHA_DT")[view_done].copy()
+        done_view = done[view_done].copy()
         if is_intl and "MONTO_CLP" in done_view.columns:
             done_view["MONTO_CLP"] = done_view["MONTO_CLP"].apply(
                 lambda v: f"{int(v):,}" if pd.notna(v) else "—"
@@ -430,6 +630,7 @@ def render_transactions_page(conn, origen: str) -> None:
             hide_index=True,
             column_config={"MONTO_CLP": st.column_config.TextColumn("Costo (CLP)")} if is_intl else None,
         )
+        _nav_pagina(pag_key, done, n_done, PAGE_SIZE_KAME)
 
 
 # ============================================================
@@ -483,6 +684,8 @@ def render_traspaso_page(conn) -> None:
                 )
             with c2:
                 if st.button("Deshacer", key=f"undo_{row['id']}"):
+                    # Lists refresh through version_conciliacion; no auto-match here,
+                    # so the pair is not matched straight back
                     desmarcar_traspaso(conn, int(row["id"]))
                     st.rerun()
 
@@ -509,14 +712,42 @@ def render_admin(conn, db_path: str) -> None:
         st.markdown(f"Base de datos: `{_p.hostname}:{_p.port or 5432}/{_p.path.lstrip('/')}`")
     except Exception:
         st.markdown("Base de datos: Supabase PostgreSQL")
+    st.caption(f"Esquema v{version_esquema(conn)} (código v{VERSION_ACTUAL})")
+
+    with st.expander("🧮 Resumen mensual (tabla agregada del dashboard)"):
+        st.caption(
+            "El dashboard lee totales desde una tabla agregada que se mantiene en cada escritura. "
+            "Aquí puedes compararla con las transacciones y reconstruirla."
+        )
+        c1, c2 = st.columns(2)
+        if c1.button("🔍 Verificar", key="verif_resumen"):
+            diffs = verificar_resumen(conn)
+            if diffs:
+                st.warning(f"{len(diffs)} grupo(s) no cuadran con las transacciones.")
+                st.dataframe(pd.DataFrame(diffs), use_container_width=True, hide_index=True)
+            else:
+                st.success("El resumen cuadra con las transacciones.")
+        if c2.button("🔁 Reconstruir", key="rebuild_resumen"):
+            n = reconstruir_resumen(conn)
+            st.success(f"Resumen reconstruido ({n} grupos).")
+
+    with st.expander("🔎 Búsqueda aproximada (pg_trgm)"):
+        st.caption(
+            "Sin la extensión pg_trgm la búsqueda de descripciones sólo encuentra coincidencias "
+            "exactas. Si no se pudo instalar, se reintenta al conectar una vez al día; aquí "
+            "puedes forzarlo (p. ej. tras habilitar la extensión en el servidor)."
+        )
+        if st.button("🔁 Reintentar índice pg_trgm", key="reintentar_trgm"):
+            if reintentar_trgm(conn):
+                st.success("Índice pg_trgm disponible: la búsqueda aproximada está activa.")
+            else:
+                st.warning("pg_trgm sigue sin poder instalarse en este servidor (ver logs).")
 
     with st.expander("🧹 Reset database (borra TODO)"):
         st.warning("Esta acción elimina todas las transacciones, estados y archivos procesados.")
         if st.checkbox("Confirmo que quiero borrar todo el historial", key="confirm_reset"):
             if st.button("🗑️ RESET DB", type="primary"):
                 reset_db(conn)
-                # Clear cached connection so next request re-initialises cleanly
-                st.cache_resource.clear()
                 st.success("DB reseteada.")
                 st.rerun()
 
@@ -527,8 +758,7 @@ def render_admin(conn, db_path: str) -> None:
 def main() -> None:
     require_password()
 
-    conn, db_path = get_conn()
-    conn = _ensure_conn(conn, db_path)
+    pool = get_pool()
 
     st.title("📊 Cartolas TCT BCI")
 
@@ -543,6 +773,20 @@ def main() -> None:
         ],
     )
 
+    try:
+        with pool.connection() as conn:
+            _render_page(conn, page, pool.db_url)
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        # The pool already dropped the dead connection; rerun once on a fresh one.
+        if st.session_state.get("_db_retry"):
+            raise
+        _log.warning("Connection lost, retrying on a fresh connection...")
+        st.session_state["_db_retry"] = True
+        st.rerun()
+    st.session_state["_db_retry"] = False
+
+
+def _render_page(conn, page: str, db_path: str) -> None:
     if page == "📄 Nacional (CLP)":
         render_transactions_page(conn, "NACIONAL")
     elif page == "🌎 Internacional (USD)":
@@ -550,12 +794,10 @@ def main() -> None:
     elif page == "🔗 Conciliación Traspaso":
         render_traspaso_page(conn)
     elif page == "📈 Dashboard":
-        cols, rows = fetch_transacciones(conn)
-        show_dashboard(pd.DataFrame(rows, columns=cols), conn=conn)
+        show_dashboard(conn)
     elif page == "⚙️ Admin":
         render_admin(conn, db_path)
 
-
 try:
     main()
 except Exception as e:
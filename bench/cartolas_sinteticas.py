@@ -0,0 +1,257 @@
+"""Synthetic BCI statements laid out like the real PDFs, for benchmarks.
+
+    python -m bench.cartolas_sinteticas --origen NACIONAL --paginas 20 -o nac.pdf
+
+Hand-written PDF (Helvetica, one positioned text cell per column, no extra
+dependencies): page-1 header block, the transaction table with its column
+header repeated on every page, cuotas, pagos/abonos with negative amounts,
+section totals and — for international statements — the comisiones section
+and a few rows repeated across pages (the in-document dedup case). Output is
+a pure function of (paginas, seed), so timings and golden digests are
+comparable across commits.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+from typing import List, Tuple
+
+NACIONAL = "NACIONAL"
+INTERNACIONAL = "INTERNACIONAL"
+
+# One text line = [(x, text), ...]; one page = list of lines, top to bottom.
+Linea = List[Tuple[float, str]]
+
+ANCHO, ALTO = 595, 842          # A4, points
+TAM_FUENTE, INTERLINEA = 8, 11
+MARGEN_SUP = 800
+FILAS_POR_PAGINA = 60
+
+TITULAR = "JUAN PEREZ SOTO"
+FECHA_ESTADO = "15/03/2024"
+PERIODO = ("16/02/2024", "15/03/2024")
+
+
+def _pdf(paginas: List[List[Linea]]) -> bytes:
+    objs: List[bytes] = []
+
+    def add(b: bytes) -> int:
+        objs.append(b)
+        return len(objs)
+
+    fuente = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica "
+                 b"/Encoding /WinAnsiEncoding >>")
+    contenidos = []
+    for lineas in paginas:
+        ops = [f"BT /F1 {TAM_FUENTE} Tf"]
+        y = MARGEN_SUP
+        for linea in lineas:
+            for x, t in linea:
+                t = t.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+                ops.append(f"1 0 0 1 {x} {y} Tm ({t}) Tj")
+            y -= INTERLINEA
+        ops.append("ET")
+        stream = "\n".join(ops).encode("cp1252")
+        contenidos.append(add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"))
+
+    raiz = len(objs) + len(paginas) + 1
+    hojas = [
+        add(b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (raiz, ANCHO, ALTO, c, fuente))
+        for c in contenidos
+    ]
+    add(b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % h for h in hojas)
+        + b"] /Count %d >>" % len(hojas))
+    catalogo = add(b"<< /Type /Catalog /Pages %d 0 R >>" % raiz)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, o in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + o + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objs) + 1, catalogo, xref)
+    return bytes(out)
+
+
+def _texto(t: str) -> Linea:
+    return [(30, t)]
+
+
+def _fila(columnas: Tuple[float, ...], *celdas: str) -> Linea:
+    """Cells left to right; trailing empty columns may be omitted."""
+    return [(x, c) for x, c in zip(columnas, celdas, strict=False) if c]
+
+
+def _paginar(cabecera: List[Linea], encabezado_tabla: Linea, filas: List[Linea],
+             cierre: List[Linea], paginas: int) -> List[List[Linea]]:
+    """Spread `filas` over `paginas` pages; every page repeats the column header."""
+    por_pagina = max(1, -(-len(filas) // paginas))
+    out = []
+    for i in range(paginas):
+        pagina = list(cabecera) if i == 0 else [_texto(f"PAGINA {i + 1} DE {paginas}")]
+        pagina.append(encabezado_tabla)
+        pagina.extend(filas[i * por_pagina:(i + 1) * por_pagina])
+        out.append(pagina)
+    out[-1].extend(cierre)
+    return out
+
+
+def _clp(n: int) -> str:
+    s = f"{abs(n):,}".replace(",", ".")
+    return f"-{s}" if n < 0 else s
+
+
+def _usd(c: int) -> str:
+    """Cents → BCI US$ format: 1.234,56 / -17,35."""
+    s = f"{abs(c) / 100:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+    return f"-{s}" if c < 0 else s
+
+
+def _fecha(rnd: random.Random) -> str:
+    return f"{rnd.randrange(1, 29):02d}/03/24"
+
+
+# ----------------------------------------------------------------------
+# Nacional
+# ----------------------------------------------------------------------
+# LUGAR, FECHA, CODIGO, DESCRIPCION, MONTO OPERACION, MONTO TOTAL, N° CUOTA, VALOR CUOTA
+_COL_NAC = (30, 95, 135, 195, 360, 425, 490, 525)
+
+_LUGARES = ("SANTIAGO", "PROVIDENCIA", "LAS CONDES", "VINA DEL MAR", "")
+_COMERCIOS = (
+    "SUPERMERCADO LIDER", "FARMACIAS AHUMADA", "COPEC ESTACION", "SODIMAC HOMECENTER",
+    "RESTAURANT EL PARRON", "UBER TRIP", "ENTEL PCS", "FALABELLA RETAIL",
+    "MERCADOPAGO*TIENDA", "JUMBO COSTANERA",
+)
+
+
+def cartola_nacional(paginas: int = 1, seed: int = 0) -> bytes:
+    """National (CLP) statement spread over `paginas` pages."""
+    rnd = random.Random(seed)
+    cabecera = [
+        _texto("ESTADO DE CUENTA NACIONAL DE TARJETA DE CREDITO"),
+        _texto(f"NOMBRE DEL TITULAR {TITULAR} N° DE TARJETA XXXX XXXX XXXX 1234"),
+        _texto(f"FECHA ESTADO DE CUENTA {FECHA_ESTADO}"),
+        _texto(f"PERIODO FACTURADO {PERIODO[0]} {PERIODO[1]}"),
+        _texto("MONTO TOTAL FACTURADO A PAGAR $ 1.234.567"),
+        _texto("1. PERIODO ANTERIOR"),
+        _texto("SALDO ADEUDADO INICIO PERIODO ANTERIOR $ 845.120"),
+        _texto("MONTO PAGADO PERIODO ANTERIOR $ -845.120"),
+        _texto("2. PERIODO ACTUAL"),
+    ]
+    encabezado = _fila(_COL_NAC, "LUGAR", "FECHA", "CODIGO", "DESCRIPCION OPERACION O COBRO",
+                       "MONTO OP.", "MONTO TOTAL", "CUOTA", "VALOR")
+
+    filas: List[Linea] = []
+    total = 0
+    for i in range(FILAS_POR_PAGINA * paginas):
+        codigo = str(rnd.randrange(10 ** 8, 10 ** 9))
+        tipo = rnd.random()
+        if tipo < 0.05:
+            monto = -rnd.randrange(50, 900) * 1000
+            filas.append(_fila(_COL_NAC, "", _fecha(rnd), codigo, "PAGO PESOS TEF",
+                               f"$ {_clp(monto)}", f"$ {_clp(monto)}"))
+        elif tipo < 0.20:
+            cuotas = rnd.choice((3, 6, 12))
+            monto = rnd.randrange(60_000, 1_500_000)
+            filas.append(_fila(_COL_NAC, rnd.choice(_LUGARES), _fecha(rnd), codigo,
+                               rnd.choice(_COMERCIOS), f"$ {_clp(monto)}", f"$ {_clp(monto)}",
+                               f"{rnd.randrange(1, cuotas + 1):02d}/{cuotas:02d}",
+                               f"$ {_clp(monto // cuotas)}"))
+        else:
+            monto = rnd.randrange(990, 250_000)
+            filas.append(_fila(_COL_NAC, rnd.choice(_LUGARES), _fecha(rnd), codigo,
+                               f"{rnd.choice(_COMERCIOS)} {i % 97}",
+                               f"$ {_clp(monto)}", f"$ {_clp(monto)}"))
+        total += monto
+    filas.insert(len(filas) // 2, _fila(_COL_NAC, "", _fecha(rnd), "", "TRASPASO DEUDA INTERNACIONAL",
+                                        "$ 95.430", "$ 95.430"))
+    cierre = [
+        _fila(_COL_NAC, "", "", "", "TOTAL OPERACIONES", f"$ {_clp(total)}", f"$ {_clp(total)}"),
+        _texto("3. CARGOS, COMISIONES, IMPUESTOS Y ABONOS"),
+        _texto("4. INFORMACION DE PAGO"),
+    ]
+    return _pdf(_paginar(cabecera, encabezado, filas, cierre, paginas))
+
+
+# ----------------------------------------------------------------------
+# Internacional
+# ----------------------------------------------------------------------
+# TARJETA, REFERENCIA, FECHA, DESCRIPCION, CIUDAD, PAIS, MONTO ORIGEN, MONTO US$
+_COL_INT = (30, 60, 130, 170, 320, 400, 440, 510)
+
+_COMERCIOS_INT = (
+    ("AMAZON WEB SERVICES", "SEATTLE", "US"), ("NETFLIX.COM", "LOS GATOS", "US"),
+    ("SPOTIFY AB", "STOCKHOLM", "SE"), ("UBER TRIP HELP", "SAN FRANCISCO", "US"),
+    ("HOTEL COPACABANA", "RIO DE JANEIRO", "BR"), ("GOOGLE CLOUD", "MOUNTAIN VIEW", "US"),
+    ("APPLE.COM/BILL", "CUPERTINO", "US"), ("BOOKING.COM", "AMSTERDAM", "NL"),
+)
+
+
+def cartola_internacional(paginas: int = 1, seed: int = 0) -> bytes:
+    """International (USD) statement spread over `paginas` pages."""
+    rnd = random.Random(seed)
+    filas: List[Linea] = []
+    total = 0
+    for i in range(FILAS_POR_PAGINA * paginas):
+        ref = str(rnd.randrange(10 ** 12, 10 ** 13))
+        if rnd.random() < 0.05:
+            usd = -rnd.randrange(5_000, 90_000)
+            filas.append(_fila(_COL_INT, "1234", ref, _fecha(rnd), "PAGO DOLARES TEF", "", "",
+                               "", _usd(usd)))
+        else:
+            desc, ciudad, pais = rnd.choice(_COMERCIOS_INT)
+            usd = rnd.randrange(99, 60_000)
+            origen = usd if pais == "US" else usd * rnd.randrange(90, 110) // 100
+            filas.append(_fila(_COL_INT, "1234", ref, _fecha(rnd), f"{desc} {i % 89}", ciudad,
+                               pais, _usd(origen), _usd(usd)))
+        total += usd
+    # The same charge printed again on the last page (BCI repeats pending
+    # rows): exercises the in-document dedup.
+    filas.extend(filas[j] for j in range(0, len(filas), max(1, len(filas) // 5)))
+    filas.insert(len(filas) // 2, _fila(_COL_INT, "", "", _fecha(rnd), "TRASPASO A DEUDA NACIONAL",
+                                        "", "", "", _usd(-total)))
+
+    cabecera = [
+        _texto("ESTADO DE CUENTA INTERNACIONAL DE TARJETA DE CREDITO"),
+        _texto(f"NOMBRE DEL TITULAR {TITULAR} N° DE TARJETA XXXX XXXX XXXX 1234"),
+        _texto(f"FECHA ESTADO DE CUENTA {FECHA_ESTADO}"),
+        _texto(f"PERIODO FACTURADO DESDE {PERIODO[0]}"),
+        _texto(f"PERIODO FACTURADO HASTA {PERIODO[1]}"),
+        _texto(f"DEUDA TOTAL US$ {_usd(total)}"),
+        _texto("1. INFORMACION GENERAL"),
+        _texto("2. INFORMACION DE TRANSACCIONES"),
+    ]
+    encabezado = _fila(_COL_INT, "TARJ", "REFERENCIA", "FECHA", "DESCRIPCION",
+                       "CIUDAD", "PAIS", "MONTO ORIGEN", "MONTO US$")
+    cierre = [
+        _texto(f"TOTAL TARJETA XXXX 1234 US$ {_usd(total)}"),
+        _texto("COMISIONES, OTROS CARGOS Y ABONOS"),
+        _fila(_COL_INT, "", "", _fecha(rnd), "COMISION MANTENCION", "", "", "", "3,50"),
+        _fila(_COL_INT, "", "", _fecha(rnd), "IMPUESTO DECRETO LEY 3475", "", "", "", "0,42"),
+    ]
+    return _pdf(_paginar(cabecera, encabezado, filas, cierre, paginas))
+
+
+GENERADORES = {NACIONAL: cartola_nacional, INTERNACIONAL: cartola_internacional}
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--origen", choices=sorted(GENERADORES), default=NACIONAL)
+    ap.add_argument("--paginas", type=int, default=1)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("-o", "--salida", required=True, help="archivo PDF a escribir")
+    args = ap.parse_args(argv)
+    with open(args.salida, "wb") as fh:
+        fh.write(GENERADORES[args.origen](args.paginas, args.seed))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
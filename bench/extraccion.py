@@ -0,0 +1,215 @@
+"""Benchmark the PDF extractors stage by stage, plus a golden-output check.
+
+    python -m bench.extraccion [--paginas 1 10 50] [--rondas 5] [--motor palabras]
+    python -m bench.extraccion --solo-golden
+    python -m bench.extraccion --actualizar-golden
+
+Statements come from bench.cartolas_sinteticas (deterministic per page
+count). For each origen and size it times, pytest-benchmark style (min /
+max / mean / stddev / median / rounds / OPS):
+
+    abrir    pdfplumber.open + page list
+    texto    per-page text (or positioned words with --motor palabras)
+    lineas   header + row parsing over the already extracted pages
+    dedup    international in-document dedup (_clave_dedup)
+    total    leer_cartola_* end to end
+
+The golden check then parses a fixed set of statements with both engines and
+compares row count, meta and a digest of every row against
+bench/golden_extraccion.json — any parser change that alters output fails
+it. After reviewing an intended change, refresh the file with
+--actualizar-golden. Exit status is 1 on a golden mismatch.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+import pdfplumber
+
+from bench.cartolas_sinteticas import GENERADORES, INTERNACIONAL, NACIONAL
+from data import extractor_internacional, extractor_nacional, palabras
+
+GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden_extraccion.json")
+GOLDEN_PAGINAS = (1, 5, 50)
+
+_LEER = {
+    (NACIONAL, palabras.TEXTO): extractor_nacional.leer_cartola_nacional,
+    (NACIONAL, palabras.PALABRAS): extractor_nacional.leer_cartola_nacional_palabras,
+    (INTERNACIONAL, palabras.TEXTO): extractor_internacional.leer_cartola_internacional,
+    (INTERNACIONAL, palabras.PALABRAS): extractor_internacional.leer_cartola_internacional_palabras,
+}
+
+
+# ----------------------------------------------------------------------
+# Timing
+# ----------------------------------------------------------------------
+def medir(fn: Callable[[Any], Any], rondas: int, preparar: Callable[[], Any] = lambda: None) -> List[float]:
+    """Seconds per round for fn(preparar()); preparar() is not timed. One warm-up round."""
+    fn(preparar())
+    tiempos = []
+    for _ in range(rondas):
+        arg = preparar()
+        t0 = time.perf_counter()
+        fn(arg)
+        tiempos.append(time.perf_counter() - t0)
+    return tiempos
+
+
+def _tabla(resultados: List[Tuple[str, List[float]]]) -> str:
+    ancho = max(len(n) for n, _ in resultados) + 2
+    cols = ("Min", "Max", "Mean", "StdDev", "Median")
+    out = [f"{'Name (time in ms)':<{ancho}}" + "".join(f"{c:>11}" for c in cols)
+           + f"{'Rounds':>8}{'OPS':>11}"]
+    out.append("-" * len(out[0]))
+    for nombre, t in resultados:
+        ms = [x * 1000 for x in t]
+        valores = (min(ms), max(ms), statistics.mean(ms),
+                   statistics.stdev(ms) if len(ms) > 1 else 0.0, statistics.median(ms))
+        out.append(f"{nombre:<{ancho}}" + "".join(f"{v:>11.3f}" for v in valores)
+                   + f"{len(ms):>8}{1000 / statistics.mean(ms):>11.2f}")
+    return "\n".join(out)
+
+
+# ----------------------------------------------------------------------
+# Stages
+# ----------------------------------------------------------------------
+def _abrir(pdf_bytes: bytes):
+    return pdfplumber.open(io.BytesIO(pdf_bytes))
+
+
+def _extraer(pdf, motor: str) -> List[Any]:
+    if motor == palabras.PALABRAS:
+        return [palabras.lineas(palabras.palabras_pagina(p)) for p in pdf.pages]
+    return [extractor_nacional._texto_pagina(p) for p in pdf.pages]
+
+
+def _texto_de(pagina, motor: str) -> str:
+    return "\n".join(palabras.texto(ln) for ln in pagina) if motor == palabras.PALABRAS else pagina
+
+
+def _lineas_nacional(paginas: List[Any], motor: str) -> List[Dict[str, Any]]:
+    textos = [_texto_de(p, motor) for p in paginas]
+    titular, fecha, *_ = extractor_nacional._extract_header("\n".join(textos[:1]))
+    archivo = extractor_nacional._build_archivo_origen("bench.pdf", titular, fecha)
+    return [r for t in textos for r in extractor_nacional._filas_pagina(t, titular, archivo)]
+
+
+def _lineas_internacional(paginas: List[Any], motor: str) -> List[Dict[str, Any]]:
+    header = extractor_internacional._extract_header_fields(_texto_de(paginas[0], motor) if paginas else "")
+    meta = extractor_internacional._meta(header, "bench.pdf")
+    secciones = extractor_internacional._Secciones()
+    if motor == palabras.PALABRAS:
+        return [r for p in paginas for r in secciones.filas_palabras(p, meta)]
+    return [r for p in paginas for r in secciones.filas(p, meta)]
+
+
+def _dedup(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    uniq = {}
+    for r in rows:
+        uniq.setdefault(extractor_internacional._clave_dedup(r), r)
+    return list(uniq.values())
+
+
+def benchmark(origen: str, paginas: int, rondas: int, motor: str) -> List[Tuple[str, List[float]]]:
+    pdf_bytes = GENERADORES[origen](paginas)
+    etiqueta = f"{origen[:3].lower()}-{paginas}p"
+    extraidas = _extraer(_abrir(pdf_bytes), motor)
+    lineas = _lineas_nacional if origen == NACIONAL else _lineas_internacional
+
+    res = [
+        (f"{etiqueta} abrir", medir(lambda _: len(_abrir(pdf_bytes).pages), rondas)),
+        (f"{etiqueta} texto", medir(lambda pdf: _extraer(pdf, motor), rondas,
+                                    lambda: _abrir(pdf_bytes))),
+        (f"{etiqueta} lineas", medir(lambda _: lineas(extraidas, motor), rondas)),
+    ]
+    if origen == INTERNACIONAL:
+        filas = lineas(extraidas, motor)
+        res.append((f"{etiqueta} dedup", medir(lambda _: _dedup(filas), rondas)))
+    leer = _LEER[(origen, motor)]
+    res.append((f"{etiqueta} total", medir(lambda _: leer(pdf_bytes, "bench.pdf"), rondas)))
+    return res
+
+
+# ----------------------------------------------------------------------
+# Golden output
+# ----------------------------------------------------------------------
+def _huella(origen: str, paginas: int, motor: str) -> Dict[str, Any]:
+    rows, meta = _LEER[(origen, motor)](GENERADORES[origen](paginas), "bench.pdf")
+    canon = json.dumps([rows, meta], sort_keys=True, ensure_ascii=False, default=str)
+    return {
+        "filas": len(rows),
+        "meta": json.loads(json.dumps(meta, default=str)),
+        "sha256": hashlib.sha256(canon.encode("utf-8")).hexdigest(),
+    }
+
+
+def huellas() -> Dict[str, Dict[str, Any]]:
+    return {
+        f"{origen}-{motor}-{p}p": _huella(origen, p, motor)
+        for origen in (NACIONAL, INTERNACIONAL)
+        for motor in palabras.MOTORES
+        for p in GOLDEN_PAGINAS
+    }
+
+
+def verificar_golden(actual: Dict[str, Dict[str, Any]], path: str = GOLDEN) -> List[str]:
+    """Differences between `actual` and the stored golden output ([] if identical)."""
+    with open(path, "r", encoding="utf-8") as fh:
+        esperado = json.load(fh)
+    errores = []
+    for caso in sorted(set(esperado) | set(actual)):
+        e, a = esperado.get(caso), actual.get(caso)
+        if e is None or a is None:
+            errores.append(f"{caso}: {'nuevo' if e is None else 'falta'}")
+        elif e["filas"] != a["filas"]:
+            errores.append(f"{caso}: {a['filas']} filas, se esperaban {e['filas']}")
+        elif e["meta"] != a["meta"]:
+            errores.append(f"{caso}: meta {a['meta']} != {e['meta']}")
+        elif e["sha256"] != a["sha256"]:
+            errores.append(f"{caso}: mismas filas y meta, contenido distinto")
+    return errores
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--paginas", type=int, nargs="+", default=[1, 10, 50])
+    ap.add_argument("--rondas", type=int, default=5)
+    ap.add_argument("--motor", choices=palabras.MOTORES, default=palabras.TEXTO)
+    ap.add_argument("--solo-golden", action="store_true", help="sólo la verificación golden")
+    ap.add_argument("--actualizar-golden", action="store_true",
+                    help=f"reescribe {os.path.relpath(GOLDEN)} con la salida actual")
+    args = ap.parse_args(argv)
+
+    if not (args.solo_golden or args.actualizar_golden):
+        for origen in (NACIONAL, INTERNACIONAL):
+            resultados = []
+            for p in args.paginas:
+                resultados.extend(benchmark(origen, p, args.rondas, args.motor))
+            print(f"\n{origen} (motor {args.motor})")
+            print(_tabla(resultados))
+        print()
+
+    actual = huellas()
+    if args.actualizar_golden:
+        with open(GOLDEN, "w", encoding="utf-8") as fh:
+            json.dump(actual, fh, indent=2, sort_keys=True, ensure_ascii=False)
+            fh.write("\n")
+        print(f"golden: {len(actual)} casos escritos en {os.path.relpath(GOLDEN)}")
+        return 0
+    errores = verificar_golden(actual)
+    for e in errores:
+        print(f"GOLDEN {e}", file=sys.stderr)
+    print(f"golden: {len(actual) - len(errores)}/{len(actual)} casos idénticos")
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
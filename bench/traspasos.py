@@ -0,0 +1,189 @@
+"""Benchmark fetch_traspaso_suggestions over a synthetic multi-year history.
+
+    python -m bench.traspasos --db-url postgresql://... [--anios 5] [--titulares 8]
+
+Builds a throw-away schema, loads one international + one national statement
+per titular and month (with the matching TRASPASO lines plus noise rows),
+then times the single-round-trip cents index against the original
+per-statement scan and checks both return the same suggestions/ambiguity
+sets. The schema is dropped afterwards.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List, Tuple
+
+import psycopg2
+
+from data.database import (
+    fetch_estados_intl_pendientes,
+    fetch_traspaso_nacional_disponibles,
+    fetch_traspaso_suggestions,
+    insertar_transacciones_bulk,
+    upsert_estado_cuenta,
+)
+from data.migraciones import migrar
+
+
+def _sugerencias_referencia(conn) -> Tuple[Dict[int, Dict[str, Any]], set]:
+    """The original O(statements x credits) matcher, kept as the oracle."""
+    nac_by_date: Dict[str, List[Dict[str, Any]]] = {}
+    for n in fetch_traspaso_nacional_disponibles(conn):
+        nac_by_date.setdefault(n["fecha"], []).append(n)
+
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT FECHA_OPERACION, MONTO_OPERACION FROM transacciones
+            WHERE ORIGEN = 'INTERNACIONAL'
+              AND UPPER(DESCRIPCION) LIKE '%TRASPASO%'
+              AND MONTO_OPERACION IS NOT NULL
+            """
+        )
+        credits = [(f, abs(float(u))) for f, u in cur.fetchall()]
+
+    suggestions: Dict[int, Dict[str, Any]] = {}
+    ambiguous: set = set()
+    for est in fetch_estados_intl_pendientes(conn):
+        deuda = est.get("deuda")
+        if deuda is None:
+            continue
+        dates = [f for (f, u) in credits if abs(u - float(deuda)) < 0.01]
+        cands = list({n["rid"]: n for d in dates for n in nac_by_date.get(d, [])}.values())
+        if len(cands) == 1:
+            n = cands[0]
+            suggestions[int(est["id"])] = {
+                "rid": int(n["rid"]),
+                "archivo": n["archivo"],
+                "clp": n["clp"],
+                "tasa": abs(float(n["clp"])) / float(deuda),
+            }
+        elif len(cands) > 1:
+            ambiguous.add(int(est["id"]))
+    return suggestions, ambiguous
+
+
+def _poblar(conn, anios: int, titulares: int, seed: int) -> int:
+    """Load the synthetic history; returns the number of transacciones."""
+    rnd = random.Random(seed)
+    rows: List[Dict[str, Any]] = []
+    inicio = date.today().replace(day=1) - timedelta(days=365 * anios)
+    for m in range(anios * 12):
+        mes = date(inicio.year + (inicio.month - 1 + m) // 12, (inicio.month - 1 + m) % 12 + 1, 1)
+        for t in range(titulares):
+            titular = f"TITULAR {t:02d}"
+            arch_i = f"bench_intl_{t:02d}_{mes:%Y%m}.pdf"
+            arch_n = f"bench_nac_{t:02d}_{mes:%Y%m}.pdf"
+            dia = mes + timedelta(days=rnd.randrange(5, 25))
+            fecha = dia.strftime("%m/%d/%y")
+            deuda = round(rnd.uniform(20, 2500), 2)
+            # ~3% of statements share a round amount with a sibling on the
+            # same day, which makes them ambiguous.
+            if rnd.random() < 0.03:
+                deuda = 100.0
+            upsert_estado_cuenta(conn, {
+                "ORIGEN": "INTERNACIONAL", "TITULAR_NOMBRE": titular,
+                "ARCHIVO_ORIGEN": arch_i, "FECHA_ESTADO": mes.strftime("%d-%m-%Y"),
+                "DEUDA_TOTAL": deuda, "MONEDA": "USD",
+            })
+            upsert_estado_cuenta(conn, {
+                "ORIGEN": "NACIONAL", "TITULAR_NOMBRE": titular,
+                "ARCHIVO_ORIGEN": arch_n, "FECHA_ESTADO": mes.strftime("%d-%m-%Y"),
+                "MONEDA": "CLP",
+            })
+            rows.append({
+                "ORIGEN": "INTERNACIONAL", "TITULAR_NOMBRE": titular,
+                "FECHA_OPERACION": fecha, "DESCRIPCION": "TRASPASO A DEUDA NACIONAL",
+                "MONTO_OPERACION": -deuda, "MONTO_TOTAL": -deuda, "MONEDA": "USD",
+                "ARCHIVO_ORIGEN": arch_i,
+            })
+            rows.append({
+                "ORIGEN": "NACIONAL", "TITULAR_NOMBRE": titular,
+                "FECHA_OPERACION": fecha, "DESCRIPCION": "TRASPASO DEUDA INTERNACIONAL",
+                "MONTO_OPERACION": round(deuda * 950), "MONTO_TOTAL": round(deuda * 950),
+                "MONEDA": "CLP", "ARCHIVO_ORIGEN": arch_n,
+            })
+            for _ in range(40):
+                d = (mes + timedelta(days=rnd.randrange(0, 28))).strftime("%m/%d/%y")
+                usd = round(rnd.uniform(1, 300), 2)
+                rows.append({
+                    "ORIGEN": "INTERNACIONAL", "TITULAR_NOMBRE": titular,
+                    "FECHA_OPERACION": d, "DESCRIPCION": f"COMERCIO {rnd.randrange(500)}",
+                    "MONTO_OPERACION": usd, "MONTO_TOTAL": usd, "MONEDA": "USD",
+                    "ARCHIVO_ORIGEN": arch_i,
+                })
+                clp = rnd.randrange(1000, 200000)
+                rows.append({
+                    "ORIGEN": "NACIONAL", "TITULAR_NOMBRE": titular,
+                    "FECHA_OPERACION": d, "DESCRIPCION": f"COMPRA {rnd.randrange(500)}",
+                    "MONTO_OPERACION": clp, "MONTO_TOTAL": clp, "MONEDA": "CLP",
+                    "ARCHIVO_ORIGEN": arch_n,
+                })
+    insertar_transacciones_bulk(conn, rows)
+    return len(rows)
+
+
+def _medir(fn, conn, repeticiones: int) -> Tuple[float, Any]:
+    mejor, res = float("inf"), None
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        res = fn(conn)
+        mejor = min(mejor, time.perf_counter() - t0)
+    return mejor, res
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--db-url", default=os.environ.get("DATABASE_URL"),
+                    required="DATABASE_URL" not in os.environ)
+    ap.add_argument("--anios", type=int, default=5)
+    ap.add_argument("--titulares", type=int, default=8)
+    ap.add_argument("--repeticiones", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args(argv)
+
+    schema = f"bench_traspasos_{os.getpid()}"
+    conn = psycopg2.connect(args.db_url)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE SCHEMA {schema}; SET search_path TO {schema};")
+        conn.commit()
+        migrar(conn)
+
+        t0 = time.perf_counter()
+        n = _poblar(conn, args.anios, args.titulares, args.seed)
+        with conn.cursor() as cur:
+            cur.execute("ANALYZE transacciones; ANALYZE estados_cuenta;")
+        conn.commit()
+        print(f"cargadas {n} transacciones, {args.anios * 12 * args.titulares} estados intl "
+              f"en {time.perf_counter() - t0:.1f}s")
+
+        t_nuevo, nuevo = _medir(fetch_traspaso_suggestions, conn, args.repeticiones)
+        t_ref, viejo = _medir(_sugerencias_referencia, conn, args.repeticiones)
+        print(f"referencia (Python) : {t_ref * 1000:9.1f} ms")
+        print(f"indice por centavos : {t_nuevo * 1000:9.1f} ms  ({t_ref / t_nuevo:.1f}x)")
+        print(f"sugerencias={len(nuevo[0])} ambiguos={len(nuevo[1])}")
+
+        ok = (
+            nuevo[1] == viejo[1]
+            and nuevo[0].keys() == viejo[0].keys()
+            and all(nuevo[0][k]["rid"] == viejo[0][k]["rid"] for k in nuevo[0])
+        )
+        if not ok:
+            print("ERROR: los resultados difieren de la referencia", file=sys.stderr)
+        return 0 if ok else 1
+    finally:
+        conn.rollback()
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE;")
+        conn.commit()
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
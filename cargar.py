@@ -0,0 +1,333 @@
+"""Headless bulk load of BCI statements (PDF files, directories or ZIPs).
+
+    python cargar.py RUTA [RUTA ...] [--db-url URL] [--workers N] [--origen NACIONAL] [--motor palabras]
+
+Walks every path (recursing into directories and ZIP archives), skips files
+already processed, and hands the rest to a process pool with a bounded number
+of files in flight. Each worker reads its PDF once, sniffs page 1 to tell
+national from international statements and parses it; the parent skips
+statements already loaded under another file name and stores each one
+(rows, estado de cuenta, processed mark) before the next, in input order.
+Ends with traspaso auto-matching and throughput stats.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sys
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+from data.cache_extraccion import CacheExtraccion
+from data.database import (
+    archivo_ya_procesado,
+    auto_match_traspasos,
+    estados_cargados,
+    fetch_tipo_gasto_map,
+    init_db,
+)
+from data.deteccion import detectar_cartola
+from data.palabras import MOTORES, motor_extraccion
+from data.ingest import (
+    EXTRACTORES,
+    ResultadoExtraccion,
+    default_workers,
+    extractor_para,
+    guardar_extraccion,
+    guardar_por_paginas,
+)
+
+_log = logging.getLogger("cargar")
+
+# (path on disk, ZIP member or None, display name)
+Fuente = Tuple[str, Optional[str], str]
+
+
+def _fuentes(rutas: List[str]) -> Iterator[Fuente]:
+    """Every PDF under the given files/directories/ZIPs, in sorted order."""
+    for ruta in rutas:
+        if os.path.isdir(ruta):
+            for base, dirs, files in os.walk(ruta):
+                dirs.sort()
+                yield from _fuentes([os.path.join(base, f) for f in sorted(files)
+                                     if f.lower().endswith((".pdf", ".zip"))])
+        elif ruta.lower().endswith(".zip"):
+            with zipfile.ZipFile(ruta) as zf:
+                miembros = sorted(
+                    n for n in zf.namelist()
+                    if n.lower().endswith(".pdf") and not n.endswith("/")
+                )
+            for m in miembros:
+                yield ruta, m, os.path.basename(m)
+        elif ruta.lower().endswith(".pdf"):
+            yield ruta, None, os.path.basename(ruta)
+        else:
+            _log.warning("Ignored (not a PDF, ZIP or directory): %s", ruta)
+
+
+def _leer(fuente: Fuente) -> bytes:
+    ruta, miembro, _ = fuente
+    if miembro is None:
+        with open(ruta, "rb") as fh:
+            return fh.read()
+    with zipfile.ZipFile(ruta) as zf:
+        return zf.read(miembro)
+
+
+_NO_RECONOCIDO = "no se reconoce como estado de cuenta BCI nacional ni internacional"
+
+
+def _detectar_origen(data: bytes, nombre: str, origen: Optional[str]) -> str:
+    """`origen` if forced, else the statement type sniffed from page 1."""
+    if origen is not None:
+        return origen
+    cab = detectar_cartola(data, nombre)
+    if cab is None:
+        raise ValueError(_NO_RECONOCIDO)
+    return cab["ORIGEN"]
+
+
+def _procesar(
+    fuente: Fuente, origen: Optional[str], cache: Optional[CacheExtraccion]
+) -> Tuple[ResultadoExtraccion, Optional[str], float]:
+    """Worker: read, route and parse one PDF. Returns (result, origen, seconds)."""
+    t0 = time.perf_counter()
+    nombre = fuente[2]
+    try:
+        data = _leer(fuente)
+        origen = _detectar_origen(data, nombre, origen)
+        extractor = extractor_para(origen)
+        hit = cache.get(data, extractor, nombre) if cache is not None else None
+        if hit is not None:
+            res = ResultadoExtraccion(nombre, *hit)
+        else:
+            rows, meta = extractor(data, filename=nombre)
+            res = ResultadoExtraccion(nombre, rows, meta)
+            if cache is not None:
+                cache.put(data, extractor, nombre, rows, meta)
+    except Exception as e:
+        _log.exception("PDF extraction failed: %s", nombre)
+        res = ResultadoExtraccion(nombre, error=e)
+    return res, origen, time.perf_counter() - t0
+
+
+class Estadisticas:
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.archivos = self.omitidos = self.errores = 0
+        self.filas = self.repetidas = 0
+        self.t_parseo = self.t_db = 0.0
+
+    def resumen(self) -> str:
+        total = time.perf_counter() - self.inicio
+        return "\n".join([
+            f"archivos cargados : {self.archivos}  (omitidos {self.omitidos}, errores {self.errores})",
+            f"filas nuevas      : {self.filas}  (ya cargadas {self.repetidas})",
+            f"tiempo total      : {total:.1f}s  ->  {self.archivos / total:.2f} archivos/s, "
+            f"{self.filas / total:.0f} filas/s",
+            f"parseo            : {self.t_parseo:.1f}s acumulado",
+            f"base de datos     : {self.t_db:.1f}s",
+        ])
+
+
+def cargar(
+    conn,
+    rutas: List[str],
+    origen: Optional[str] = None,
+    workers: Optional[int] = None,
+    cola: Optional[int] = None,
+    cache: Optional[CacheExtraccion] = None,
+    exclude_terms: Tuple[str, ...] = (),
+    por_paginas: bool = False,
+) -> Estadisticas:
+    """Load every statement under `rutas`; returns the run's statistics.
+
+    With `por_paginas`, files are parsed one at a time in this process, page
+    by page, and written in chunks: flat memory on very long statements, at
+    the cost of parallelism.
+    """
+    workers = workers or default_workers()
+    cola = cola or 2 * workers
+    stats = Estadisticas()
+    historic = fetch_tipo_gasto_map(conn)
+    if por_paginas:
+        _cargar_por_paginas(conn, rutas, origen, stats, historic, exclude_terms)
+    else:
+        _cargar_en_paralelo(conn, rutas, origen, stats, historic, exclude_terms,
+                            workers, cola, cache)
+
+    if stats.archivos:
+        t0 = time.perf_counter()
+        n = auto_match_traspasos(conn)
+        stats.t_db += time.perf_counter() - t0
+        if n:
+            print(f"{n} traspaso(s) emparejado(s) automáticamente")
+    return stats
+
+
+def _ya_procesado(conn, nombre: str, stats: Estadisticas) -> bool:
+    t0 = time.perf_counter()
+    ya = archivo_ya_procesado(conn, nombre)
+    stats.t_db += time.perf_counter() - t0
+    if ya:
+        stats.omitidos += 1
+        print(f"OMITE  {nombre}: ya procesado")
+    return ya
+
+
+def _ya_cargado(conn, nombre: str, archivo: Optional[str], stats: Estadisticas) -> bool:
+    """The statement was already loaded under another file name."""
+    t0 = time.perf_counter()
+    ya = estados_cargados(conn, [archivo])
+    stats.t_db += time.perf_counter() - t0
+    if ya:
+        stats.omitidos += 1
+        print(f"OMITE  {nombre}: ya cargado como {archivo}")
+    return bool(ya)
+
+
+def _error(stats: Estadisticas, nombre: str, e) -> None:
+    stats.errores += 1
+    print(f"ERROR  {nombre}: {e}", file=sys.stderr)
+
+
+def _reportar(stats: Estadisticas, nombre: str, org: str, guardado) -> None:
+    if guardado is None:
+        stats.omitidos += 1
+        print(f"VACIO  {nombre}: sin filas válidas, no se registra")
+        return
+    nuevas, repetidas = guardado
+    stats.archivos += 1
+    stats.filas += nuevas
+    stats.repetidas += repetidas
+    print(f"OK     {nombre} [{org}] {nuevas} filas"
+          + (f" ({repetidas} ya cargadas)" if repetidas else ""))
+
+
+def _cargar_por_paginas(conn, rutas, origen, stats, historic, exclude_terms) -> None:
+    """One statement at a time, parsed page by page and written in chunks."""
+    for fuente in _fuentes(rutas):
+        nombre = fuente[2]
+        if _ya_procesado(conn, nombre, stats):
+            continue
+        # Page-1 sniff: routes the file and catches a statement already
+        # loaded under another file name, before the full parse.
+        try:
+            data = _leer(fuente)
+            cab = detectar_cartola(data, nombre)
+        except Exception as e:
+            _error(stats, nombre, e)
+            continue
+        if cab is None and origen is None:
+            _error(stats, nombre, _NO_RECONOCIDO)
+            continue
+        if cab is not None and _ya_cargado(conn, nombre, cab["ARCHIVO_ORIGEN"], stats):
+            continue
+        org = origen or cab["ORIGEN"]
+        tiempos: Dict[str, float] = {}
+        try:
+            guardado = guardar_por_paginas(
+                conn, nombre, org, data, historic, exclude_terms, tiempos=tiempos,
+            )
+        except Exception as e:
+            conn.rollback()
+            _log.exception("PDF extraction failed: %s", nombre)
+            _error(stats, nombre, e)
+            continue
+        finally:
+            stats.t_parseo += tiempos.get("parseo", 0.0)
+            stats.t_db += tiempos.get("db", 0.0)
+        _reportar(stats, nombre, org, guardado)
+
+
+def _cargar_en_paralelo(conn, rutas, origen, stats, historic, exclude_terms,
+                        workers, cola, cache) -> None:
+    en_vuelo: Deque[Tuple[str, Future]] = deque()
+
+    def _guardar(nombre: str, fut: Future) -> None:
+        try:
+            res, org, t_parseo = fut.result()
+        except Exception as e:
+            # Worker died (e.g. BrokenProcessPool) — isolate to this file.
+            _log.exception("Extraction worker failed: %s", nombre)
+            _error(stats, nombre, e)
+            return
+        stats.t_parseo += t_parseo
+        if not res.ok:
+            _error(stats, nombre, res.error)
+            return
+        if _ya_cargado(conn, nombre, res.meta.get("ARCHIVO_ORIGEN"), stats):
+            return
+        t0 = time.perf_counter()
+        try:
+            guardado = guardar_extraccion(conn, res, historic, exclude_terms)
+        except Exception as e:
+            conn.rollback()
+            _log.exception("Storing failed: %s", nombre)
+            _error(stats, nombre, e)
+            return
+        finally:
+            stats.t_db += time.perf_counter() - t0
+        _reportar(stats, nombre, org, guardado)
+
+    # At most `cola` files are read/parsed ahead of the DB writer, so memory
+    # stays bounded however many files the paths expand to; this process
+    # never holds a file's bytes. Results are consumed in submission order
+    # to keep DB writes deterministic.
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for fuente in _fuentes(rutas):
+            if _ya_procesado(conn, fuente[2], stats):
+                continue
+            en_vuelo.append((fuente[2], pool.submit(_procesar, fuente, origen, cache)))
+            while len(en_vuelo) >= cola:
+                _guardar(*en_vuelo.popleft())
+        while en_vuelo:
+            _guardar(*en_vuelo.popleft())
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("rutas", nargs="+", help="PDFs, directorios o ZIPs")
+    ap.add_argument("--db-url", default=os.environ.get("SUPABASE_DB_URL"),
+                    required="SUPABASE_DB_URL" not in os.environ)
+    ap.add_argument("--origen", choices=sorted(EXTRACTORES),
+                    help="fuerza el tipo de estado (por defecto se detecta)")
+    ap.add_argument("--workers", type=int, default=None,
+                    help="procesos de parseo (CARTOLAS_INGEST_WORKERS o uno por CPU)")
+    ap.add_argument("--cola", type=int, default=None,
+                    help="archivos en vuelo como máximo (por defecto 2 × workers)")
+    ap.add_argument("--excluir", default="",
+                    help="términos de DESCRIPCION a excluir, separados por coma")
+    ap.add_argument("--cache", action="store_true",
+                    help="usa la caché de extracción en disco (CARTOLAS_CACHE_DIR)")
+    ap.add_argument("--por-paginas", action="store_true",
+                    help="parsea página a página y escribe por lotes, un archivo a la vez "
+                         "(memoria acotada; sin paralelismo ni caché)")
+    ap.add_argument("--motor", choices=MOTORES, default=motor_extraccion(),
+                    help="motor de extracción: texto de página o palabras con posición "
+                         "(CARTOLAS_MOTOR, por defecto texto)")
+    args = ap.parse_args(argv)
+    # Workers read the engine from the environment they inherit.
+    os.environ["CARTOLAS_MOTOR"] = args.motor
+
+    logging.basicConfig(level=logging.WARNING,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    exclude_terms = tuple(t.strip().lower() for t in args.excluir.split(",") if t.strip())
+    cache = CacheExtraccion() if args.cache else None
+
+    conn = init_db(args.db_url)
+    try:
+        stats = cargar(conn, args.rutas, args.origen, args.workers, args.cola,
+                       cache, exclude_terms, args.por_paginas)
+    finally:
+        conn.close()
+    print(stats.resumen())
+    return 1 if stats.errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,12 +8,6 @@ except Exception:
     _HAS_PLOTLY = False
 
 
-def _parse_dates(df: pd.DataFrame) -> pd.DataFrame:
-    out = df.copy()
-    out["FECHA_DT"] = pd.to_datetime(out["FECHA_OPERACION"], format="%m/%d/%y", errors="coerce")
-    return out
-
-
 def show_archivos(conn) -> None:
     """Table of uploaded statements — shown at the top of the dashboard."""
     from data.database import fetch_archivos_resumen
@@ -41,6 +35,7 @@ def show_archivos(conn) -> None:
         "moneda":          "Moneda",
         "traspaso_estado": "Traspaso",
         "transacciones":   "Transacciones",
+        "pendientes_kame": "Pendientes Kame",
     }
     df = df.rename(columns=rename)
 
@@ -61,6 +56,7 @@ def show_archivos(conn) -> None:
 
     col_cfg = {
         "Transacciones": st.column_config.NumberColumn("Transacciones", format="%d"),
+        "Pendientes Kame": st.column_config.NumberColumn("Pendientes Kame", format="%d"),
     }
 
     nac  = df[df["Origen"] == "NACIONAL"].drop(columns=["Origen"])
@@ -79,61 +75,88 @@ def show_archivos(conn) -> None:
         st.dataframe(intl, use_container_width=True, hide_index=True, column_config=col_cfg)
 
 
-def show_dashboard(df_db: pd.DataFrame, conn=None) -> None:
+def _usar_busqueda(descripcion: str) -> None:
+    st.session_state["dash_q"] = descripcion
+
+
+def _coincidencias(conn, q: str, origen, titulo: str) -> None:
+    """Merchant matches for `q` (substring + fuzzy); click one to search it."""
+    from data.database import buscar_descripciones
+
+    hits = buscar_descripciones(conn, q, origen=origen, limite=8)
+    if not hits:
+        return
+    st.caption(titulo)
+    cols = st.columns(4)
+    for i, h in enumerate(hits):
+        cols[i % 4].button(
+            f"{h['descripcion']} ({h['n']})",
+            key=f"dash_hit_{i}",
+            on_click=_usar_busqueda,
+            args=(h["descripcion"],),
+            use_container_width=True,
+        )
+
+
+def show_dashboard(conn) -> None:
+    from data.database import (
+        fetch_conteo_estados,
+        fetch_dashboard_kpis,
+        fetch_dashboard_opciones,
+        fetch_evolucion_mensual,
+        fetch_resumen_tipo_gasto,
+        fetch_top_descripciones,
+        fetch_transacciones_filtradas,
+    )
+
     st.header("📈 Dashboard")
 
-    if df_db is None or df_db.empty:
+    origenes, meses = fetch_dashboard_opciones(conn)
+    if not origenes:
         st.info("No hay transacciones aún.")
         return
 
-    df = _parse_dates(df_db)
-    df["MONTO_TOTAL"]     = pd.to_numeric(df.get("MONTO_TOTAL"),     errors="coerce").fillna(0.0)
-    df["MONTO_OPERACION"] = pd.to_numeric(df.get("MONTO_OPERACION"), errors="coerce").fillna(0.0)
-
     # ── Filters ───────────────────────────────────────────────
     c1, c2, c3 = st.columns(3)
     with c1:
-        origenes = sorted(df["ORIGEN"].dropna().unique().tolist())
         origen_sel = st.selectbox("Origen", ["Todos"] + origenes)
     with c2:
-        df["MES"] = df["FECHA_DT"].dt.to_period("M").astype(str)
-        meses = [m for m in sorted(df["MES"].dropna().unique()) if m != "NaT"]
         mes_sel = st.selectbox("Mes", ["Todos"] + meses)
     with c3:
-        q = st.text_input("Buscar en descripción", value="")
+        q = st.text_input("Buscar en descripción", key="dash_q")
 
-    if origen_sel != "Todos":
-        df = df[df["ORIGEN"] == origen_sel]
-    if mes_sel != "Todos":
-        df = df[df["MES"] == mes_sel]
-    if q.strip():
-        df = df[df["DESCRIPCION"].astype(str).str.contains(q.strip(), case=False, na=False)]
+    filtros = dict(
+        origen=None if origen_sel == "Todos" else origen_sel,
+        mes=None if mes_sel == "Todos" else mes_sel,
+        q=q.strip() or None,
+    )
 
-    if df.empty:
+    k = fetch_dashboard_kpis(conn, **filtros)
+    if not k["filas"]:
         st.warning("No hay transacciones con esos filtros.")
+        if filtros["q"]:
+            _coincidencias(conn, filtros["q"], filtros["origen"], "¿Quisiste decir…?")
         return
+    if filtros["q"]:
+        with st.expander("🔎 Comercios que coinciden"):
+            _coincidencias(conn, filtros["q"], filtros["origen"], "Haz clic para filtrar por uno.")
 
     is_intl_only = origen_sel == "INTERNACIONAL"
     monto_col = "MONTO_OPERACION" if is_intl_only else "MONTO_TOTAL"
     cur = "US$" if is_intl_only else "CLP"
 
     # ── KPIs ──────────────────────────────────────────────────
-    # Exclude payments (negative amounts) from totals — they are TC payments, not expenses
-    df_gastos = df[df[monto_col] > 0]
-    total = float(df_gastos[monto_col].sum())
-    count = int(len(df_gastos))
-    avg   = float(df_gastos[monto_col].mean()) if count else 0.0
-    conc  = int((df_gastos.get("CONCILIADO", 0) == 1).sum())
-    kame  = int((df_gastos.get("FACT_KAME",  0) == 1).sum())
+    # Payments (negative amounts) are excluded from totals — they are TC payments, not expenses
+    total = k["total"]
+    count = int(k["count"])
+    avg   = k["promedio"]
+    conc  = int(k["conciliadas"])
+    kame  = int(k["kame"])
 
     # File counts from estados_cuenta (unaffected by transaction filters)
-    n_nac  = n_intl = 0
-    if conn is not None:
-        from data.database import fetch_estados_cuenta
-        ec_cols, ec_rows = fetch_estados_cuenta(conn)
-        ec_all = pd.DataFrame(ec_rows, columns=ec_cols)
-        n_nac  = int((ec_all["ORIGEN"] == "NACIONAL").sum())
-        n_intl = int((ec_all["ORIGEN"] == "INTERNACIONAL").sum())
+    conteo = fetch_conteo_estados(conn)
+    n_nac  = conteo.get("NACIONAL", 0)
+    n_intl = conteo.get("INTERNACIONAL", 0)
 
     r1c1, r1c2, r1c3, r1c4, r1c5 = st.columns(5)
     r1c1.metric(f"Total ({cur})",    f"${total:,.2f}" if is_intl_only else f"${total:,.0f}")
@@ -142,38 +165,25 @@ def show_dashboard(df_db: pd.DataFrame, conn=None) -> None:
     r1c4.metric("Conciliadas",       f"{conc}/{count}")
     r1c5.metric("En Kame",           f"{kame}/{count}")
 
-    desc = df["DESCRIPCION"].str.upper()
-
-    df_pagos      = df[df[monto_col] < 0]
-    df_comisiones = df_gastos[desc.str.contains("COMISION", na=False)]
-    df_intereses  = df_gastos[desc.str.contains("INTERES", na=False)]
-    df_impuestos  = df_gastos[desc.str.contains("IMPUESTO", na=False)]
-
-    total_pagado    = float(df_pagos[monto_col].sum())
-    total_comision  = float(df_comisiones[monto_col].sum())
-    total_interes   = float(df_intereses[monto_col].sum())
-    total_impuesto  = float(df_impuestos[monto_col].sum())
-
     def _fmt(v):
         return f"${v:,.2f}" if is_intl_only else f"${v:,.0f}"
 
     r2c1, r2c2, r2c3, _ = st.columns([1, 1, 1, 2])
     r2c1.metric("Archivos Nacional",      str(n_nac))
     r2c2.metric("Archivos Internacional", str(n_intl))
-    r2c3.metric("Total pagado TC",        _fmt(abs(total_pagado)))
+    r2c3.metric("Total pagado TC",        _fmt(abs(k["pagado"])))
 
     r3c1, r3c2, r3c3, _ = st.columns([1, 1, 1, 2])
-    r3c1.metric("Comisiones",  _fmt(total_comision))
-    r3c2.metric("Intereses",   _fmt(total_interes))
-    r3c3.metric("Impuestos",   _fmt(total_impuesto))
+    r3c1.metric("Comisiones",  _fmt(k["comisiones"]))
+    r3c2.metric("Intereses",   _fmt(k["intereses"]))
+    r3c3.metric("Impuestos",   _fmt(k["impuestos"]))
 
     st.markdown("---")
 
     # ── Charts ────────────────────────────────────────────────
     if _HAS_PLOTLY:
-        top = (
-            df.groupby("DESCRIPCION")[monto_col].sum()
-            .sort_values(ascending=False).head(10).reset_index()
+        top = pd.DataFrame(
+            fetch_top_descripciones(conn, **filtros), columns=["DESCRIPCION", monto_col]
         )
         fig = px.bar(
             top, x=monto_col, y="DESCRIPCION", orientation="h",
@@ -183,8 +193,10 @@ def show_dashboard(df_db: pd.DataFrame, conn=None) -> None:
         fig.update_layout(yaxis=dict(categoryorder="total ascending"))
         st.plotly_chart(fig, use_container_width=True)
 
-        if df["MES"].nunique() > 1:
-            mensual = df.groupby("MES")[monto_col].sum().reset_index()
+        if k["meses"] > 1:
+            mensual = pd.DataFrame(
+                fetch_evolucion_mensual(conn, **filtros), columns=["MES", monto_col]
+            )
             fig2 = px.line(
                 mensual, x="MES", y=monto_col, markers=True, title="📆 Evolución mensual"
             )
@@ -193,21 +205,17 @@ def show_dashboard(df_db: pd.DataFrame, conn=None) -> None:
     # ── Resumen por Tipo de Gasto ─────────────────────────────
     st.markdown("### 🗂️ Resumen por Tipo de Gasto")
 
-    df_con_tipo = df_gastos[df_gastos["TIPO_GASTO"].fillna("") != ""].copy()
-    df_sin_tipo = df_gastos[df_gastos["TIPO_GASTO"].fillna("") == ""].copy()
+    resumen_rows, n_sin_tipo = fetch_resumen_tipo_gasto(conn, **filtros)
 
-    if df_con_tipo.empty:
+    if not resumen_rows:
         st.info("No hay transacciones con Tipo de Gasto asignado.")
     else:
         resumen = (
-            df_con_tipo.groupby("TIPO_GASTO")
-            .agg(
-                Transacciones=(monto_col, "count"),
-                Total=(monto_col, "sum"),
-            )
+            pd.DataFrame(resumen_rows, columns=["Tipo de Gasto", "Transacciones", "Total"])
             .sort_values("Total", ascending=False)
-            .reset_index()
+            .reset_index(drop=True)
         )
+        total_con_tipo = float(resumen["Total"].sum())
         resumen.columns = ["Tipo de Gasto", "Transacciones", f"Total ({cur})"]
 
         # Format total
@@ -220,33 +228,31 @@ def show_dashboard(df_db: pd.DataFrame, conn=None) -> None:
         total_row = pd.DataFrame([{
             "Tipo de Gasto": "TOTAL",
             "Transacciones": int(resumen["Transacciones"].sum()),
-            f"Total ({cur})": _fmt(df_con_tipo[monto_col].sum()),
+            f"Total ({cur})": _fmt(total_con_tipo),
         }])
         resumen = pd.concat([resumen, total_row], ignore_index=True)
 
         st.dataframe(resumen, use_container_width=True, hide_index=True)
 
-        if len(df_sin_tipo) > 0:
-            st.caption(f"⚠️ {len(df_sin_tipo)} transacción(es) sin Tipo de Gasto asignado.")
+        if n_sin_tipo > 0:
+            st.caption(f"⚠️ {n_sin_tipo} transacción(es) sin Tipo de Gasto asignado.")
 
     st.markdown("---")
 
     with st.expander("📋 Ver tabla filtrada"):
-        preferred = [
-            "ORIGEN", "TITULAR_NOMBRE", "FECHA_OPERACION", "DESCRIPCION",
-            "CIUDAD", "PAIS", "MONTO_OPERACION", "MONTO_TOTAL", "MONEDA",
-            "TIPO_GASTO", "CONCILIADO", "FACT_KAME", "TRASPASADO", "ARCHIVO_ORIGEN",
-        ]
-        show_cols = [c for c in preferred if c in df.columns]
-        st.dataframe(
-            df.sort_values("FECHA_DT", na_position="last")[show_cols],
-            use_container_width=True, hide_index=True,
-        )
+        # Detail rows are only fetched on demand
+        if st.toggle("Cargar detalle", key="dash_detalle"):
+            cols, rows = fetch_transacciones_filtradas(conn, **filtros)
+            df = pd.DataFrame(rows, columns=cols)
+            preferred = [
+                "ORIGEN", "TITULAR_NOMBRE", "FECHA_OPERACION", "DESCRIPCION",
+                "CIUDAD", "PAIS", "MONTO_OPERACION", "MONTO_TOTAL", "MONEDA",
+                "TIPO_GASTO", "CONCILIADO", "FACT_KAME", "TRASPASADO", "ARCHIVO_ORIGEN",
+            ]
+            show_cols = [c for c in preferred if c in df.columns]
+            st.dataframe(df[show_cols], use_container_width=True, hide_index=True)
 
     # ── Uploaded files table ──────────────────────────────────
     st.markdown("---")
     st.subheader("📂 Archivos cargados")
-    if conn is not None:
-        show_archivos(conn)
-    else:
-        st.info("Conexión no disponible.")
+    show_archivos(conn)
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+
+# ============================================================
+# Persistent extraction cache.
+#   key   = SHA-256(pdf bytes) + extractor name + EXTRACTOR_VERSION
+#   value = (rows, meta) as JSON, one file per entry
+# Bounded by total bytes on disk; least-recently-used entries
+# (by file mtime, refreshed on every hit) are evicted first.
+# ============================================================
+
+_log = logging.getLogger(__name__)
+
+DEFAULT_DIR = os.path.join(os.path.expanduser("~"), ".cache", "cartolas_bci", "extraccion")
+DEFAULT_MAX_MB = 64
+
+
+def _extractor_id(extractor) -> str:
+    """'<module>.<name>@<EXTRACTOR_VERSION>' — a version bump changes every key."""
+    mod = sys.modules.get(extractor.__module__)
+    version = getattr(mod, "EXTRACTOR_VERSION", "0")
+    return f"{extractor.__module__}.{extractor.__name__}@{version}"
+
+
+class CacheExtraccion:
+    def __init__(self, directorio: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.directorio = directorio or os.environ.get("CARTOLAS_CACHE_DIR") or DEFAULT_DIR
+        if max_bytes is None:
+            mb = os.environ.get("CARTOLAS_CACHE_MAX_MB", "").strip()
+            max_bytes = (int(mb) if mb.isdigit() else DEFAULT_MAX_MB) * 1024 * 1024
+        self.max_bytes = max_bytes
+        os.makedirs(self.directorio, exist_ok=True)
+
+    def _path(self, pdf_bytes: bytes, extractor) -> str:
+        h = hashlib.sha256(pdf_bytes)
+        h.update(b"\0" + _extractor_id(extractor).encode())
+        return os.path.join(self.directorio, h.hexdigest() + ".json")
+
+    def get(
+        self, pdf_bytes: bytes, extractor, filename: str
+    ) -> Optional[Tuple[List[Dict[str, Any]], Dict[str, Any]]]:
+        path = self._path(pdf_bytes, extractor)
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                entry = json.load(fh)
+            os.utime(path)  # LRU: mark as recently used
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            _log.warning("Discarding unreadable cache entry %s", path)
+            self._remove(path)
+            return None
+
+        rows, meta = entry["rows"], entry["meta"]
+        # Statements without titular/fecha fall back to the upload filename
+        # as ARCHIVO_ORIGEN; rebind those to the name used this time.
+        cached_name = entry.get("filename")
+        if cached_name and cached_name != filename and meta.get("ARCHIVO_ORIGEN") == cached_name:
+            meta["ARCHIVO_ORIGEN"] = filename
+            for r in rows:
+                if r.get("ARCHIVO_ORIGEN") == cached_name:
+                    r["ARCHIVO_ORIGEN"] = filename
+        return rows, meta
+
+    def put(
+        self,
+        pdf_bytes: bytes,
+        extractor,
+        filename: str,
+        rows: List[Dict[str, Any]],
+        meta: Dict[str, Any],
+    ) -> None:
+        path = self._path(pdf_bytes, extractor)
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directorio, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                    json.dump({"filename": filename, "rows": rows, "meta": meta}, fh)
+                os.replace(tmp, path)
+            except BaseException:
+                self._remove(tmp)  # never leave a half-written temp file behind
+                raise
+        except OSError:
+            _log.exception("Could not write extraction cache entry")
+            return
+        self._evict()
+
+    def _remove(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        entries = []
+        total = 0
+        for name in os.listdir(self.directorio):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directorio, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        if total <= self.max_bytes:
+            return
+        for _mtime, size, path in sorted(entries):
+            self._remove(path)
+            total -= size
+            if total <= self.max_bytes:
+                break
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+from typing import Optional
+
+# ============================================================
+# Transaction kind (transacciones.CLASE), tagged at ingest.
+# Lets reconciliation and KPIs filter with an indexed equality
+# instead of UPPER(DESCRIPCION) LIKE '%...%' scans.
+# First matching rule wins; CLASE_SQL is the same rule set for
+# back-filling rows stored before the column existed — keep
+# both in sync (and bump EXTRACTOR_VERSION) when editing.
+# ============================================================
+
+TRASPASO_INTL = "TRASPASO_INTL"  # national line carrying an intl statement balance
+TRASPASO = "TRASPASO"            # any other traspaso (e.g. the intl-side credit)
+COMISION = "COMISION"
+INTERES = "INTERES"
+IMPUESTO = "IMPUESTO"
+PAGO = "PAGO"                    # card payment
+ABONO = "ABONO"                  # other credit (refund, reversal)
+COMPRA = "COMPRA"
+
+# Both kinds of traspaso line (the old LIKE '%TRASPASO%' filter).
+TRASPASOS = (TRASPASO_INTL, TRASPASO)
+
+_REGLAS = (
+    ("TRASPASO DEUDA INTERNAC", TRASPASO_INTL),
+    ("TRASPASO", TRASPASO),
+    ("COMISION", COMISION),
+    ("INTERES", INTERES),
+    ("IMPUESTO", IMPUESTO),
+)
+
+
+def clase_transaccion(descripcion: Optional[str], monto: Optional[float] = None) -> str:
+    d = (descripcion or "").upper()
+    for needle, clase in _REGLAS:
+        if needle in d:
+            return clase
+    if d.startswith("PAGO"):
+        return PAGO
+    if monto is not None and monto < 0:
+        return ABONO
+    return COMPRA
+
+
+CLASE_SQL = (
+    "CASE"
+    + "".join(
+        f" WHEN UPPER(DESCRIPCION) LIKE '%%{needle}%%' THEN '{clase}'"
+        for needle, clase in _REGLAS
+    )
+    + f" WHEN UPPER(DESCRIPCION) LIKE 'PAGO%%' THEN '{PAGO}'"
+    + f" WHEN MONTO_TOTAL < 0 THEN '{ABONO}'"
+    + f" ELSE '{COMPRA}' END"
+)
@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import logging
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import psycopg2.extras
+
+from data import clases
+
+# ============================================================
+# Global traspaso reconciliation.
+# Pending international statements (rows) vs unassigned national
+# TRASPASO DEUDA INTERNACIONAL lines (columns) form a bipartite
+# graph; every edge gets a cost from amount match, date proximity,
+# titular and implied rate vs the rolling median of past traspasos.
+# One min-cost assignment over the whole matrix proposes a
+# consistent matching for all statements at once, instead of
+# resolving ambiguous dates one selectbox at a time.
+# ============================================================
+
+_log = logging.getLogger(__name__)
+
+# Edge cost = sum(PESOS[k] * component_k), each component in [0, 1].
+PESOS = {"monto": 3.0, "tasa": 2.0, "fecha": 1.0, "titular": 1.0}
+# Edges above this are never proposed. An amount mismatch alone costs 3.0,
+# so it only survives when date, titular and rate are all near perfect.
+COSTO_MAX = 3.5
+
+TASA_RANGO = (800.0, 1100.0)  # CLP/US$ sanity band (same as the UI warning)
+TASA_VENTANA = 6              # past traspasos in the rolling median
+TASA_TOLERANCIA = 0.15        # |ln(tasa / mediana)| at which the rate cost saturates
+DIAS_MAX = 60                 # days after the statement at which the date cost saturates
+
+_INFACTIBLE = 1e9
+
+
+# ---------------------------------------------------------------------------
+# Min-cost assignment (Hungarian / shortest augmenting path, O(n²·m))
+# ---------------------------------------------------------------------------
+
+def asignacion_minima(costo: np.ndarray) -> List[Tuple[int, int]]:
+    """Min-cost assignment of an n×m cost matrix.
+
+    Returns (row, col) pairs; every row is assigned when n <= m, every
+    column otherwise. The inner column scan is vectorized, so the Python
+    loop runs O(n²) times at most.
+    """
+    costo = np.asarray(costo, dtype=float)
+    if costo.size == 0:
+        return []
+    if costo.shape[0] > costo.shape[1]:
+        return sorted((i, j) for j, i in asignacion_minima(costo.T))
+
+    n, m = costo.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=int)    # p[j] = row (1-based) matched to column j
+    way = np.zeros(m + 1, dtype=int)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            libre = ~used[1:]
+            cur = costo[i0 - 1] - u[i0] - v[1:]
+            mejora = libre & (cur < minv[1:])
+            minv[1:][mejora] = cur[mejora]
+            way[1:][mejora] = j0
+            cand = np.where(libre, minv[1:], np.inf)
+            j1 = int(np.argmin(cand)) + 1
+            delta = cand[j1 - 1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[~used] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    return sorted((int(p[j]) - 1, j - 1) for j in range(1, m + 1) if p[j])
+
+
+# ---------------------------------------------------------------------------
+# Cost matrix
+# ---------------------------------------------------------------------------
+
+def _ordinal(d: Optional[date]) -> float:
+    return float(d.toordinal()) if d else np.nan
+
+
+def _norm(nombre: Optional[str]) -> str:
+    return " ".join((nombre or "").upper().split())
+
+
+def _medianas_moviles(historia: List[Tuple[date, float]], fechas: np.ndarray) -> np.ndarray:
+    """Median of the last TASA_VENTANA historic rates on or before each date."""
+    if not historia:
+        return np.full(len(fechas), np.nan)
+    historia = sorted(historia)
+    h_fechas = np.array([_ordinal(f) for f, _ in historia])
+    h_tasas = np.array([t for _, t in historia])
+    global_med = float(np.median(h_tasas))
+    out = np.empty(len(fechas))
+    fin = np.searchsorted(h_fechas, np.nan_to_num(fechas, nan=np.inf), side="right")
+    for k, e in enumerate(fin):
+        ventana = h_tasas[max(0, e - TASA_VENTANA):e]
+        out[k] = np.median(ventana) if len(ventana) else global_med
+    return out
+
+
+def matriz_costos(
+    estados: List[Dict[str, Any]],
+    lineas: List[Dict[str, Any]],
+    creditos: List[Tuple[date, float]],
+    historia: List[Tuple[date, float]],
+) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Weighted cost matrix (statements × national lines) and its components."""
+    deuda = np.array([abs(float(e["deuda"])) for e in estados])
+    e_fecha = np.array([_ordinal(e.get("fecha")) for e in estados])
+    e_tit = np.array([_norm(e.get("titular")) for e in estados], dtype=object)
+
+    clp = np.array([abs(float(n["clp"] or 0)) for n in lineas])
+    n_fecha = np.array([_ordinal(n.get("fecha")) for n in lineas])
+    n_tit = np.array([_norm(n.get("titular")) for n in lineas], dtype=object)
+
+    # Amount: an international TRASPASO credit of the statement's USD amount
+    # (±1 cent) booked the same day as the national line.
+    claves = np.array(
+        sorted({int(_ordinal(f)) * 10**10 + round(usd * 100) for f, usd in creditos if f}),
+        dtype=np.int64,
+    )
+    centavos = np.round(deuda * 100).astype(np.int64)[:, None]
+    dia = np.nan_to_num(n_fecha, nan=-1).astype(np.int64)[None, :] * 10**10
+    monto_ok = np.zeros((len(estados), len(lineas)), dtype=bool)
+    for off in (-1, 0, 1):
+        monto_ok |= np.isin(dia + centavos + off, claves)
+    c_monto = (~monto_ok).astype(float)
+
+    # Date: the traspaso is booked after the international statement closes.
+    dias = n_fecha[None, :] - e_fecha[:, None]
+    c_fecha = np.where(dias < -5, 1.0, np.clip(np.abs(dias) / DIAS_MAX, 0.0, 1.0))
+    c_fecha = np.where(np.isnan(dias), 0.5, c_fecha)
+
+    # Titular: unknown on either side is neutral.
+    conocido = (e_tit[:, None] != "") & (n_tit[None, :] != "")
+    c_titular = np.where(conocido, (e_tit[:, None] != n_tit[None, :]).astype(float), 0.5)
+
+    # Rate: implied CLP/US$ vs the rolling median at the national line's date.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tasa = clp[None, :] / deuda[:, None]
+        mediana = _medianas_moviles(historia, n_fecha)[None, :]
+        desvio = np.abs(np.log(tasa / mediana)) / TASA_TOLERANCIA
+        fuera = (tasa < TASA_RANGO[0]) | (tasa > TASA_RANGO[1])
+        c_tasa = np.where(np.isnan(mediana), fuera.astype(float), np.clip(desvio, 0.0, 1.0))
+    c_tasa = np.nan_to_num(c_tasa, nan=1.0, posinf=1.0)
+
+    costo = (
+        PESOS["monto"] * c_monto
+        + PESOS["tasa"] * c_tasa
+        + PESOS["fecha"] * c_fecha
+        + PESOS["titular"] * c_titular
+    )
+    componentes = {"monto": c_monto, "tasa": c_tasa, "fecha": c_fecha,
+                   "titular": c_titular, "tasa_implicita": tasa}
+    return costo, componentes
+
+
+# ---------------------------------------------------------------------------
+# DB-facing entry point
+# ---------------------------------------------------------------------------
+
+def _cargar(conn):
+    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        cur.execute(
+            """
+            SELECT id, ARCHIVO_ORIGEN AS archivo, TITULAR_NOMBRE AS titular,
+                   DEUDA_TOTAL AS deuda,
+                   COALESCE(PERIODO_HASTA_DT, FECHA_ESTADO_DT) AS fecha
+            FROM estados_cuenta
+            WHERE ORIGEN = 'INTERNACIONAL' AND TRASPASO_ESTADO != 'TRASPASADO'
+              AND DEUDA_TOTAL IS NOT NULL AND DEUDA_TOTAL != 0
+            ORDER BY id
+            """
+        )
+        estados = [dict(r) for r in cur.fetchall()]
+        cur.execute(
+            """
+            SELECT t.id AS rid, t.FECHA_OPERACION_DT AS fecha, t.MONTO_TOTAL AS clp,
+                   t.ARCHIVO_ORIGEN AS archivo, t.TITULAR_NOMBRE AS titular
+            FROM transacciones t
+            WHERE t.ORIGEN = 'NACIONAL' AND t.CLASE = %s
+              AND NOT EXISTS (
+                  SELECT 1 FROM estados_cuenta ec WHERE ec.MATCH_RID = t.id
+              )
+            ORDER BY t.id
+            """,
+            (clases.TRASPASO_INTL,),
+        )
+        lineas = [dict(r) for r in cur.fetchall()]
+        cur.execute(
+            """
+            SELECT FECHA_OPERACION_DT AS fecha, abs(MONTO_OPERACION) AS usd FROM transacciones
+            WHERE ORIGEN = 'INTERNACIONAL' AND CLASE = ANY(%s)
+              AND MONTO_OPERACION IS NOT NULL
+            """,
+            (list(clases.TRASPASOS),),
+        )
+        creditos = [(r["fecha"], float(r["usd"])) for r in cur.fetchall()]
+        cur.execute(
+            """
+            SELECT t.FECHA_OPERACION_DT AS fecha, ec.TASA_CAMBIO AS tasa
+            FROM estados_cuenta ec JOIN transacciones t ON t.id = ec.MATCH_RID
+            WHERE ec.TRASPASO_ESTADO = 'TRASPASADO' AND ec.TASA_CAMBIO IS NOT NULL
+              AND t.FECHA_OPERACION_DT IS NOT NULL
+            """
+        )
+        historia = [(r["fecha"], float(r["tasa"])) for r in cur.fetchall()]
+    return estados, lineas, creditos, historia
+
+
+def proponer_asignacion(conn) -> List[Dict[str, Any]]:
+    """Globally consistent statement → national line proposal.
+
+    Each proposal: estado_id, estado_archivo, rid, archivo, clp, tasa,
+    costo and monto_ok (whether the USD amount chain confirms it).
+    Statements whose best feasible edge exceeds COSTO_MAX are left out.
+    """
+    estados, lineas, creditos, historia = _cargar(conn)
+    if not estados or not lineas:
+        return []
+
+    costo, comp = matriz_costos(estados, lineas, creditos, historia)
+    pares = asignacion_minima(np.where(costo > COSTO_MAX, _INFACTIBLE, costo))
+
+    propuesta = []
+    for i, j in pares:
+        if costo[i, j] > COSTO_MAX:
+            continue
+        e, n = estados[i], lineas[j]
+        propuesta.append({
+            "estado_id": int(e["id"]),
+            "estado_archivo": e["archivo"],
+            "titular": e.get("titular"),
+            "deuda": float(e["deuda"]),
+            "rid": int(n["rid"]),
+            "archivo": n["archivo"],
+            "fecha": n["fecha"],
+            "clp": n["clp"],
+            "tasa": float(comp["tasa_implicita"][i, j]),
+            "costo": float(costo[i, j]),
+            "monto_ok": bool(comp["monto"][i, j] == 0),
+        })
+    _log.info(
+        "Traspaso assignment: %d statements × %d lines → %d proposals",
+        len(estados), len(lineas), len(propuesta),
+    )
+    return propuesta
@@ -1,8 +1,19 @@
+import hashlib
+import io
 import logging
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
 from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 import psycopg2
 import psycopg2.extras
+import psycopg2.pool
+
+from data import clases
+from data.clases import clase_transaccion
 
 # ============================================================
 # Unified PostgreSQL layer (Supabase)
@@ -17,6 +28,7 @@ TRANSACCIONES_COLS = [
     "ORIGEN",            # 'NACIONAL' | 'INTERNACIONAL'
     "TITULAR_NOMBRE",
     "FECHA_OPERACION",   # MM/DD/YY
+    "FECHA_OPERACION_DT",  # same date as DATE (indexed; used for sorting/filters)
     "DESCRIPCION",
     "CIUDAD",
     "PAIS",
@@ -30,109 +42,362 @@ TRANSACCIONES_COLS = [
     "CONCILIADO",        # 0/1
     "FACT_KAME",         # 0/1 — entered in Kame
     "TRASPASADO",        # 0/1 — intl statement transferred to national
+    "CLASE",             # kind code, see data/clases.py (indexed)
     "ARCHIVO_ORIGEN",
+    "CLAVE_NATURAL",     # md5 natural key (unique) — see _claves_naturales
 ]
+_IDX_ARCHIVO = TRANSACCIONES_COLS.index("ARCHIVO_ORIGEN")
 
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
 
-def _sort_expr(col: str) -> str:
-    """Reformat MM/DD/YY text column to YYMMDD for correct chronological sort."""
-    return (
-        f"substring({col},7,2)||substring({col},1,2)||substring({col},4,2)"
-    )
+def _parse_fecha(valor: Optional[str], fmt: str) -> Optional[date]:
+    """Parse a statement date string (MM/DD/YY or DD-MM-YYYY) into a date."""
+    if not valor:
+        return None
+    try:
+        return datetime.strptime(valor, fmt).date()
+    except ValueError:
+        return None
+
+
+def _fecha_operacion(valor: Optional[str]) -> Optional[date]:
+    return _parse_fecha(valor, "%m/%d/%y")
+
+
+def _fecha_estado(valor: Optional[str]) -> Optional[date]:
+    return _parse_fecha(valor, "%d-%m-%Y")
+
+
+def _cols(cur) -> List[str]:
+    """Column names as the UI expects them: Postgres folds unquoted identifiers
+    to lower case, so restore the upper-case names (the surrogate key stays `id`)."""
+    return [d[0] if d[0] == "id" else d[0].upper() for d in cur.description]
 
 
 # ---------------------------------------------------------------------------
-# Schema init
+# Monthly rollup (resumen_mensual)
+#   One row per (ORIGEN, TITULAR_NOMBRE, MES, TIPO_GASTO, SIGNO). Writers
+#   subtract the affected rows before changing them and add them back after,
+#   so the table always equals a GROUP BY over transacciones.
 # ---------------------------------------------------------------------------
 
-def init_db(db_url: str):
-    """Connect to Supabase/PostgreSQL, create tables if needed, return connection."""
-    from urllib.parse import urlparse as _up, unquote as _uq
-    _u = _up(db_url.replace("#", "%23"))
-    conn = psycopg2.connect(host=_u.hostname, port=_u.port, dbname=_u.path.lstrip("/"), user=_u.username, password=_uq(_u.password), sslmode="require")
-    conn.autocommit = False
-
+_RESUMEN_KEY = "ORIGEN, TITULAR_NOMBRE, MES, TIPO_GASTO, SIGNO"
+_RESUMEN_METRICAS = "N, MONTO_TOTAL, MONTO_OPERACION, MONTO_CLP, N_CONCILIADO, N_KAME"
+
+# REAL -> float8 -> numeric keeps every stored digit (REAL::numeric rounds to 6).
+_RESUMEN_SELECT = """
+    SELECT ORIGEN,
+           COALESCE(TITULAR_NOMBRE, ''),
+           COALESCE(date_trunc('month', FECHA_OPERACION_DT)::date, '-infinity'::date),
+           COALESCE(TIPO_GASTO, ''),
+           sign(COALESCE(MONTO_TOTAL, 0))::smallint,
+           COUNT(*),
+           COALESCE(SUM(MONTO_TOTAL::float8::numeric), 0),
+           COALESCE(SUM(MONTO_OPERACION::float8::numeric), 0),
+           COALESCE(SUM(MONTO_CLP::float8::numeric), 0),
+           COUNT(*) FILTER (WHERE CONCILIADO = 1),
+           COUNT(*) FILTER (WHERE FACT_KAME = 1)
+    FROM transacciones
+    WHERE {where}
+    GROUP BY 1, 2, 3, 4, 5
+"""
+
+
+def _resumen_sql(where: str, signo: int) -> str:
+    """SQL adding (signo=1) or subtracting (signo=-1) the rows matching `where`."""
+    sel = _RESUMEN_SELECT.format(where=where)
+    sql = f"""
+        INSERT INTO resumen_mensual ({_RESUMEN_KEY}, {_RESUMEN_METRICAS})
+        SELECT k1, k2, k3, k4, k5, {signo} * n, {signo} * mt, {signo} * mo,
+               {signo} * mc, {signo} * nc, {signo} * nk
+        FROM ({sel}) AS d(k1, k2, k3, k4, k5, n, mt, mo, mc, nc, nk)
+        ON CONFLICT ({_RESUMEN_KEY}) DO UPDATE SET
+            N               = resumen_mensual.N               + EXCLUDED.N,
+            MONTO_TOTAL     = resumen_mensual.MONTO_TOTAL     + EXCLUDED.MONTO_TOTAL,
+            MONTO_OPERACION = resumen_mensual.MONTO_OPERACION + EXCLUDED.MONTO_OPERACION,
+            MONTO_CLP       = resumen_mensual.MONTO_CLP       + EXCLUDED.MONTO_CLP,
+            N_CONCILIADO    = resumen_mensual.N_CONCILIADO    + EXCLUDED.N_CONCILIADO,
+            N_KAME          = resumen_mensual.N_KAME          + EXCLUDED.N_KAME;
+    """
+    if signo < 0:
+        sql += "DELETE FROM resumen_mensual WHERE N <= 0;\n"
+    return sql
+
+
+def _resumen_aplicar(cur, where: str, params: Iterable[Any], signo: int) -> None:
+    """Add (signo=1) or subtract (signo=-1) the rows matching `where` to the rollup."""
+    cur.execute(_resumen_sql(where, signo), list(params))
+
+
+def _ids_donde(cur, where: str, params: Iterable[Any]) -> List[int]:
+    cur.execute(f"SELECT id FROM transacciones WHERE {where}", list(params))
+    return [r[0] for r in cur.fetchall()]
+
+
+def reconstruir_resumen(conn) -> int:
+    """Rebuild resumen_mensual from scratch; returns the number of rollup rows."""
     with conn.cursor() as cur:
+        cur.execute("DELETE FROM resumen_mensual;")
         cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS transacciones (
-                id              SERIAL PRIMARY KEY,
-                ORIGEN          TEXT NOT NULL,
-                TITULAR_NOMBRE  TEXT,
-                FECHA_OPERACION TEXT,
-                DESCRIPCION     TEXT,
-                CIUDAD          TEXT,
-                PAIS            TEXT,
-                REF_INTERNACIONAL TEXT,
-                MONTO_ORIGEN    REAL,
-                MONTO_OPERACION REAL,
-                MONTO_TOTAL     REAL,
-                MONTO_CLP       REAL,
-                MONEDA          TEXT,
-                TIPO_GASTO      TEXT,
-                CONCILIADO      INTEGER NOT NULL DEFAULT 0,
-                FACT_KAME       INTEGER NOT NULL DEFAULT 0,
-                TRASPASADO      INTEGER NOT NULL DEFAULT 0,
-                ARCHIVO_ORIGEN  TEXT
-            );
-            """
-        )
-        cur.execute(
-            "CREATE INDEX IF NOT EXISTS idx_tx_origen     ON transacciones(ORIGEN);"
-        )
-        cur.execute(
-            "CREATE INDEX IF NOT EXISTS idx_tx_fact_kame  ON transacciones(FACT_KAME);"
-        )
-        cur.execute(
-            "CREATE INDEX IF NOT EXISTS idx_tx_archivo    ON transacciones(ARCHIVO_ORIGEN);"
-        )
-        cur.execute(
-            "CREATE INDEX IF NOT EXISTS idx_tx_traspasado ON transacciones(TRASPASADO);"
-        )
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS estados_cuenta (
-                id              SERIAL PRIMARY KEY,
-                ORIGEN          TEXT NOT NULL,
-                TITULAR_NOMBRE  TEXT,
-                ARCHIVO_ORIGEN  TEXT UNIQUE NOT NULL,
-                FECHA_ESTADO    TEXT,
-                PERIODO_DESDE   TEXT,
-                PERIODO_HASTA   TEXT,
-                DEUDA_TOTAL     REAL,
-                MONEDA          TEXT,
-                TRASPASO_ESTADO TEXT NOT NULL DEFAULT 'PENDIENTE',
-                MATCH_RID       INTEGER,
-                MATCH_ARCHIVO   TEXT,
-                TASA_CAMBIO     REAL
-            );
-            """
+            f"INSERT INTO resumen_mensual ({_RESUMEN_KEY}, {_RESUMEN_METRICAS}) "
+            f"{_RESUMEN_SELECT.format(where='TRUE')};"
         )
+        n = cur.rowcount
+    conn.commit()
+    return n
+
+
+def verificar_resumen(conn) -> List[Dict[str, Any]]:
+    """Rollup rows that disagree with a fresh GROUP BY over transacciones."""
+    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
         cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS archivos_procesados (
-                nombre          TEXT PRIMARY KEY,
-                fecha_procesado TIMESTAMPTZ NOT NULL DEFAULT NOW()
-            );
+            f"""
+            WITH real AS (
+                SELECT * FROM ({_RESUMEN_SELECT.format(where='TRUE')})
+                    AS d({_RESUMEN_KEY}, {_RESUMEN_METRICAS})
+            )
+            SELECT COALESCE(r.ORIGEN, m.ORIGEN) AS origen,
+                   COALESCE(r.TITULAR_NOMBRE, m.TITULAR_NOMBRE) AS titular,
+                   COALESCE(r.MES, m.MES) AS mes,
+                   COALESCE(r.TIPO_GASTO, m.TIPO_GASTO) AS tipo_gasto,
+                   COALESCE(r.SIGNO, m.SIGNO) AS signo,
+                   m.N AS n_resumen, r.N AS n_real,
+                   m.MONTO_TOTAL AS monto_resumen, r.MONTO_TOTAL AS monto_real
+            FROM real r
+            FULL OUTER JOIN resumen_mensual m USING ({_RESUMEN_KEY})
+            WHERE r.N IS DISTINCT FROM m.N
+               OR r.N_CONCILIADO IS DISTINCT FROM m.N_CONCILIADO
+               OR r.N_KAME IS DISTINCT FROM m.N_KAME
+               OR abs(COALESCE(r.MONTO_TOTAL, 0) - COALESCE(m.MONTO_TOTAL, 0)) > 0.005
+               OR abs(COALESCE(r.MONTO_OPERACION, 0) - COALESCE(m.MONTO_OPERACION, 0)) > 0.005
+               OR abs(COALESCE(r.MONTO_CLP, 0) - COALESCE(m.MONTO_CLP, 0)) > 0.005
             """
         )
+        return [dict(r) for r in cur.fetchall()]
 
-        # Safe column migrations for existing schemas
-        for table, col, decl in (
-            ("transacciones",  "MONTO_CLP",   "REAL"),
-            ("estados_cuenta", "TASA_CAMBIO", "REAL"),
-        ):
-            cur.execute(
-                f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {col} {decl};"
-            )
 
-    conn.commit()
+# ---------------------------------------------------------------------------
+# Statement counters (estados_cuenta.N_TRANSACCIONES / MONTO_TRANSACCIONES /
+# N_PENDIENTES_KAME), recomputed per statement through idx_tx_archivo
+# whenever its transactions are inserted or moved to Kame.
+# ---------------------------------------------------------------------------
+
+def _refrescar_contadores(cur, archivos: Iterable[str]) -> None:
+    archivos = sorted({a for a in archivos if a})
+    if not archivos:
+        return
+    cur.execute(
+        """
+        UPDATE estados_cuenta ec
+        SET N_TRANSACCIONES     = COALESCE(t.n, 0),
+            MONTO_TRANSACCIONES = COALESCE(t.monto, 0),
+            N_PENDIENTES_KAME   = COALESCE(t.pendientes, 0)
+        FROM unnest(%s::text[]) AS a(archivo)
+        LEFT JOIN (
+            SELECT ARCHIVO_ORIGEN,
+                   COUNT(*)                               AS n,
+                   SUM(MONTO_TOTAL::float8)               AS monto,
+                   COUNT(*) FILTER (WHERE FACT_KAME = 0)  AS pendientes
+            FROM transacciones
+            WHERE ARCHIVO_ORIGEN = ANY(%s)
+            GROUP BY ARCHIVO_ORIGEN
+        ) t ON t.ARCHIVO_ORIGEN = a.archivo
+        WHERE ec.ARCHIVO_ORIGEN = a.archivo;
+        """,
+        (archivos, archivos),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Learned classification (clasificacion_descripcion)
+#   DESCRIPCION -> TIPO_GASTO of the most recently written row with a
+#   non-empty TIPO_GASTO. Updated by every writer that sets TIPO_GASTO so
+#   auto-categorization never has to scan transacciones.
+# ---------------------------------------------------------------------------
+
+def _aprender_clasificacion(cur, where: str, params: Iterable[Any]) -> None:
+    cur.execute(
+        f"""
+        INSERT INTO clasificacion_descripcion (DESCRIPCION, TIPO_GASTO)
+        SELECT DISTINCT ON (DESCRIPCION) DESCRIPCION, TIPO_GASTO
+        FROM transacciones
+        WHERE ({where}) AND DESCRIPCION IS NOT NULL
+          AND TIPO_GASTO IS NOT NULL AND TIPO_GASTO != ''
+        ORDER BY DESCRIPCION, id DESC
+        ON CONFLICT (DESCRIPCION) DO UPDATE SET TIPO_GASTO = EXCLUDED.TIPO_GASTO;
+        """,
+        list(params),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Data version (version_datos.n)
+#   Bumped in the same transaction as every write the traspaso lists
+#   depend on (inserted transactions or statements, matches, undo, reset),
+#   so caches key on one indexed row instead of fingerprinting the tables.
+# ---------------------------------------------------------------------------
+
+_VERSION_DATOS_SQL = "UPDATE version_datos SET n = n + 1;"
+
+
+def _subir_version_datos(cur) -> None:
+    cur.execute(_VERSION_DATOS_SQL)
+
+
+# ---------------------------------------------------------------------------
+# Connect (schema changes live in data/migraciones.py)
+# ---------------------------------------------------------------------------
+
+def _connect(db_url: str):
+    from urllib.parse import urlparse as _up, unquote as _uq, parse_qs as _pq
+    _u = _up(db_url.replace("#", "%23"))
+    sslmode = _pq(_u.query).get("sslmode", ["require"])[0]  # ?sslmode=disable for local servers
+    conn = psycopg2.connect(host=_u.hostname, port=_u.port, dbname=_u.path.lstrip("/"), user=_u.username, password=_uq(_u.password), sslmode=sslmode)
+    conn.autocommit = False
+    return conn
+
+
+def init_db(db_url: str):
+    """Connect to Supabase/PostgreSQL, apply pending schema migrations, return connection."""
+    from data.migraciones import migrar  # migraciones imports this module
+
+    conn = _connect(db_url)
+    migrar(conn)
     return conn
 
 
+# ---------------------------------------------------------------------------
+# Connection pool
+# ---------------------------------------------------------------------------
+
+# Errors after which a connection is considered dead and is not reused.
+_CONN_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+
+class ConnectionPool:
+    """Thread-safe psycopg2 pool with per-request checkout.
+
+    No liveness ping on checkout: a connection is only replaced when using it
+    actually raises a connection error, or when it sat idle longer than
+    `max_idle` seconds (Neon drops idle connections server-side, so those are
+    reaped before they can fail). `minconn` connections are opened eagerly
+    and the schema is initialised once, on creation.
+    """
+
+    def __init__(
+        self,
+        db_url: str,
+        minconn: int = 1,
+        maxconn: int = 5,
+        max_idle: float = 240.0,
+        timeout: float = 30.0,
+    ):
+        if minconn < 0 or maxconn < max(1, minconn):
+            raise ValueError("invalid pool sizes")
+        self.db_url = db_url
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._idle: List[Tuple[Any, float]] = []   # (conn, returned_at), LIFO
+        self._in_use = 0
+        self._closed = False
+
+        conn = init_db(db_url)
+        self._idle.append((conn, time.monotonic()))
+        for _ in range(minconn - 1):
+            self._idle.append((_connect(db_url), time.monotonic()))
+
+    def _reap(self) -> None:
+        """Close idle connections that are closed or older than max_idle."""
+        now = time.monotonic()
+        keep = []
+        for conn, since in self._idle:
+            if conn.closed or now - since > self.max_idle:
+                _close_quietly(conn)
+            else:
+                keep.append((conn, since))
+        self._idle = keep
+
+    def getconn(self):
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise psycopg2.pool.PoolError("connection pool is closed")
+                self._reap()
+                if self._idle:
+                    conn, _ = self._idle.pop()
+                    self._in_use += 1
+                    return conn
+                if self._in_use < self.maxconn:
+                    self._in_use += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise psycopg2.pool.PoolError("connection pool exhausted")
+                self._cond.wait(remaining)
+        try:
+            return _connect(self.db_url)
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def putconn(self, conn, discard: bool = False) -> None:
+        if not discard and not conn.closed:
+            try:
+                conn.rollback()   # no round trip unless a transaction is open
+            except _CONN_ERRORS:
+                discard = True
+        if discard or conn.closed:
+            _close_quietly(conn)
+        with self._cond:
+            self._in_use -= 1
+            if not (discard or conn.closed or self._closed):
+                self._idle.append((conn, time.monotonic()))
+            self._reap()
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the duration of the block.
+
+        If the block fails with a connection-level error the connection is
+        dropped, so the next checkout transparently gets a fresh one.
+        """
+        conn = self.getconn()
+        try:
+            yield conn
+        except _CONN_ERRORS:
+            self.putconn(conn, discard=True)
+            raise
+        except BaseException:
+            self.putconn(conn)
+            raise
+        else:
+            self.putconn(conn)
+
+    def closeall(self) -> None:
+        with self._cond:
+            self._closed = True
+            for conn, _ in self._idle:
+                _close_quietly(conn)
+            self._idle = []
+            self._cond.notify_all()
+
+
+def _close_quietly(conn) -> None:
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
 # ---------------------------------------------------------------------------
 # Processed-file dedup
 # ---------------------------------------------------------------------------
@@ -158,101 +423,329 @@ def registrar_archivo_procesado(conn, filename: str) -> None:
 # Transactions
 # ---------------------------------------------------------------------------
 
-def insertar_transacciones(conn, rows: Iterable[Dict[str, Any]]) -> int:
-    rows = list(rows)
-    if not rows:
-        return 0
+# Above this many rows a batch is streamed with COPY instead of INSERT pages.
+COPY_THRESHOLD = 500
+_VALUES_PAGE_SIZE = 500
+
+
+def _fila_transaccion(r: Dict[str, Any], clave: str) -> tuple:
+    return (
+        r.get("ORIGEN", ""),
+        r.get("TITULAR_NOMBRE"),
+        r.get("FECHA_OPERACION", ""),
+        _fecha_operacion(r.get("FECHA_OPERACION")),
+        r.get("DESCRIPCION", ""),
+        r.get("CIUDAD", ""),
+        r.get("PAIS", ""),
+        r.get("REF_INTERNACIONAL", ""),
+        r.get("MONTO_ORIGEN"),
+        r.get("MONTO_OPERACION"),
+        r.get("MONTO_TOTAL"),
+        r.get("MONTO_CLP"),
+        r.get("MONEDA", ""),
+        r.get("TIPO_GASTO", ""),
+        int(r.get("CONCILIADO") or 0),
+        int(r.get("FACT_KAME") or 0),
+        int(r.get("TRASPASADO") or 0),
+        r.get("CLASE") or clase_transaccion(r.get("DESCRIPCION"), r.get("MONTO_TOTAL")),
+        r.get("ARCHIVO_ORIGEN", ""),
+        clave,
+    )
 
+
+def _monto_clave(v: Any) -> str:
+    # Round through float4 first: MONTO_TOTAL is REAL, so a value read back
+    # from the table must hash the same as the one parsed from the PDF.
+    if v is None:
+        return ""
+    return f"{struct.unpack('f', struct.pack('f', float(v)))[0]:.2f}"
+
+
+def _claves_naturales(
+    rows: Iterable[Dict[str, Any]], vistos: Optional[Dict[str, int]] = None
+) -> List[str]:
+    """Natural key per row: md5 of titular, fecha, ref, descripcion, monto,
+    archivo and the row's ordinal among identical rows of the sequence.
+
+    The ordinal keeps genuinely repeated purchases (same day, same amount)
+    apart while a re-ingest of the same statement maps onto the same keys.
+    Rows that already carry CLAVE_NATURAL keep it. Pass the same `vistos`
+    dict for consecutive chunks of one statement to keep ordinals running.
+    """
+    vistos = {} if vistos is None else vistos
+    claves = []
+    for r in rows:
+        if r.get("CLAVE_NATURAL"):
+            claves.append(r["CLAVE_NATURAL"])
+            continue
+        base = "\x1f".join((
+            r.get("TITULAR_NOMBRE") or "",
+            r.get("FECHA_OPERACION") or "",
+            r.get("REF_INTERNACIONAL") or "",
+            r.get("DESCRIPCION") or "",
+            _monto_clave(r.get("MONTO_TOTAL")),
+            r.get("ARCHIVO_ORIGEN") or "",
+        ))
+        n = vistos.get(base, 0)
+        vistos[base] = n + 1
+        claves.append(hashlib.md5(f"{base}\x1f{n}".encode("utf-8")).hexdigest())
+    return claves
+
+
+def _copy_field(v: Any) -> str:
+    """Encode one value for COPY ... FROM STDIN (text format)."""
+    if v is None:
+        return "\\N"
+    return (
+        str(v).replace("\\", "\\\\").replace("\t", "\\t")
+        .replace("\n", "\\n").replace("\r", "\\r")
+    )
+
+
+def _insert_values(cur, data: List[tuple]) -> List[int]:
+    """Multi-row INSERT pages — one round trip per _VALUES_PAGE_SIZE rows."""
     col_list = ", ".join(TRANSACCIONES_COLS)
-    placeholders = ", ".join(["%s"] * len(TRANSACCIONES_COLS))
+    returned = psycopg2.extras.execute_values(
+        cur,
+        f"INSERT INTO transacciones ({col_list}) VALUES %s "
+        f"ON CONFLICT (CLAVE_NATURAL) DO NOTHING RETURNING id",
+        data,
+        page_size=_VALUES_PAGE_SIZE,
+        fetch=True,
+    )
+    return [r[0] for r in returned]
 
-    data = [
-        (
-            r.get("ORIGEN", ""),
-            r.get("TITULAR_NOMBRE"),
-            r.get("FECHA_OPERACION", ""),
-            r.get("DESCRIPCION", ""),
-            r.get("CIUDAD", ""),
-            r.get("PAIS", ""),
-            r.get("REF_INTERNACIONAL", ""),
-            r.get("MONTO_ORIGEN"),
-            r.get("MONTO_OPERACION"),
-            r.get("MONTO_TOTAL"),
-            r.get("MONTO_CLP"),
-            r.get("MONEDA", ""),
-            r.get("TIPO_GASTO", ""),
-            int(r.get("CONCILIADO") or 0),
-            int(r.get("FACT_KAME") or 0),
-            int(r.get("TRASPASADO") or 0),
-            r.get("ARCHIVO_ORIGEN", ""),
-        )
-        for r in rows
-    ]
+
+def _insert_copy(cur, data: List[tuple]) -> List[int]:
+    """Stream rows into a temp staging table with COPY, then move them over
+    with a single INSERT ... SELECT so the generated ids can be returned."""
+    col_list = ", ".join(TRANSACCIONES_COLS)
+    cur.execute(
+        f"CREATE TEMP TABLE IF NOT EXISTS _tx_stage ON COMMIT DROP AS "
+        f"SELECT {col_list} FROM transacciones WITH NO DATA;"
+    )
+    buf = io.StringIO()
+    for row in data:
+        buf.write("\t".join(_copy_field(v) for v in row))
+        buf.write("\n")
+    buf.seek(0)
+    cur.copy_expert(f"COPY _tx_stage ({col_list}) FROM STDIN", buf)
+    cur.execute(
+        f"INSERT INTO transacciones ({col_list}) SELECT {col_list} FROM _tx_stage "
+        f"ON CONFLICT (CLAVE_NATURAL) DO NOTHING RETURNING id;"
+    )
+    ids = [r[0] for r in cur.fetchall()]
+    cur.execute("TRUNCATE _tx_stage;")
+    return ids
+
+
+def insertar_transacciones_bulk(conn, rows: Iterable[Dict[str, Any]]) -> List[int]:
+    """Insert rows and return the ids of those actually inserted.
+
+    Rows whose natural key already exists are skipped (ON CONFLICT DO
+    NOTHING), so re-ingesting a statement is a no-op. Large batches go
+    through COPY FROM STDIN; smaller ones (and COPY failures, e.g. poolers
+    that reject COPY) use multi-row execute_values pages.
+    """
+    rows = list(rows)
+    data = [_fila_transaccion(r, k) for r, k in zip(rows, _claves_naturales(rows), strict=True)]
+    if not data:
+        return []
 
     try:
         with conn.cursor() as cur:
-            psycopg2.extras.execute_many(
-                cur,
-                f"INSERT INTO transacciones ({col_list}) VALUES ({placeholders});",
-                data,
-            )
+            if len(data) >= COPY_THRESHOLD:
+                try:
+                    cur.execute("SAVEPOINT bulk_copy;")
+                    ids = _insert_copy(cur, data)
+                    cur.execute("RELEASE SAVEPOINT bulk_copy;")
+                except psycopg2.Error:
+                    _log.warning("COPY into transacciones failed, falling back to INSERT pages", exc_info=True)
+                    cur.execute("ROLLBACK TO SAVEPOINT bulk_copy;")
+                    ids = _insert_values(cur, data)
+            else:
+                ids = _insert_values(cur, data)
+            _resumen_aplicar(cur, "id = ANY(%s)", [ids], 1)
+            _refrescar_contadores(cur, (row[_IDX_ARCHIVO] for row in data))
+            _aprender_clasificacion(cur, "id = ANY(%s)", [ids])
+            if ids:
+                _subir_version_datos(cur)
         conn.commit()
     except Exception:
         conn.rollback()
         raise
-    return len(rows)
+    return ids
+
+
+def insertar_transacciones(conn, rows: Iterable[Dict[str, Any]]) -> Tuple[int, int]:
+    """Insert rows; returns (inserted, skipped as already stored)."""
+    rows = list(rows)
+    n = len(insertar_transacciones_bulk(conn, rows))
+    return n, len(rows) - n
 
 
 def fetch_transacciones(
     conn, origen: Optional[str] = None
 ) -> Tuple[List[str], List[tuple]]:
     """Return (cols, rows) with id exposed as _RID_. Filter by ORIGEN if given."""
-    sort = _sort_expr("FECHA_OPERACION")
     with conn.cursor() as cur:
         if origen:
             cur.execute(
-                f"SELECT id AS _RID_, * FROM transacciones WHERE ORIGEN = %s ORDER BY {sort}",
+                "SELECT id AS _RID_, * FROM transacciones WHERE ORIGEN = %s "
+                "ORDER BY FECHA_OPERACION_DT, id",
                 (origen,),
             )
         else:
             cur.execute(
-                f"SELECT id AS _RID_, * FROM transacciones ORDER BY {sort}"
+                "SELECT id AS _RID_, * FROM transacciones ORDER BY FECHA_OPERACION_DT, id"
             )
-        cols = [d[0] for d in cur.description]
-        return cols, cur.fetchall()
+        return _cols(cur), cur.fetchall()
+
+
+def _filtro_transacciones(
+    origen: str,
+    fact_kame: Optional[int],
+    desde: Optional[date],
+    hasta: Optional[date],
+) -> Tuple[str, list]:
+    where = ["ORIGEN = %s"]
+    params: list = [origen]
+    if fact_kame is not None:
+        where.append("FACT_KAME = %s")
+        params.append(int(fact_kame))
+    if desde is not None:
+        where.append("FECHA_OPERACION_DT >= %s")
+        params.append(desde)
+    if hasta is not None:
+        where.append("FECHA_OPERACION_DT <= %s")
+        params.append(hasta)
+    return " AND ".join(where), params
+
+
+def fetch_transacciones_pagina(
+    conn,
+    origen: str,
+    fact_kame: Optional[int] = None,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    despues: Optional[Tuple[Optional[date], int]] = None,
+    limite: Optional[int] = 20,
+) -> Tuple[List[str], List[tuple]]:
+    """One page of transactions in (FECHA_OPERACION_DT, id) order.
+
+    `despues` is the (fecha, id) keyset cursor of the last row of the previous
+    page (None for the first page); `limite=None` returns every remaining row.
+    """
+    where, params = _filtro_transacciones(origen, fact_kame, desde, hasta)
+    order = "ORDER BY FECHA_OPERACION_DT, id"
+    lim = "" if limite is None else f" LIMIT {int(limite)}"
+    select = "SELECT id AS _RID_, * FROM transacciones WHERE"
+
+    if despues is None:
+        sql = f"{select} {where} {order}{lim}"
+    elif despues[0] is None:
+        sql = f"{select} {where} AND FECHA_OPERACION_DT IS NULL AND id > %s {order}{lim}"
+        params = params + [int(despues[1])]
+    else:
+        # Rows without a date sort last (NULLS LAST) and can't take part in the
+        # row comparison, so they are appended as a second index-backed branch.
+        sql = (
+            f"({select} {where} AND (FECHA_OPERACION_DT, id) > (%s, %s) {order}{lim}) "
+            f"UNION ALL ({select} {where} AND FECHA_OPERACION_DT IS NULL ORDER BY id{lim}) "
+            f"{order}{lim}"
+        )
+        params = params + [despues[0], int(despues[1])] + params
+    with conn.cursor() as cur:
+        cur.execute(sql, params)
+        return _cols(cur), cur.fetchall()
+
+
+def contar_transacciones(
+    conn,
+    origen: str,
+    fact_kame: Optional[int] = None,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+) -> int:
+    where, params = _filtro_transacciones(origen, fact_kame, desde, hasta)
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT COUNT(*) FROM transacciones WHERE {where}", params)
+        return int(cur.fetchone()[0])
+
+
+def _update_clasificacion(cur, updates: List[Dict[str, Any]]) -> None:
+    if not updates:
+        return
+    ids = [int(u["_RID_"]) for u in updates]
+    _resumen_aplicar(cur, "id = ANY(%s)", [ids], -1)
+    cur.execute(
+        """
+        UPDATE transacciones t SET TIPO_GASTO = u.tipo, CONCILIADO = u.conciliado
+        FROM unnest(%s::int[], %s::text[], %s::int[]) AS u(id, tipo, conciliado)
+        WHERE t.id = u.id;
+        """,
+        (
+            ids,
+            [u.get("TIPO_GASTO") or "" for u in updates],
+            [int(bool(u.get("CONCILIADO"))) for u in updates],
+        ),
+    )
+    _resumen_aplicar(cur, "id = ANY(%s)", [ids], 1)
+    _aprender_clasificacion(cur, "id = ANY(%s)", [ids])
 
 
 def update_clasificacion(conn, updates: List[Dict[str, Any]]) -> None:
     if not updates:
         return
     with conn.cursor() as cur:
-        psycopg2.extras.execute_many(
-            cur,
-            "UPDATE transacciones SET TIPO_GASTO = %s, CONCILIADO = %s WHERE id = %s;",
-            [
-                (
-                    u.get("TIPO_GASTO") or "",
-                    int(bool(u.get("CONCILIADO"))),
-                    int(u["_RID_"]),
-                )
-                for u in updates
-            ],
-        )
+        _update_clasificacion(cur, updates)
     conn.commit()
 
 
+def _marcar_fact_kame(cur, rowids: List[int]) -> None:
+    ids = [int(r) for r in rowids]
+    if not ids:
+        return
+    _resumen_aplicar(cur, "id = ANY(%s) AND FACT_KAME != 1", [ids], -1)
+    cur.execute(
+        "UPDATE transacciones SET FACT_KAME = 1 WHERE id = ANY(%s) AND FACT_KAME != 1 RETURNING id;",
+        (ids,),
+    )
+    changed = [r[0] for r in cur.fetchall()]
+    _resumen_aplicar(cur, "id = ANY(%s)", [changed], 1)
+    cur.execute(
+        "SELECT DISTINCT ARCHIVO_ORIGEN FROM transacciones WHERE id = ANY(%s);", (changed,)
+    )
+    _refrescar_contadores(cur, [r[0] for r in cur.fetchall()])
+
+
 def marcar_fact_kame(conn, rowids: List[int]) -> None:
     if not rowids:
         return
     with conn.cursor() as cur:
-        psycopg2.extras.execute_many(
-            cur,
-            "UPDATE transacciones SET FACT_KAME = 1 WHERE id = %s;",
-            [(int(r),) for r in rowids],
-        )
+        _marcar_fact_kame(cur, rowids)
     conn.commit()
 
 
+def guardar_clasificacion(
+    conn, updates: List[Dict[str, Any]], kame_ids: Optional[List[int]] = None
+) -> int:
+    """Persist edited rows (TIPO_GASTO/CONCILIADO), propagate their TIPO_GASTO
+    and optionally mark rows as entered in Kame — all in one transaction.
+    Returns the number of rows the propagation changed."""
+    try:
+        with conn.cursor() as cur:
+            _update_clasificacion(cur, updates)
+            n = _propagar(cur, updates)
+            if kame_ids:
+                _marcar_fact_kame(cur, kame_ids)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return n
+
+
 # ---------------------------------------------------------------------------
 # Statements + traspaso reconciliation
 # ---------------------------------------------------------------------------
@@ -265,8 +758,9 @@ def upsert_estado_cuenta(conn, meta: Dict[str, Any]) -> None:
             """
             INSERT INTO estados_cuenta
                 (ORIGEN, TITULAR_NOMBRE, ARCHIVO_ORIGEN, FECHA_ESTADO,
-                 PERIODO_DESDE, PERIODO_HASTA, DEUDA_TOTAL, MONEDA)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                 PERIODO_DESDE, PERIODO_HASTA, DEUDA_TOTAL, MONEDA,
+                 FECHA_ESTADO_DT, PERIODO_DESDE_DT, PERIODO_HASTA_DT)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             ON CONFLICT (ARCHIVO_ORIGEN) DO NOTHING;
             """,
             (
@@ -278,24 +772,169 @@ def upsert_estado_cuenta(conn, meta: Dict[str, Any]) -> None:
                 meta.get("PERIODO_HASTA"),
                 meta.get("DEUDA_TOTAL"),
                 meta.get("MONEDA", ""),
+                _fecha_estado(meta.get("FECHA_ESTADO")),
+                _fecha_estado(meta.get("PERIODO_DESDE")),
+                _fecha_estado(meta.get("PERIODO_HASTA")),
             ),
         )
+        if cur.rowcount:
+            _subir_version_datos(cur)
+        _refrescar_contadores(cur, [meta["ARCHIVO_ORIGEN"]])
     conn.commit()
 
 
+def estados_cargados(conn, archivos: Iterable[str]) -> set:
+    """The subset of ARCHIVO_ORIGEN values that already have a stored statement."""
+    archivos = sorted({a for a in archivos if a})
+    if not archivos:
+        return set()
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT ARCHIVO_ORIGEN FROM estados_cuenta WHERE ARCHIVO_ORIGEN = ANY(%s)",
+            (archivos,),
+        )
+        return {r[0] for r in cur.fetchall()}
+
+
 def fetch_estados_cuenta(
     conn, origen: Optional[str] = None
 ) -> Tuple[List[str], List[tuple]]:
     with conn.cursor() as cur:
         if origen:
             cur.execute(
-                "SELECT * FROM estados_cuenta WHERE ORIGEN = %s ORDER BY FECHA_ESTADO",
+                "SELECT * FROM estados_cuenta WHERE ORIGEN = %s ORDER BY FECHA_ESTADO_DT, id",
                 (origen,),
             )
         else:
-            cur.execute("SELECT * FROM estados_cuenta ORDER BY ORIGEN, FECHA_ESTADO")
-        cols = [d[0] for d in cur.description]
-        return cols, cur.fetchall()
+            cur.execute("SELECT * FROM estados_cuenta ORDER BY ORIGEN, FECHA_ESTADO_DT, id")
+        return _cols(cur), cur.fetchall()
+
+
+# Rate = |national CLP line| / |statement DEUDA TOTAL|; the statement's
+# transactions get TRASPASADO=1 and MONTO_CLP at that rate. REAL goes
+# through text so the rate uses the displayed values (a direct float8 cast
+# carries float4 noise into MONTO_CLP). The rollup delta brackets the
+# transaction update inside the same statement batch.
+_ARCHIVOS_ESTADOS = (
+    "ARCHIVO_ORIGEN IN (SELECT ARCHIVO_ORIGEN FROM estados_cuenta WHERE id = ANY(%(ids)s))"
+)
+# A pair is applied only if its statement is not TRASPASADO yet and its
+# national line is neither matched to another statement nor claimed by an
+# earlier pair of the batch — a stale proposal (another session matched in
+# the meantime) must not overwrite a match or reuse a line.
+_MARCAR_TRASPASOS = """
+    WITH pares AS (
+        SELECT * FROM unnest(%(ids)s::int[], %(rids)s::int[], %(archivos)s::text[])
+                 WITH ORDINALITY AS p(estado_id, rid, archivo, n)
+    ),
+    calc AS (
+        SELECT p.estado_id, p.rid, p.archivo, ec.ARCHIVO_ORIGEN AS estado_archivo,
+               CASE WHEN t.MONTO_TOTAL <> 0 AND ec.DEUDA_TOTAL <> 0
+                    THEN abs(t.MONTO_TOTAL::text::float8) / abs(ec.DEUDA_TOTAL::text::float8)
+               END AS tasa
+        FROM pares p
+        JOIN estados_cuenta ec ON ec.id = p.estado_id
+        LEFT JOIN transacciones t ON t.id = p.rid
+        WHERE ec.TRASPASO_ESTADO <> 'TRASPASADO'
+          AND NOT EXISTS (SELECT 1 FROM pares q WHERE q.estado_id = p.estado_id AND q.n < p.n)
+          AND (p.rid IS NULL OR (
+              NOT EXISTS (SELECT 1 FROM estados_cuenta o WHERE o.MATCH_RID = p.rid)
+              AND NOT EXISTS (SELECT 1 FROM pares q WHERE q.rid = p.rid AND q.n < p.n)
+          ))
+    ),
+    ec_upd AS (
+        UPDATE estados_cuenta ec
+        SET TRASPASO_ESTADO = 'TRASPASADO', MATCH_RID = c.rid,
+            MATCH_ARCHIVO = c.archivo, TASA_CAMBIO = c.tasa
+        FROM calc c
+        WHERE ec.id = c.estado_id
+        RETURNING ec.id
+    ),
+    tx_upd AS (
+        UPDATE transacciones t
+        SET TRASPASADO = 1,
+            MONTO_CLP = CASE WHEN c.tasa IS NULL THEN t.MONTO_CLP
+                             ELSE ROUND(CAST(t.MONTO_OPERACION * c.tasa AS NUMERIC)) END
+        FROM calc c
+        WHERE t.ARCHIVO_ORIGEN = c.estado_archivo
+    )
+    -- Statements actually updated, kept for the batch's last statement
+    SELECT set_config('cartolas.traspasos_aplicados', count(*)::text, true) FROM ec_upd;
+"""
+_VERSION_TRASPASOS = """
+    UPDATE version_datos SET n = n + 1
+    WHERE current_setting('cartolas.traspasos_aplicados')::int > 0;
+"""
+# Applied count, plus the pairs that did not end up as requested (the
+# conflicts) after the update — one row either way.
+_CONFLICTOS_TRASPASOS = """
+    SELECT current_setting('cartolas.traspasos_aplicados')::int,
+           COALESCE(array_agg(estado_id ORDER BY n) FILTER (WHERE conflicto), '{}'),
+           COALESCE(array_agg(rid ORDER BY n) FILTER (WHERE conflicto), '{}')
+    FROM (
+        SELECT p.estado_id, p.rid, p.n,
+               ec.id IS NULL OR ec.TRASPASO_ESTADO <> 'TRASPASADO'
+               OR ec.MATCH_RID IS DISTINCT FROM p.rid AS conflicto
+        FROM unnest(%(ids)s::int[], %(rids)s::int[]) WITH ORDINALITY AS p(estado_id, rid, n)
+        LEFT JOIN estados_cuenta ec ON ec.id = p.estado_id
+    ) p;
+"""
+
+_LOCK_TRASPASOS = 0x74727370  # pg_advisory_xact_lock key ("trsp"): one marker at a time
+
+
+def _marcar_traspasos(
+    cur, pares: List[Tuple[int, Optional[int], Optional[str]]]
+) -> Tuple[int, List[Tuple[int, Optional[int]]]]:
+    """Mark (estado_id, match_rid, match_archivo) pairs in one round trip.
+
+    Returns (statements actually updated, (estado_id, match_rid) pairs
+    skipped as conflicts). The advisory lock serialises concurrent markers,
+    so each sees the other's matches.
+    """
+    ids = [int(e) for e, _, _ in pares]
+    cur.execute(
+        "SELECT pg_advisory_xact_lock(%(lock)s);"
+        + _resumen_sql(_ARCHIVOS_ESTADOS, -1)
+        + _MARCAR_TRASPASOS
+        + _resumen_sql(_ARCHIVOS_ESTADOS, 1)
+        + _VERSION_TRASPASOS
+        + _CONFLICTOS_TRASPASOS,
+        {
+            "lock": _LOCK_TRASPASOS,
+            "ids": ids,
+            "rids": [int(r) if r is not None else None for _, r, _ in pares],
+            "archivos": [a for _, _, a in pares],
+        },
+    )
+    aplicados, estados, rids = cur.fetchone()
+    return aplicados, [(int(e), r) for e, r in zip(estados, rids, strict=True)]
+
+
+def marcar_traspasos(
+    conn, pares: Iterable[Tuple[int, Optional[int], Optional[str]]]
+) -> Tuple[int, List[Tuple[int, Optional[int]]]]:
+    """Mark several statements as traspasado at once.
+
+    Returns (applied, conflicts): applied counts the statements this call
+    updated — a pair repeated in `pares`, or already in place, is not
+    counted. Conflicts are the (estado_id, match_rid) pairs left untouched
+    because the statement was already TRASPASADO or the national line is
+    already matched (or claimed twice in `pares`).
+    """
+    pares = list(pares)
+    if not pares:
+        return 0, []
+    try:
+        with conn.cursor() as cur:
+            aplicados, conflictos = _marcar_traspasos(cur, pares)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    if conflictos:
+        _log.warning("traspaso pairs skipped (already matched): %s", conflictos)
+    return aplicados, conflictos
 
 
 def marcar_traspaso(
@@ -303,54 +942,10 @@ def marcar_traspaso(
     estado_id: int,
     match_rid: Optional[int],
     match_archivo: Optional[str],
-) -> None:
-    with conn.cursor() as cur:
-        cur.execute(
-            "SELECT ARCHIVO_ORIGEN, DEUDA_TOTAL FROM estados_cuenta WHERE id = %s",
-            (estado_id,),
-        )
-        row = cur.fetchone()
-
-    tasa = None
-    if match_rid is not None and row and row[1]:
-        with conn.cursor() as cur:
-            cur.execute(
-                "SELECT MONTO_TOTAL FROM transacciones WHERE id = %s", (int(match_rid),)
-            )
-            clp_row = cur.fetchone()
-        deuda_usd = row[1]
-        if clp_row and clp_row[0] and deuda_usd:
-            try:
-                tasa = abs(float(clp_row[0])) / abs(float(deuda_usd))
-            except (ZeroDivisionError, ValueError):
-                tasa = None
-
-    with conn.cursor() as cur:
-        cur.execute(
-            """
-            UPDATE estados_cuenta
-            SET TRASPASO_ESTADO = 'TRASPASADO', MATCH_RID = %s,
-                MATCH_ARCHIVO = %s, TASA_CAMBIO = %s
-            WHERE id = %s;
-            """,
-            (match_rid, match_archivo, tasa, int(estado_id)),
-        )
-        if row and row[0]:
-            if tasa is not None:
-                cur.execute(
-                    """
-                    UPDATE transacciones
-                    SET TRASPASADO = 1, MONTO_CLP = ROUND(CAST(MONTO_OPERACION * %s AS NUMERIC))
-                    WHERE ARCHIVO_ORIGEN = %s;
-                    """,
-                    (tasa, row[0]),
-                )
-            else:
-                cur.execute(
-                    "UPDATE transacciones SET TRASPASADO = 1 WHERE ARCHIVO_ORIGEN = %s;",
-                    (row[0],),
-                )
-    conn.commit()
+) -> bool:
+    """Mark one statement; False if nothing was updated (it or the line was already matched)."""
+    aplicados, _ = marcar_traspasos(conn, [(estado_id, match_rid, match_archivo)])
+    return aplicados == 1
 
 
 def desmarcar_traspaso(conn, estado_id: int) -> None:
@@ -369,28 +964,30 @@ def desmarcar_traspaso(conn, estado_id: int) -> None:
             (int(estado_id),),
         )
         if row and row[0]:
+            _resumen_aplicar(cur, "ARCHIVO_ORIGEN = %s", [row[0]], -1)
             cur.execute(
                 "UPDATE transacciones SET TRASPASADO = 0, MONTO_CLP = NULL WHERE ARCHIVO_ORIGEN = %s;",
                 (row[0],),
             )
+            _resumen_aplicar(cur, "ARCHIVO_ORIGEN = %s", [row[0]], 1)
+        _subir_version_datos(cur)
     conn.commit()
 
 
 def fetch_traspaso_nacional_disponibles(conn) -> List[Dict[str, Any]]:
-    sort = _sort_expr("t.FECHA_OPERACION")
     with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
         cur.execute(
-            f"""
+            """
             SELECT t.id AS rid, t.FECHA_OPERACION AS fecha,
                    t.MONTO_TOTAL AS clp, t.ARCHIVO_ORIGEN AS archivo
             FROM transacciones t
-            WHERE t.ORIGEN = 'NACIONAL'
-              AND UPPER(t.DESCRIPCION) LIKE '%TRASPASO DEUDA INTERNAC%'
-              AND t.id NOT IN (
-                  SELECT MATCH_RID FROM estados_cuenta WHERE MATCH_RID IS NOT NULL
+            WHERE t.ORIGEN = 'NACIONAL' AND t.CLASE = %s
+              AND NOT EXISTS (
+                  SELECT 1 FROM estados_cuenta ec WHERE ec.MATCH_RID = t.id
               )
-            ORDER BY {sort}
-            """
+            ORDER BY t.FECHA_OPERACION_DT, t.id
+            """,
+            (clases.TRASPASO_INTL,),
         )
         return [dict(r) for r in cur.fetchall()]
 
@@ -412,49 +1009,99 @@ def fetch_estados_intl_pendientes(conn) -> List[Dict[str, Any]]:
 def fetch_traspaso_suggestions(
     conn,
 ) -> Tuple[Dict[int, Dict[str, Any]], set]:
-    nac = fetch_traspaso_nacional_disponibles(conn)
-    nac_by_date: Dict[str, List[Dict[str, Any]]] = {}
-    for n in nac:
-        nac_by_date.setdefault(n["fecha"], []).append(n)
+    """Match pending international statements to national traspaso lines.
 
+    Chain: statement DEUDA TOTAL (USD) == |international TRASPASO credit|
+    (within a cent) -> the credit's date == an unassigned national
+    TRASPASO DEUDA INTERNACIONAL line. One round trip returns the pending
+    statements and every (credit amount, national line) pair; matching is
+    then a probe into a dict keyed by amount in cents.
+
+    Returns (suggestions for statements with exactly one candidate,
+    ids of statements with several candidates).
+    """
     with conn.cursor() as cur:
         cur.execute(
             """
-            SELECT FECHA_OPERACION, MONTO_OPERACION FROM transacciones
-            WHERE ORIGEN = 'INTERNACIONAL'
-              AND UPPER(DESCRIPCION) LIKE '%TRASPASO%'
-              AND MONTO_OPERACION IS NOT NULL
-            """
+            WITH credits AS (
+                SELECT DISTINCT FECHA_OPERACION_DT AS fecha, abs(MONTO_OPERACION) AS usd
+                FROM transacciones
+                WHERE ORIGEN = 'INTERNACIONAL' AND CLASE = ANY(%(traspasos)s)
+                  AND MONTO_OPERACION IS NOT NULL
+            ),
+            nac AS (
+                SELECT t.id AS rid, t.FECHA_OPERACION_DT AS fecha,
+                       t.MONTO_TOTAL AS clp, t.ARCHIVO_ORIGEN AS archivo
+                FROM transacciones t
+                WHERE t.ORIGEN = 'NACIONAL' AND t.CLASE = %(traspaso_intl)s
+                  AND NOT EXISTS (
+                      SELECT 1 FROM estados_cuenta ec WHERE ec.MATCH_RID = t.id
+                  )
+            )
+            SELECT id, DEUDA_TOTAL, NULL::integer, NULL::real, NULL::text
+            FROM estados_cuenta
+            WHERE ORIGEN = 'INTERNACIONAL' AND TRASPASO_ESTADO != 'TRASPASADO'
+              AND DEUDA_TOTAL IS NOT NULL
+            UNION ALL
+            SELECT DISTINCT NULL::integer, c.usd, n.rid, n.clp, n.archivo
+            FROM credits c JOIN nac n ON n.fecha = c.fecha
+            """,
+            {"traspasos": list(clases.TRASPASOS), "traspaso_intl": clases.TRASPASO_INTL},
         )
-        credits = [(f, abs(float(u))) for f, u in cur.fetchall() if u is not None]
+        rows = cur.fetchall()
+
+    # cents -> [(usd, rid, clp, archivo)]
+    por_centavos: Dict[int, List[tuple]] = {}
+    estados = []
+    for est_id, usd, rid, clp, archivo in rows:
+        if est_id is not None:
+            estados.append((int(est_id), float(usd)))
+        else:
+            usd = float(usd)
+            por_centavos.setdefault(round(usd * 100), []).append((usd, rid, clp, archivo))
 
     suggestions: Dict[int, Dict[str, Any]] = {}
     ambiguous: set = set()
-    for est in fetch_estados_intl_pendientes(conn):
-        deuda = est.get("deuda")
-        if deuda is None:
-            continue
-        dates = [f for (f, u) in credits if abs(u - float(deuda)) < 0.01]
-        cands = {n["rid"]: n for d in dates for n in nac_by_date.get(d, [])}
-        cands = list(cands.values())
+    for est_id, deuda in estados:
+        c = round(deuda * 100)
+        cands = {
+            rid: (clp, archivo)
+            for k in (c - 1, c, c + 1)
+            for usd, rid, clp, archivo in por_centavos.get(k, ())
+            if abs(usd - deuda) < 0.01
+        }
         if len(cands) == 1:
-            n = cands[0]
-            suggestions[int(est["id"])] = {
-                "rid": int(n["rid"]),
-                "archivo": n["archivo"],
-                "clp": n["clp"],
-                "tasa": abs(float(n["clp"])) / float(deuda) if deuda else None,
+            rid, (clp, archivo) = next(iter(cands.items()))
+            suggestions[est_id] = {
+                "rid": int(rid),
+                "archivo": archivo,
+                "clp": clp,
+                "tasa": abs(float(clp)) / deuda if deuda else None,
             }
         elif len(cands) > 1:
-            ambiguous.add(int(est["id"]))
+            ambiguous.add(est_id)
     return suggestions, ambiguous
 
 
 def auto_match_traspasos(conn) -> int:
     suggestions, _ = fetch_traspaso_suggestions(conn)
-    for est_id, s in suggestions.items():
-        marcar_traspaso(conn, est_id, s["rid"], s["archivo"])
-    return len(suggestions)
+    aplicados, _ = marcar_traspasos(
+        conn, [(est_id, s["rid"], s["archivo"]) for est_id, s in suggestions.items()]
+    )
+    return aplicados
+
+
+def version_conciliacion(conn) -> int:
+    """Data version the traspaso lists depend on (the version_datos counter).
+
+    Bumped whenever any session or process inserts transactions or a
+    statement, matches or undoes a match, or resets the database — so
+    caches keyed on it are shared and never stale across sessions. A
+    one-row read, whatever the history size.
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT n FROM version_datos;")
+        return cur.fetchone()[0]
 
 
 # ---------------------------------------------------------------------------
@@ -485,22 +1132,10 @@ STATIC_TIPO_GASTO_INTL: list[tuple[str, str]] = [
 
 
 def fetch_tipo_gasto_map(conn) -> dict[str, str]:
-    """Return {DESCRIPCION: TIPO_GASTO} using the most recently inserted row
-    per description that has a non-empty TIPO_GASTO."""
+    """Return {DESCRIPCION: TIPO_GASTO} from the learned-classification table
+    (last non-empty TIPO_GASTO written per description)."""
     with conn.cursor() as cur:
-        cur.execute(
-            """
-            SELECT DESCRIPCION, TIPO_GASTO
-            FROM transacciones
-            WHERE TIPO_GASTO IS NOT NULL AND TIPO_GASTO != ''
-              AND id IN (
-                  SELECT MAX(id)
-                  FROM transacciones
-                  WHERE TIPO_GASTO IS NOT NULL AND TIPO_GASTO != ''
-                  GROUP BY DESCRIPCION
-              )
-            """
-        )
+        cur.execute("SELECT DESCRIPCION, TIPO_GASTO FROM clasificacion_descripcion")
         return {row[0]: row[1] for row in cur.fetchall()}
 
 
@@ -515,23 +1150,368 @@ def auto_tipo_gasto(descripcion: str, historic_map: dict[str, str], origen: str
     return ""
 
 
-def propagar_clasificacion(conn, updates: list[dict]) -> None:
+def _propagar(cur, updates: list[dict]) -> int:
+    pares = [
+        (int(u["_RID_"]), u.get("TIPO_GASTO") or "")
+        for u in updates
+        if u.get("TIPO_GASTO")
+    ]
+    if not pares:
+        return 0
+    # One description -> one tipo: when several edited rows share a description
+    # the last one in `updates` wins, as it did with row-by-row updates.
+    cur.execute(
+        """
+        WITH pares AS (
+            SELECT rid, tipo, ord
+            FROM unnest(%s::int[], %s::text[]) WITH ORDINALITY AS p(rid, tipo, ord)
+        ),
+        fuente AS (
+            SELECT DISTINCT ON (t.DESCRIPCION) t.DESCRIPCION, p.tipo
+            FROM pares p JOIN transacciones t ON t.id = p.rid
+            ORDER BY t.DESCRIPCION, p.ord DESC
+        )
+        SELECT t.id, f.tipo
+        FROM transacciones t JOIN fuente f ON t.DESCRIPCION = f.DESCRIPCION
+        WHERE t.FACT_KAME = 0 AND t.TIPO_GASTO IS DISTINCT FROM f.tipo
+        """,
+        ([p[0] for p in pares], [p[1] for p in pares]),
+    )
+    objetivo = cur.fetchall()
+    if not objetivo:
+        return 0
+    ids = [r[0] for r in objetivo]
+    _resumen_aplicar(cur, "id = ANY(%s)", [ids], -1)
+    cur.execute(
+        """
+        UPDATE transacciones t SET TIPO_GASTO = o.tipo
+        FROM unnest(%s::int[], %s::text[]) AS o(id, tipo)
+        WHERE t.id = o.id
+        """,
+        (ids, [r[1] for r in objetivo]),
+    )
+    _resumen_aplicar(cur, "id = ANY(%s)", [ids], 1)
+    _aprender_clasificacion(cur, "id = ANY(%s)", [ids])
+    return len(ids)
+
+
+def propagar_clasificacion(conn, updates: list[dict]) -> int:
+    """Copy each edited TIPO_GASTO to every pending (non-Kame) row with the
+    same DESCRIPCION in one set-based pass. Returns the number of rows changed."""
     with conn.cursor() as cur:
-        for u in updates:
-            tipo = u.get("TIPO_GASTO") or ""
-            if not tipo:
-                continue
+        n = _propagar(cur, updates)
+    conn.commit()
+    return n
+
+
+# ---------------------------------------------------------------------------
+# Dashboard aggregates — GROUP BY in Postgres, small result sets to the UI
+# ---------------------------------------------------------------------------
+
+def _monto_col(origen: Optional[str]) -> str:
+    """USD amount for the international-only view, CLP total otherwise."""
+    return "MONTO_OPERACION" if origen == "INTERNACIONAL" else "MONTO_TOTAL"
+
+
+def _rango_mes(mes: str) -> Tuple[date, date]:
+    """'YYYY-MM' -> [first day, first day of next month)."""
+    y, m = (int(x) for x in mes.split("-"))
+    return date(y, m, 1), date(y + (m == 12), m % 12 + 1, 1)
+
+
+def _patron_ilike(q: str) -> str:
+    """'%q%' with LIKE wildcards in `q` escaped, for DESCRIPCION ILIKE."""
+    like = q.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{like}%"
+
+
+def _filtro_dashboard(
+    origen: Optional[str], mes: Optional[str], q: Optional[str]
+) -> Tuple[str, list]:
+    where: List[str] = []
+    params: list = []
+    if origen:
+        where.append("ORIGEN = %s")
+        params.append(origen)
+    if mes:
+        desde, hasta = _rango_mes(mes)
+        where.append("FECHA_OPERACION_DT >= %s AND FECHA_OPERACION_DT < %s")
+        params += [desde, hasta]
+    if q and q.strip():
+        where.append("DESCRIPCION ILIKE %s")
+        params.append(_patron_ilike(q))
+    return (" AND ".join(where) or "TRUE"), params
+
+
+def _filtro_resumen(origen: Optional[str], mes: Optional[str]) -> Tuple[str, list]:
+    where: List[str] = []
+    params: list = []
+    if origen:
+        where.append("ORIGEN = %s")
+        params.append(origen)
+    if mes:
+        where.append("MES = %s")
+        params.append(_rango_mes(mes)[0])
+    return (" AND ".join(where) or "TRUE"), params
+
+
+def fetch_dashboard_opciones(conn) -> Tuple[List[str], List[str]]:
+    """Filter choices: (origenes, meses 'YYYY-MM' ascending)."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT DISTINCT ORIGEN FROM resumen_mensual ORDER BY 1")
+        origenes = [r[0] for r in cur.fetchall()]
+        cur.execute(
+            """
+            SELECT DISTINCT to_char(MES, 'YYYY-MM')
+            FROM resumen_mensual WHERE MES != '-infinity' ORDER BY 1
+            """
+        )
+        meses = [r[0] for r in cur.fetchall()]
+    return origenes, meses
+
+
+def fetch_dashboard_kpis(
+    conn, origen: Optional[str] = None, mes: Optional[str] = None, q: Optional[str] = None
+) -> Dict[str, Any]:
+    """Totals for the KPI cards. Expenses are rows with a positive amount;
+    payments (negative amounts) are summed separately as `pagado`.
+
+    Without a search term, counts and totals come from resumen_mensual; only
+    comisiones/intereses/impuestos hit raw rows, filtered by indexed CLASE.
+    """
+    m = _monto_col(origen)
+    where, params = _filtro_dashboard(origen, mes, q)
+    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        if q:
             cur.execute(
-                """
-                UPDATE transacciones
-                SET TIPO_GASTO = %s
-                WHERE DESCRIPCION = (SELECT DESCRIPCION FROM transacciones WHERE id = %s)
-                  AND FACT_KAME = 0
-                  AND (TIPO_GASTO IS NULL OR TIPO_GASTO = '' OR TIPO_GASTO != %s)
+                f"""
+                SELECT
+                    COUNT(*)                                                  AS filas,
+                    COUNT(*) FILTER (WHERE {m} > 0)                           AS count,
+                    COALESCE(SUM({m}::float8) FILTER (WHERE {m} > 0), 0)      AS total,
+                    COUNT(*) FILTER (WHERE {m} > 0 AND CONCILIADO = 1)        AS conciliadas,
+                    COUNT(*) FILTER (WHERE {m} > 0 AND FACT_KAME = 1)         AS kame,
+                    COALESCE(SUM({m}::float8) FILTER (WHERE {m} < 0), 0)      AS pagado,
+                    COUNT(DISTINCT to_char(FECHA_OPERACION_DT, 'YYYY-MM'))    AS meses
+                FROM transacciones
+                WHERE {where}
                 """,
-                (tipo, int(u["_RID_"]), tipo),
+                params,
             )
-    conn.commit()
+        else:
+            rwhere, rparams = _filtro_resumen(origen, mes)
+            cur.execute(
+                f"""
+                SELECT
+                    COALESCE(SUM(N), 0)                                   AS filas,
+                    COALESCE(SUM(N) FILTER (WHERE SIGNO > 0), 0)          AS count,
+                    COALESCE(SUM({m}) FILTER (WHERE SIGNO > 0), 0)        AS total,
+                    COALESCE(SUM(N_CONCILIADO) FILTER (WHERE SIGNO > 0), 0) AS conciliadas,
+                    COALESCE(SUM(N_KAME) FILTER (WHERE SIGNO > 0), 0)     AS kame,
+                    COALESCE(SUM({m}) FILTER (WHERE SIGNO < 0), 0)        AS pagado,
+                    COUNT(DISTINCT MES) FILTER (WHERE MES != '-infinity') AS meses
+                FROM resumen_mensual
+                WHERE {rwhere}
+                """,
+                rparams,
+            )
+        k = dict(cur.fetchone())
+        por_clase = {clases.COMISION: "comisiones", clases.INTERES: "intereses",
+                     clases.IMPUESTO: "impuestos"}
+        cur.execute(
+            f"""
+            SELECT CLASE AS clase, SUM({m}::float8) AS monto
+            FROM transacciones
+            WHERE {where} AND {m} > 0 AND CLASE = ANY(%s)
+            GROUP BY CLASE
+            """,
+            params + [list(por_clase)],
+        )
+        k.update(dict.fromkeys(por_clase.values(), 0.0))
+        k.update((por_clase[r["clase"]], r["monto"]) for r in cur.fetchall())
+    for key in ("filas", "count", "conciliadas", "kame", "meses"):
+        k[key] = int(k[key])
+    for key in ("total", "pagado", "comisiones", "intereses", "impuestos"):
+        k[key] = float(k[key])
+    k["promedio"] = k["total"] / k["count"] if k["count"] else 0.0
+    return k
+
+
+def fetch_top_descripciones(
+    conn, origen: Optional[str] = None, mes: Optional[str] = None,
+    q: Optional[str] = None, limite: int = 10,
+) -> List[Tuple[str, float]]:
+    m = _monto_col(origen)
+    where, params = _filtro_dashboard(origen, mes, q)
+    with conn.cursor() as cur:
+        cur.execute(
+            f"""
+            SELECT DESCRIPCION, SUM({m}::float8) AS total
+            FROM transacciones WHERE {where}
+            GROUP BY DESCRIPCION
+            ORDER BY total DESC NULLS LAST
+            LIMIT %s
+            """,
+            params + [int(limite)],
+        )
+        return [(d, float(t or 0)) for d, t in cur.fetchall()]
+
+
+def fetch_evolucion_mensual(
+    conn, origen: Optional[str] = None, mes: Optional[str] = None, q: Optional[str] = None
+) -> List[Tuple[str, float]]:
+    m = _monto_col(origen)
+    with conn.cursor() as cur:
+        if q:
+            where, params = _filtro_dashboard(origen, mes, q)
+            cur.execute(
+                f"""
+                SELECT to_char(FECHA_OPERACION_DT, 'YYYY-MM') AS mes, SUM({m}::float8)
+                FROM transacciones
+                WHERE {where} AND FECHA_OPERACION_DT IS NOT NULL
+                GROUP BY 1 ORDER BY 1
+                """,
+                params,
+            )
+        else:
+            where, params = _filtro_resumen(origen, mes)
+            cur.execute(
+                f"""
+                SELECT to_char(MES, 'YYYY-MM') AS mes, SUM({m})
+                FROM resumen_mensual
+                WHERE {where} AND MES != '-infinity'
+                GROUP BY 1 ORDER BY 1
+                """,
+                params,
+            )
+        return [(mm, float(t or 0)) for mm, t in cur.fetchall()]
+
+
+def fetch_resumen_tipo_gasto(
+    conn, origen: Optional[str] = None, mes: Optional[str] = None, q: Optional[str] = None
+) -> Tuple[List[tuple], int]:
+    """Spend per TIPO_GASTO (positive amounts only).
+
+    Returns ([(tipo, transacciones, total), ...] ascending by total,
+    count of positive rows without TIPO_GASTO).
+    """
+    m = _monto_col(origen)
+    with conn.cursor() as cur:
+        if q:
+            where, params = _filtro_dashboard(origen, mes, q)
+            cur.execute(
+                f"""
+                SELECT COALESCE(TIPO_GASTO, '') AS tipo, COUNT(*), SUM({m}::float8)
+                FROM transacciones
+                WHERE {where} AND {m} > 0
+                GROUP BY 1
+                ORDER BY 3
+                """,
+                params,
+            )
+        else:
+            where, params = _filtro_resumen(origen, mes)
+            cur.execute(
+                f"""
+                SELECT TIPO_GASTO, SUM(N), SUM({m})
+                FROM resumen_mensual
+                WHERE {where} AND SIGNO > 0
+                GROUP BY 1
+                ORDER BY 3
+                """,
+                params,
+            )
+        rows = cur.fetchall()
+    sin_tipo = sum(int(n) for tipo, n, _ in rows if tipo == "")
+    return [(t, int(n), float(tot)) for t, n, tot in rows if t != ""], sin_tipo
+
+
+def fetch_conteo_estados(conn) -> Dict[str, int]:
+    """Number of loaded statements per ORIGEN."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT ORIGEN, COUNT(*) FROM estados_cuenta GROUP BY ORIGEN")
+        return {o: int(n) for o, n in cur.fetchall()}
+
+
+def fetch_transacciones_filtradas(
+    conn, origen: Optional[str] = None, mes: Optional[str] = None, q: Optional[str] = None
+) -> Tuple[List[str], List[tuple]]:
+    """Detail rows behind the dashboard filters (for the lazy detail table)."""
+    where, params = _filtro_dashboard(origen, mes, q)
+    with conn.cursor() as cur:
+        cur.execute(
+            f"SELECT * FROM transacciones WHERE {where} ORDER BY FECHA_OPERACION_DT, id",
+            params,
+        )
+        return _cols(cur), cur.fetchall()
+
+
+# ---------------------------------------------------------------------------
+# Description search
+#   A pg_trgm GIN index on DESCRIPCION serves both ILIKE '%q%' substring
+#   filters and word-similarity (fuzzy merchant) lookups, so a search
+#   touches only matching rows. pg_trgm is optional: without it search
+#   degrades to a substring scan and fuzzy matching is skipped.
+# ---------------------------------------------------------------------------
+
+# dsn -> (pg_trgm installed, checked at); re-checked after _TRGM_TTL seconds
+# so an extension installed (or dropped) later is picked up without a
+# restart. reintentar_trgm() clears it when it builds the index.
+_TRGM: Dict[str, Tuple[bool, float]] = {}
+_TRGM_TTL = 300.0
+
+
+def _tiene_trgm(conn) -> bool:
+    hit = _TRGM.get(conn.dsn)
+    if hit is None or time.monotonic() - hit[1] > _TRGM_TTL:
+        with conn.cursor() as cur:
+            cur.execute("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm');")
+            hit = (bool(cur.fetchone()[0]), time.monotonic())
+        _TRGM[conn.dsn] = hit
+    return hit[0]
+
+
+def buscar_descripciones(
+    conn, q: str, origen: Optional[str] = None, limite: int = 10, fuzzy: bool = True,
+) -> List[Dict[str, Any]]:
+    """Distinct descriptions matching `q`, best first.
+
+    Substring hits (case-insensitive) rank above fuzzy ones; with pg_trgm,
+    descriptions containing a word similar to `q` (typos, spacing) are
+    included too. Each result: descripcion, n, total, exacta, score.
+    """
+    q = (q or "").strip()
+    if not q:
+        return []
+    m = _monto_col(origen)
+    where = ["DESCRIPCION ILIKE %(like)s"]
+    params = {"q": q, "like": _patron_ilike(q), "limite": int(limite)}
+    score = "1.0"
+    if fuzzy and _tiene_trgm(conn):
+        where = ["(DESCRIPCION ILIKE %(like)s OR %(q)s <%% DESCRIPCION)"]
+        score = "word_similarity(%(q)s, DESCRIPCION)"
+    if origen:
+        where.append("ORIGEN = %(origen)s")
+        params["origen"] = origen
+    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        cur.execute(
+            f"""
+            SELECT DESCRIPCION AS descripcion, COUNT(*) AS n,
+                   COALESCE(SUM({m}::float8), 0) AS total,
+                   DESCRIPCION ILIKE %(like)s AS exacta,
+                   {score} AS score
+            FROM transacciones
+            WHERE {" AND ".join(where)}
+            GROUP BY DESCRIPCION
+            ORDER BY exacta DESC, score DESC, n DESC, DESCRIPCION
+            LIMIT %(limite)s
+            """,
+            params,
+        )
+        return [
+            {**r, "n": int(r["n"]), "total": float(r["total"]), "score": float(r["score"])}
+            for r in cur.fetchall()
+        ]
 
 
 # ---------------------------------------------------------------------------
@@ -539,7 +1519,6 @@ def propagar_clasificacion(conn, updates: list[dict]) -> None:
 # ---------------------------------------------------------------------------
 
 def fetch_archivos_resumen(conn) -> Tuple[List[str], List[tuple]]:
-    # FECHA_ESTADO is DD-MM-YYYY; reformat to YYYYMMDD for correct DESC sort
     with conn.cursor() as cur:
         cur.execute(
             """
@@ -553,11 +1532,10 @@ def fetch_archivos_resumen(conn) -> Tuple[List[str], List[tuple]]:
                 ec.DEUDA_TOTAL      AS deuda_total,
                 ec.MONEDA           AS moneda,
                 ec.TRASPASO_ESTADO  AS traspaso_estado,
-                (SELECT COUNT(*) FROM transacciones t
-                 WHERE t.ARCHIVO_ORIGEN = ec.ARCHIVO_ORIGEN) AS transacciones
+                COALESCE(ec.N_TRANSACCIONES, 0)   AS transacciones,
+                COALESCE(ec.N_PENDIENTES_KAME, 0) AS pendientes_kame
             FROM estados_cuenta ec
-            ORDER BY
-                substring(ec.FECHA_ESTADO,7,4)||substring(ec.FECHA_ESTADO,4,2)||substring(ec.FECHA_ESTADO,1,2) DESC
+            ORDER BY ec.FECHA_ESTADO_DT DESC NULLS LAST, ec.id DESC
             """
         )
         cols = [d[0] for d in cur.description]
@@ -570,5 +1548,6 @@ def fetch_archivos_resumen(conn) -> Tuple[List[str], List[tuple]]:
 
 def reset_db(conn) -> None:
     with conn.cursor() as cur:
-        cur.execute("TRUNCATE transacciones, estados_cuenta, archivos_procesados RESTART IDENTITY CASCADE;")
+        cur.execute("TRUNCATE transacciones, estados_cuenta, archivos_procesados, resumen_mensual, clasificacion_descripcion RESTART IDENTITY CASCADE;")
+        _subir_version_datos(cur)  # never back to 0: caches keyed on old values must miss
     conn.commit()
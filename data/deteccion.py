@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import io
+import logging
+import re
+from typing import Any, Dict, Optional
+
+import pdfplumber
+import pypdfium2 as pdfium
+
+from data import extractor_internacional, extractor_nacional
+
+# ============================================================
+# First-page sniffing of uploaded PDFs.
+# Classifies a statement as BCI nacional / internacional and
+# reads its header (titular, fecha estado → ARCHIVO_ORIGEN)
+# from page 1 only, so files can be routed to the right
+# extractor and duplicates skipped before the full parse.
+# Text comes from pdfium (native, no layout analysis, a few ms);
+# pdfplumber's page-1 text is the fallback when pdfium's
+# reading order hides the header.
+# ============================================================
+
+_log = logging.getLogger(__name__)
+
+NACIONAL = "NACIONAL"
+INTERNACIONAL = "INTERNACIONAL"
+
+_TITULO_RE = re.compile(r"ESTADO\s+DE\s+CUENTA\s+(NACIONAL|INTERNACIONAL)", re.IGNORECASE)
+
+
+def _texto_pdfium(pdf_bytes: bytes) -> str:
+    doc = pdfium.PdfDocument(pdf_bytes)
+    try:
+        if len(doc) == 0:
+            return ""
+        page = doc[0]
+        textpage = page.get_textpage()
+        try:
+            return textpage.get_text_range().replace("\r\n", "\n")
+        finally:
+            textpage.close()
+            page.close()
+    finally:
+        doc.close()
+
+
+def _texto_pdfplumber(pdf_bytes: bytes) -> str:
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        if not pdf.pages:
+            return ""
+        return pdf.pages[0].extract_text() or ""
+
+
+def clasificar(texto: str) -> Optional[str]:
+    """NACIONAL / INTERNACIONAL from first-page text, None if not a BCI statement."""
+    u = texto.upper()
+    m = _TITULO_RE.search(u)
+    if m:
+        return m.group(1)
+    if "US$" in u or "INFORMACION DE TRANSACCIONES" in u:
+        return INTERNACIONAL
+    if "PERIODO ACTUAL" in u:
+        return NACIONAL
+    return None
+
+
+def _cabecera(texto: str, origen: str, filename: str) -> Dict[str, Any]:
+    # Same header parsing and naming as the full extractors, so the
+    # ARCHIVO_ORIGEN computed here equals the one the parse will store.
+    if origen == NACIONAL:
+        titular, fecha_estado, *_ = extractor_nacional._extract_header(texto)
+        archivo = extractor_nacional._build_archivo_origen(filename, titular, fecha_estado)
+    else:
+        h = extractor_internacional._extract_header_fields(texto)
+        titular, fecha_estado = h["TITULAR_NOMBRE"], h["FECHA_ESTADO"]
+        archivo = extractor_internacional._build_archivo_origen(filename, titular, fecha_estado)
+    return {
+        "ORIGEN": origen,
+        "TITULAR_NOMBRE": titular,
+        "FECHA_ESTADO": fecha_estado,
+        "ARCHIVO_ORIGEN": archivo,
+    }
+
+
+def detectar_cartola(pdf_bytes: bytes, filename: str = "archivo.pdf") -> Optional[Dict[str, Any]]:
+    """Statement type and header from page 1, or None if unrecognised.
+
+    Returns ORIGEN, TITULAR_NOMBRE, FECHA_ESTADO and ARCHIVO_ORIGEN. When
+    titular or fecha cannot be read, ARCHIVO_ORIGEN falls back to `filename`
+    exactly as the extractors do.
+    """
+    try:
+        texto = _texto_pdfium(pdf_bytes)
+    except pdfium.PdfiumError:
+        _log.warning("pdfium could not open %s; sniffing with pdfplumber", filename)
+        texto = ""
+    origen = clasificar(texto)
+    cab = _cabecera(texto, origen, filename) if origen else None
+    if cab is None or not (cab["TITULAR_NOMBRE"] and cab["FECHA_ESTADO"]):
+        texto = _texto_pdfplumber(pdf_bytes)
+        origen = clasificar(texto)
+        cab = _cabecera(texto, origen, filename) if origen else None
+    return cab
@@ -2,11 +2,14 @@ from __future__ import annotations
 
 import io
 import re
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import pdfplumber
 from unidecode import unidecode
 
+from data import palabras
+from data.clases import clase_transaccion
+
 # ============================================================
 # Parser for BCI "Estado de Cuenta Internacional" (USD).
 # International transactions stay in USD; the whole statement
@@ -14,6 +17,9 @@ from unidecode import unidecode
 # statement as a single "TRASPASO DEUDA INTERNACIONAL" line.
 # ============================================================
 
+# Bump whenever parsing output changes — invalidates cached extractions.
+EXTRACTOR_VERSION = "3"
+
 DATE_RE = re.compile(r"\b\d{2}/\d{2}/\d{2}\b")
 PAIS_RE = re.compile(r"^[A-Z]{2}$")
 REF_RE = re.compile(r"^\d{10,}$")
@@ -146,105 +152,264 @@ def _parse_transaction_line(
     else:
         desc = " ".join(desc_tokens).strip()
 
-    if not desc or desc.upper().startswith("TOTAL"):
-        return None
-
     ref = ""
     if date_idx >= 2 and REF_RE.match(tokens[date_idx - 1]):
         ref = tokens[date_idx - 1]
 
+    return _fila(tokens[date_idx], desc, ciudad, pais, ref, monto_origen, monto_usd,
+                 archivo_origen, titular_first_name)
+
+
+def _fila(
+    fecha: str, desc: str, ciudad: str, pais: str, ref: str,
+    monto_origen: Optional[str], monto_usd: str,
+    archivo_origen: str, titular_first_name: Optional[str],
+) -> Optional[Dict[str, Any]]:
+    if not desc or desc.upper().startswith("TOTAL"):
+        return None
     try:
         monto_usd_f = _to_float(monto_usd)
         monto_origen_f = _to_float(monto_origen) if monto_origen else None
     except Exception:
         return None
+    # USD statements carry one amount; classify on MONTO_TOTAL like CLASE_SQL.
+    monto_total = monto_usd_f
 
     return {
         "ORIGEN": "INTERNACIONAL",
         "TITULAR_NOMBRE": titular_first_name,
-        "FECHA_OPERACION": _ddmmyy_to_mmddyy(tokens[date_idx]),
+        "FECHA_OPERACION": _ddmmyy_to_mmddyy(fecha),
         "DESCRIPCION": desc,
         "CIUDAD": ciudad,
         "PAIS": pais,
         "REF_INTERNACIONAL": ref,
         "MONTO_ORIGEN": monto_origen_f,
         "MONTO_OPERACION": monto_usd_f,
-        "MONTO_TOTAL": monto_usd_f,
+        "MONTO_TOTAL": monto_total,
         "MONEDA": "USD",
         "TIPO_GASTO": "",
         "CONCILIADO": 0,
         "FACT_KAME": 0,
         "TRASPASADO": 0,
+        "CLASE": clase_transaccion(desc, monto_total),
         "ARCHIVO_ORIGEN": archivo_origen,
     }
 
 
-def leer_cartola_internacional(
-    pdf_bytes: bytes, filename: str = "archivo.pdf"
-) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
-    rows: List[Dict[str, Any]] = []
+# Slack (pt) when comparing a word's x0 with its column header's x0.
+TOLERANCIA_X = 2.0
 
-    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-        page_texts = [(p.extract_text() or "") for p in pdf.pages]
-        full_text = "\n".join(page_texts)
-
-        header = _extract_header_fields(full_text)
-        titular_first = header["TITULAR_NOMBRE"]
-        archivo_origen = _build_archivo_origen(filename, titular_first, header["FECHA_ESTADO"])
-
-        in_transacciones = False
-        in_comisiones = False
-
-        for t in page_texts:
-            for raw_line in t.splitlines():
-                line = " ".join(raw_line.split())
-                if not line:
-                    continue
-                u = _norm(line)
-
-                if "2. INFORMACION DE TRANSACCIONES" in u:
-                    in_transacciones = True
-                    in_comisiones = False
-                    continue
-                if "COMISIONES, OTROS CARGOS Y ABONOS" in u:
-                    in_comisiones = True
-                    in_transacciones = False
-                    continue
-                if u.startswith("TOTAL TARJETA"):
-                    in_transacciones = False
-                    continue
-                if u.startswith(
-                    ("NUMERO", "FECHA", "DESCRIPCION", "CIUDAD", "PAIS",
-                     "MONTO", "TOTAL DE PAGOS", "TOTAL DE COMPRAS")
-                ):
-                    continue
-                if not (in_transacciones or in_comisiones):
-                    continue
-                if not DATE_RE.search(line):
-                    continue
-
-                row = _parse_transaction_line(line, archivo_origen, titular_first)
-                if row:
-                    rows.append(row)
-
-    # Deduplicate
-    uniq = {}
-    for r in rows:
-        key = (
-            r["TITULAR_NOMBRE"], r["FECHA_OPERACION"], r["DESCRIPCION"],
-            r.get("PAIS", ""), r["MONTO_OPERACION"], r["ARCHIVO_ORIGEN"],
-        )
-        uniq[key] = r
-    rows = list(uniq.values())
-
-    meta = {
+# (x0 of CIUDAD, x0 of PAIS) in the transaction table's header row.
+Columnas = Tuple[float, float]
+
+
+def _columnas(linea: List[palabras.Palabra]) -> Optional[Columnas]:
+    xs = {_norm(w["text"]): w["x0"] for w in linea}
+    if "CIUDAD" in xs and "PAIS" in xs and xs["CIUDAD"] < xs["PAIS"]:
+        return xs["CIUDAD"], xs["PAIS"]
+    return None
+
+
+def _parse_palabras(
+    linea: List[palabras.Palabra], columnas: Columnas,
+    archivo_origen: str, titular_first_name: Optional[str],
+) -> Optional[Dict[str, Any]]:
+    """Transaction row from positioned words: DESCRIPCION / CIUDAD / PAIS are
+    split by the header columns' x, so multi-word cities need no guessing.
+    Falls back to the token heuristics when the words don't fit the columns."""
+    tokens = [w["text"] for w in linea]
+    try:
+        date_idx = next(i for i, t in enumerate(tokens) if DATE_RE.fullmatch(t))
+    except StopIteration:
+        return None
+    trailing = _find_trailing_amounts(tokens)
+    if not trailing:
+        return None
+
+    x_ciudad, x_pais = (x - TOLERANCIA_X for x in columnas)
+    desc, ciudad, pais = [], [], []
+    for w in linea[date_idx + 1 : len(linea) - len(trailing)]:
+        (desc if w["x0"] < x_ciudad else ciudad if w["x0"] < x_pais else pais).append(w["text"])
+    if not desc or len(pais) > 1 or (pais and not PAIS_RE.match(pais[0])):
+        return _parse_transaction_line(palabras.texto(linea), archivo_origen, titular_first_name)
+
+    ref = ""
+    if date_idx >= 2 and REF_RE.match(tokens[date_idx - 1]):
+        ref = tokens[date_idx - 1]
+    return _fila(
+        tokens[date_idx], " ".join(desc), " ".join(ciudad), "".join(pais), ref,
+        trailing[-2] if len(trailing) >= 2 else None, trailing[-1],
+        archivo_origen, titular_first_name,
+    )
+
+
+# meta keys that may be filled from pages after the one completing the header.
+_HEADER_OPCIONAL = ("PERIODO_DESDE", "PERIODO_HASTA", "DEUDA_TOTAL")
+
+
+def _meta(header: Dict[str, Any], filename: str) -> Dict[str, Any]:
+    titular_first = header["TITULAR_NOMBRE"]
+    return {
         "ORIGEN": "INTERNACIONAL",
         "TITULAR_NOMBRE": titular_first,
-        "ARCHIVO_ORIGEN": archivo_origen,
+        "ARCHIVO_ORIGEN": _build_archivo_origen(filename, titular_first, header["FECHA_ESTADO"]),
         "FECHA_ESTADO": header["FECHA_ESTADO"],
         "PERIODO_DESDE": header["PERIODO_DESDE"],
         "PERIODO_HASTA": header["PERIODO_HASTA"],
         "DEUDA_TOTAL": header["DEUDA_TOTAL"],
         "MONEDA": "USD",
     }
-    return rows, meta
+
+
+def _clave_dedup(r: Dict[str, Any]) -> tuple:
+    return (
+        r["TITULAR_NOMBRE"], r["FECHA_OPERACION"], r["DESCRIPCION"],
+        r.get("PAIS", ""), r["MONTO_OPERACION"], r["ARCHIVO_ORIGEN"],
+    )
+
+
+class _Secciones:
+    """Section state machine; carries across page boundaries."""
+
+    __slots__ = ("in_transacciones", "in_comisiones", "columnas")
+
+    def __init__(self):
+        self.in_transacciones = False
+        self.in_comisiones = False
+        self.columnas: Optional[Columnas] = None
+
+    def filas(self, text: str, meta: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return self._filas(((ln, None) for ln in text.splitlines()), meta)
+
+    def filas_palabras(self, ls: List[List[palabras.Palabra]], meta: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return self._filas(((palabras.texto(ln), ln) for ln in ls), meta)
+
+    def _filas(self, lineas, meta: Dict[str, Any]) -> List[Dict[str, Any]]:
+        rows: List[Dict[str, Any]] = []
+        for raw_line, ws in lineas:
+            line = " ".join(raw_line.split())
+            if not line:
+                continue
+            u = _norm(line)
+
+            if "2. INFORMACION DE TRANSACCIONES" in u:
+                self.in_transacciones = True
+                self.in_comisiones = False
+                continue
+            if "COMISIONES, OTROS CARGOS Y ABONOS" in u:
+                self.in_comisiones = True
+                self.in_transacciones = False
+                continue
+            if u.startswith("TOTAL TARJETA"):
+                self.in_transacciones = False
+                continue
+            if ws is not None and (self.in_transacciones or self.in_comisiones):
+                self.columnas = _columnas(ws) or self.columnas
+            if u.startswith(
+                ("NUMERO", "FECHA", "DESCRIPCION", "CIUDAD", "PAIS",
+                 "MONTO", "TOTAL DE PAGOS", "TOTAL DE COMPRAS")
+            ):
+                continue
+            if not (self.in_transacciones or self.in_comisiones):
+                continue
+            if not DATE_RE.search(line):
+                continue
+
+            if ws is not None and self.columnas is not None:
+                row = _parse_palabras(ws, self.columnas, meta["ARCHIVO_ORIGEN"], meta["TITULAR_NOMBRE"])
+            else:
+                row = _parse_transaction_line(line, meta["ARCHIVO_ORIGEN"], meta["TITULAR_NOMBRE"])
+            if row:
+                rows.append(row)
+        return rows
+
+
+def _texto_pagina(page) -> str:
+    """Page text; releases the page's layout and textmap caches (see extractor_nacional)."""
+    text = page.extract_text() or ""
+    page.get_textmap.cache_clear()
+    page.close()
+    return text
+
+
+def iterar_cartola_internacional(
+    pdf_bytes: bytes, filename: str = "archivo.pdf", motor: str = palabras.TEXTO,
+) -> Iterator[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+    """Yield (meta, rows) page by page, releasing each page's layout as it goes.
+
+    Same contract as extractor_nacional.iterar_cartola_nacional. A row
+    repeating an earlier one (same titular, fecha, descripcion, pais, monto)
+    is dropped — the first occurrence wins, on this path and in
+    leer_cartola_internacional alike, so both store the same REF/CIUDAD and
+    natural keys for a statement. With motor="palabras", transaction lines
+    are split into columns by the x position of the table header's CIUDAD /
+    PAIS words.
+    """
+    secciones = _Secciones()
+    vistas: set = set()
+
+    def _leer_pagina(page) -> Tuple[str, Optional[List[List[palabras.Palabra]]]]:
+        if motor != palabras.PALABRAS:
+            return _texto_pagina(page), None
+        ls = palabras.lineas(palabras.palabras_pagina(page))
+        return "\n".join(palabras.texto(ln) for ln in ls), ls
+
+    def _filas(pagina, meta: Dict[str, Any]) -> List[Dict[str, Any]]:
+        text, ls = pagina
+        rows = secciones.filas(text, meta) if ls is None else secciones.filas_palabras(ls, meta)
+        nuevas = []
+        for r in rows:
+            k = _clave_dedup(r)
+            if k not in vistas:
+                vistas.add(k)
+                nuevas.append(r)
+        return nuevas
+
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        previas: list = []
+        meta: Optional[Dict[str, Any]] = None
+        for page in pdf.pages:
+            pagina = _leer_pagina(page)
+            if meta is not None:
+                header = _extract_header_fields(pagina[0])
+                for k in _HEADER_OPCIONAL:
+                    if meta[k] is None:
+                        meta[k] = header[k]
+                yield meta, _filas(pagina, meta)
+                continue
+            previas.append(pagina)
+            header = _extract_header_fields("\n".join(p[0] for p in previas))
+            if header["TITULAR_NOMBRE"] and header["FECHA_ESTADO"]:
+                meta = _meta(header, filename)
+                for p in previas:
+                    yield meta, _filas(p, meta)
+                previas = []
+
+    if meta is None:
+        # Header never complete: rows fall back to the file name, as before
+        meta = _meta(_extract_header_fields("\n".join(p[0] for p in previas)), filename)
+        yield meta, []
+        for p in previas:
+            yield meta, _filas(p, meta)
+
+
+def _leer(pdf_bytes: bytes, filename: str, motor: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    ultima: Dict[str, Any] = {}
+    for meta, filas in iterar_cartola_internacional(pdf_bytes, filename, motor):
+        rows.extend(filas)   # already deduplicated, first occurrence kept
+        ultima = meta
+    return rows, ultima
+
+
+def leer_cartola_internacional(
+    pdf_bytes: bytes, filename: str = "archivo.pdf"
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    return _leer(pdf_bytes, filename, palabras.TEXTO)
+
+
+def leer_cartola_internacional_palabras(
+    pdf_bytes: bytes, filename: str = "archivo.pdf"
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """leer_cartola_internacional with the word-position engine (data/palabras.py)."""
+    return _leer(pdf_bytes, filename, palabras.PALABRAS)
@@ -2,16 +2,22 @@ from __future__ import annotations
 
 import io
 import re
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import pdfplumber
 
+from data import palabras
+from data.clases import clase_transaccion
+
 # ============================================================
 # Parser for BCI "Estado de Cuenta Nacional" (CLP).
 # Transaction line shape (after the "2. PERIODO ACTUAL" header):
 #   [LUGAR] FECHA CODIGO_REF DESCRIPCION $ MONTO_OP $ MONTO_TOTAL [N°CUOTA $ VALOR]
 # ============================================================
 
+# Bump whenever parsing output changes — invalidates cached extractions.
+EXTRACTOR_VERSION = "2"
+
 # Matches a CLP transaction line, anchored on the operation date.
 LINE_RE = re.compile(
     r"(?P<fecha>\d{2}/\d{2}/\d{2})\s+"
@@ -38,6 +44,9 @@ DEUDA_RE = re.compile(
     re.IGNORECASE,
 )
 
+# Section header the transaction table starts below (word engine crop).
+ANCLA_TABLA = "2. PERIODO ACTUAL"
+
 # Lines we never treat as expense transactions.
 SKIP_PREFIXES = (
     "TOTAL", "SUBTOTAL", "LUGAR", "OPERACI", "PERIODO", "SALDO",
@@ -90,76 +99,170 @@ def _extract_header(full_text: str) -> Tuple[Optional[str], Optional[str], Optio
     )
 
 
+# meta keys filled from _extract_header()[2:] when they appear after page 1.
+_HEADER_OPCIONAL = ("PERIODO_DESDE", "PERIODO_HASTA", "DEUDA_TOTAL")
+
+
 def _build_archivo_origen(filename: str, titular: Optional[str], fecha_estado: Optional[str]) -> str:
     if titular and fecha_estado:
         return f"BCI_NAC_{titular.replace(' ', '_')}_{fecha_estado}"
     return filename
 
 
-def leer_cartola_nacional(
-    pdf_bytes: bytes, filename: str = "archivo.pdf"
-) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
-    """Extract national (CLP) transactions and statement metadata.
-
-    Returns (rows, meta) where meta describes the statement (for estados_cuenta).
-    """
-    rows: List[Dict[str, Any]] = []
-
-    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-        page_texts = [(p.extract_text() or "") for p in pdf.pages]
-        full_text = "\n".join(page_texts)
-
-        titular, fecha_estado, p_desde, p_hasta, deuda = _extract_header(full_text)
-        archivo_origen = _build_archivo_origen(filename, titular, fecha_estado)
-
-        for text in page_texts:
-            for raw in text.splitlines():
-                line = " ".join(raw.split())
-                if not line:
-                    continue
-                if line.upper().startswith(SKIP_PREFIXES):
-                    continue
-
-                m = LINE_RE.search(line)
-                if not m:
-                    continue
-
-                desc = re.sub(r"\s{2,}", " ", m.group("desc").strip())
-                if not desc or desc.upper().startswith("TOTAL"):
-                    continue
-
-                monto_op = normalizar_monto_clp(m.group("m1"))
-                monto_total = normalizar_monto_clp(m.group("m2"))
-
-                rows.append(
-                    {
-                        "ORIGEN": "NACIONAL",
-                        "TITULAR_NOMBRE": titular,
-                        "FECHA_OPERACION": _ddmmyy_to_mmddyy(m.group("fecha")),
-                        "DESCRIPCION": desc,
-                        "CIUDAD": "",
-                        "PAIS": "",
-                        "REF_INTERNACIONAL": m.group("codigo") or "",
-                        "MONTO_ORIGEN": None,
-                        "MONTO_OPERACION": monto_op,
-                        "MONTO_TOTAL": monto_total,
-                        "MONEDA": "CLP",
-                        "TIPO_GASTO": "",
-                        "CONCILIADO": 0,
-                        "FACT_KAME": 0,
-                        "TRASPASADO": 0,
-                        "ARCHIVO_ORIGEN": archivo_origen,
-                    }
-                )
-
-    meta = {
+def _meta(header: tuple, filename: str) -> Dict[str, Any]:
+    titular, fecha_estado, p_desde, p_hasta, deuda = header
+    return {
         "ORIGEN": "NACIONAL",
         "TITULAR_NOMBRE": titular,
-        "ARCHIVO_ORIGEN": archivo_origen,
+        "ARCHIVO_ORIGEN": _build_archivo_origen(filename, titular, fecha_estado),
         "FECHA_ESTADO": fecha_estado,
         "PERIODO_DESDE": p_desde,
         "PERIODO_HASTA": p_hasta,
         "DEUDA_TOTAL": deuda,
         "MONEDA": "CLP",
     }
-    return rows, meta
+
+
+def _filas_pagina(text: str, titular: Optional[str], archivo_origen: str) -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    for raw in text.splitlines():
+        line = " ".join(raw.split())
+        if not line:
+            continue
+        if line.upper().startswith(SKIP_PREFIXES):
+            continue
+
+        m = LINE_RE.search(line)
+        if not m:
+            continue
+
+        desc = re.sub(r"\s{2,}", " ", m.group("desc").strip())
+        if not desc or desc.upper().startswith("TOTAL"):
+            continue
+
+        monto_op = normalizar_monto_clp(m.group("m1"))
+        monto_total = normalizar_monto_clp(m.group("m2"))
+
+        rows.append(
+            {
+                "ORIGEN": "NACIONAL",
+                "TITULAR_NOMBRE": titular,
+                "FECHA_OPERACION": _ddmmyy_to_mmddyy(m.group("fecha")),
+                "DESCRIPCION": desc,
+                "CIUDAD": "",
+                "PAIS": "",
+                "REF_INTERNACIONAL": m.group("codigo") or "",
+                "MONTO_ORIGEN": None,
+                "MONTO_OPERACION": monto_op,
+                "MONTO_TOTAL": monto_total,
+                "MONEDA": "CLP",
+                "TIPO_GASTO": "",
+                "CONCILIADO": 0,
+                "FACT_KAME": 0,
+                "TRASPASADO": 0,
+                "CLASE": clase_transaccion(desc, monto_total),
+                "ARCHIVO_ORIGEN": archivo_origen,
+            }
+        )
+    return rows
+
+
+def _texto_pagina(page) -> str:
+    """Page text, then drop everything pdfplumber cached for the page.
+
+    close() only flushes the layout objects; the textmap (every char) sits in
+    a per-page lru_cache that pdf.pages would keep alive until the end.
+    """
+    text = page.extract_text() or ""
+    page.get_textmap.cache_clear()
+    page.close()
+    return text
+
+
+def iterar_cartola_nacional(
+    pdf_bytes: bytes, filename: str = "archivo.pdf", motor: str = palabras.TEXTO
+) -> Iterator[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+    """Yield (meta, rows) page by page, releasing each page's layout as it goes.
+
+    Pages are held back only until titular and fecha estado (which every row
+    carries) have been read — normally page 1. `meta` is one dict shared by
+    every yield; header fields printed after that point are filled in as
+    their page is reached, so it is complete once the generator is exhausted.
+    At least one (meta, rows) pair is always yielded.
+
+    With motor="palabras", pages are read as positioned words and, from the
+    "2. PERIODO ACTUAL" anchor on, only the lines below it are parsed; pages
+    before the anchor (or without one) get the whole-page treatment.
+    """
+    en_tabla = False
+
+    def _leer_pagina(page) -> Tuple[str, Optional[List[List[palabras.Palabra]]]]:
+        if motor != palabras.PALABRAS:
+            return _texto_pagina(page), None
+        ls = palabras.lineas(palabras.palabras_pagina(page))
+        return "\n".join(palabras.texto(ln) for ln in ls), ls
+
+    def _filas(pagina, meta: Dict[str, Any]) -> List[Dict[str, Any]]:
+        nonlocal en_tabla
+        text, ls = pagina
+        if ls is not None:
+            if not en_tabla:
+                i = next((k for k, ln in enumerate(ls) if ANCLA_TABLA in palabras.texto(ln).upper()), None)
+                if i is not None:
+                    en_tabla = True
+                    ls = ls[i + 1:]
+            if en_tabla:
+                text = "\n".join(palabras.texto(ln) for ln in ls)
+        return _filas_pagina(text, meta["TITULAR_NOMBRE"], meta["ARCHIVO_ORIGEN"])
+
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        previas: list = []
+        meta: Optional[Dict[str, Any]] = None
+        for page in pdf.pages:
+            pagina = _leer_pagina(page)
+            if meta is not None:
+                for k, v in zip(_HEADER_OPCIONAL, _extract_header(pagina[0])[2:], strict=True):
+                    if meta[k] is None:
+                        meta[k] = v
+                yield meta, _filas(pagina, meta)
+                continue
+            previas.append(pagina)
+            header = _extract_header("\n".join(p[0] for p in previas))
+            if header[0] and header[1]:
+                meta = _meta(header, filename)
+                for p in previas:
+                    yield meta, _filas(p, meta)
+                previas = []
+
+    if meta is None:
+        # Header never complete: rows fall back to the file name, as before
+        meta = _meta(_extract_header("\n".join(p[0] for p in previas)), filename)
+        yield meta, []
+        for p in previas:
+            yield meta, _filas(p, meta)
+
+
+def _leer(pdf_bytes: bytes, filename: str, motor: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    ultima: Dict[str, Any] = {}
+    for meta, filas in iterar_cartola_nacional(pdf_bytes, filename, motor):
+        rows.extend(filas)
+        ultima = meta   # complete once the generator is exhausted
+    return rows, ultima
+
+
+def leer_cartola_nacional(
+    pdf_bytes: bytes, filename: str = "archivo.pdf"
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Extract national (CLP) transactions and statement metadata.
+
+    Returns (rows, meta) where meta describes the statement (for estados_cuenta).
+    """
+    return _leer(pdf_bytes, filename, palabras.TEXTO)
+
+
+def leer_cartola_nacional_palabras(
+    pdf_bytes: bytes, filename: str = "archivo.pdf"
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """leer_cartola_nacional with the word-position engine (data/palabras.py)."""
+    return _leer(pdf_bytes, filename, palabras.PALABRAS)
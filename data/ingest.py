@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from data.cache_extraccion import CacheExtraccion
+from data.database import (
+    _claves_naturales,
+    auto_tipo_gasto,
+    insertar_transacciones,
+    registrar_archivo_procesado,
+    upsert_estado_cuenta,
+)
+from data.deteccion import INTERNACIONAL, NACIONAL
+from data.extractor_internacional import (
+    iterar_cartola_internacional,
+    leer_cartola_internacional,
+    leer_cartola_internacional_palabras,
+)
+from data.extractor_nacional import (
+    iterar_cartola_nacional,
+    leer_cartola_nacional,
+    leer_cartola_nacional_palabras,
+)
+from data.palabras import PALABRAS, motor_extraccion
+
+# ============================================================
+# Batch extraction of uploaded statements.
+# PDF parsing (pdfplumber layout analysis) is CPU-bound pure
+# Python, so a batch is fanned out to a process pool; results
+# come back in upload order so DB writes stay deterministic.
+# Storing a parsed statement (filters, auto-categorization,
+# DB writes) is shared by the Streamlit uploader and cargar.py.
+# ============================================================
+
+_log = logging.getLogger(__name__)
+
+Extractor = Callable[..., Tuple[List[Dict[str, Any]], Dict[str, Any]]]
+
+EXTRACTORES: Dict[str, Extractor] = {
+    NACIONAL: leer_cartola_nacional,
+    INTERNACIONAL: leer_cartola_internacional,
+}
+
+# Same extractors on the word-position engine (CARTOLAS_MOTOR=palabras).
+EXTRACTORES_PALABRAS: Dict[str, Extractor] = {
+    NACIONAL: leer_cartola_nacional_palabras,
+    INTERNACIONAL: leer_cartola_internacional_palabras,
+}
+
+# Page-by-page variants: yield (meta, rows) per page.
+ITERADORES: Dict[str, Callable[..., Iterator[Tuple[Dict[str, Any], List[Dict[str, Any]]]]]] = {
+    NACIONAL: iterar_cartola_nacional,
+    INTERNACIONAL: iterar_cartola_internacional,
+}
+
+# Rows per INSERT/commit when storing a statement page by page.
+FILAS_POR_LOTE = 1000
+
+
+def default_workers() -> int:
+    """Worker count from CARTOLAS_INGEST_WORKERS, else one per CPU."""
+    env = os.environ.get("CARTOLAS_INGEST_WORKERS", "").strip()
+    if env.isdigit() and int(env) > 0:
+        return int(env)
+    return os.cpu_count() or 1
+
+
+def extractor_para(origen: str) -> Extractor:
+    """Extractor for `origen` on the engine selected by CARTOLAS_MOTOR."""
+    if motor_extraccion() == PALABRAS:
+        return EXTRACTORES_PALABRAS[origen]
+    return EXTRACTORES[origen]
+
+
+class ResultadoExtraccion:
+    """Outcome of parsing one PDF: (rows, meta) or the error that stopped it."""
+
+    __slots__ = ("nombre", "rows", "meta", "error")
+
+    def __init__(
+        self,
+        nombre: str,
+        rows: Optional[List[Dict[str, Any]]] = None,
+        meta: Optional[Dict[str, Any]] = None,
+        error: Optional[BaseException] = None,
+    ):
+        self.nombre = nombre
+        self.rows = rows or []
+        self.meta = meta or {}
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _extraer_uno(extractor: Extractor, pdf_bytes: bytes, nombre: str) -> ResultadoExtraccion:
+    try:
+        rows, meta = extractor(pdf_bytes, filename=nombre)
+        return ResultadoExtraccion(nombre, rows, meta)
+    except Exception as e:
+        _log.exception("PDF extraction failed: %s", nombre)
+        return ResultadoExtraccion(nombre, error=e)
+
+
+def extraer_lote(
+    extractor: Extractor,
+    archivos: Sequence[Tuple[str, bytes]],
+    workers: Optional[int] = None,
+    cache: Optional[CacheExtraccion] = None,
+) -> List[ResultadoExtraccion]:
+    """Parse (nombre, pdf_bytes) pairs, in parallel when it pays off.
+
+    Results are returned in input order. A file that fails to parse yields a
+    ResultadoExtraccion with .error set; it never aborts the rest of the batch.
+    With a cache, hits skip parsing entirely and fresh results are stored.
+    """
+    if not archivos:
+        return []
+
+    resultados: List[Optional[ResultadoExtraccion]] = [None] * len(archivos)
+    a_parsear = []
+    for i, (nombre, data) in enumerate(archivos):
+        hit = cache.get(data, extractor, nombre) if cache is not None else None
+        if hit is not None:
+            resultados[i] = ResultadoExtraccion(nombre, *hit)
+        else:
+            a_parsear.append(i)
+
+    for i, res in zip(a_parsear, _extraer_indices(extractor, archivos, a_parsear, workers), strict=True):
+        resultados[i] = res
+        if cache is not None and res.ok:
+            cache.put(archivos[i][1], extractor, res.nombre, res.rows, res.meta)
+    return resultados  # type: ignore[return-value]
+
+
+def _extraer_indices(
+    extractor: Extractor,
+    archivos: Sequence[Tuple[str, bytes]],
+    indices: List[int],
+    workers: Optional[int],
+) -> List[ResultadoExtraccion]:
+    if not indices:
+        return []
+    workers = min(workers or default_workers(), len(indices))
+    if workers <= 1:
+        return [_extraer_uno(extractor, archivos[i][1], archivos[i][0]) for i in indices]
+
+    resultados: List[Optional[ResultadoExtraccion]] = [None] * len(indices)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(_extraer_uno, extractor, archivos[i][1], archivos[i][0]): k
+            for k, i in enumerate(indices)
+        }
+        for fut in as_completed(futures):
+            k = futures[fut]
+            nombre = archivos[indices[k]][0]
+            try:
+                resultados[k] = fut.result()
+            except Exception as e:
+                # Worker died (e.g. BrokenProcessPool) — isolate to this file.
+                _log.exception("Extraction worker failed: %s", nombre)
+                resultados[k] = ResultadoExtraccion(nombre, error=e)
+    return resultados  # type: ignore[return-value]
+
+
+# ---------------------------------------------------------------------------
+# Storing a parsed statement
+# ---------------------------------------------------------------------------
+
+def preparar_filas(
+    rows: Iterable[Dict[str, Any]],
+    historic: Dict[str, str],
+    exclude_terms: Sequence[str] = (),
+) -> List[Dict[str, Any]]:
+    """Drop rows matching an excluded term and fill empty TIPO_GASTO.
+
+    Categories come from the learned history plus the static rules.
+    """
+    out = []
+    for r in rows:
+        desc = r.get("DESCRIPCION", "")
+        if exclude_terms and any(t in desc.lower() for t in exclude_terms):
+            continue
+        if not r.get("TIPO_GASTO"):
+            r["TIPO_GASTO"] = auto_tipo_gasto(desc, historic, origen=r.get("ORIGEN", ""))
+        out.append(r)
+    return out
+
+
+def guardar_extraccion(
+    conn,
+    res: ResultadoExtraccion,
+    historic: Dict[str, str],
+    exclude_terms: Sequence[str] = (),
+) -> Optional[Tuple[int, int]]:
+    """Store one parsed statement; returns (inserted, already stored).
+
+    Returns None when no valid rows remain — the file is then not marked as
+    processed, so it can be retried. `historic` is extended with the stored
+    classifications for the next statement of the batch.
+    """
+    rows = preparar_filas(res.rows, historic, exclude_terms)
+    if not rows:
+        return None
+    nuevas, repetidas = insertar_transacciones(conn, rows)
+    upsert_estado_cuenta(conn, res.meta)
+    registrar_archivo_procesado(conn, res.nombre)
+    historic.update(
+        (r["DESCRIPCION"], r["TIPO_GASTO"]) for r in rows
+        if r.get("DESCRIPCION") and r.get("TIPO_GASTO")
+    )
+    return nuevas, repetidas
+
+
+def guardar_por_paginas(
+    conn,
+    nombre: str,
+    origen: str,
+    pdf_bytes: bytes,
+    historic: Dict[str, str],
+    exclude_terms: Sequence[str] = (),
+    filas_por_lote: int = FILAS_POR_LOTE,
+    tiempos: Optional[Dict[str, float]] = None,
+) -> Optional[Tuple[int, int]]:
+    """Parse and store one statement page by page, like guardar_extraccion.
+
+    Memory is bounded by one page plus one chunk of rows, whatever the
+    statement's length. Each chunk is committed on its own; the statement is
+    marked processed only after the last one, and natural keys make a retry
+    after a crash skip the chunks already stored. `tiempos`, if given,
+    accumulates "parseo" and "db" seconds.
+    """
+    tiempos = {} if tiempos is None else tiempos
+    tiempos.setdefault("parseo", 0.0)
+    tiempos.setdefault("db", 0.0)
+    vistos: Dict[str, int] = {}   # natural-key ordinals run across chunks
+    aprendidas: Dict[str, str] = {}
+    lote: List[Dict[str, Any]] = []
+    nuevas = repetidas = 0
+    meta: Dict[str, Any] = {}
+
+    def _vaciar() -> None:
+        nonlocal nuevas, repetidas
+        if not lote:
+            return
+        for r, k in zip(lote, _claves_naturales(lote, vistos), strict=True):
+            r["CLAVE_NATURAL"] = k
+        t0 = time.perf_counter()
+        n, s = insertar_transacciones(conn, lote)
+        tiempos["db"] += time.perf_counter() - t0
+        nuevas += n
+        repetidas += s
+        aprendidas.update(
+            (r["DESCRIPCION"], r["TIPO_GASTO"]) for r in lote
+            if r.get("DESCRIPCION") and r.get("TIPO_GASTO")
+        )
+        lote.clear()
+
+    paginas = ITERADORES[origen](pdf_bytes, filename=nombre, motor=motor_extraccion())
+    while True:
+        t0 = time.perf_counter()
+        pagina = next(paginas, None)
+        tiempos["parseo"] += time.perf_counter() - t0
+        if pagina is None:
+            break
+        meta, filas = pagina
+        lote.extend(preparar_filas(filas, historic, exclude_terms))
+        if len(lote) >= filas_por_lote:
+            _vaciar()
+    _vaciar()
+
+    if not nuevas + repetidas:
+        return None
+    t0 = time.perf_counter()
+    upsert_estado_cuenta(conn, meta)
+    registrar_archivo_procesado(conn, nombre)
+    tiempos["db"] += time.perf_counter() - t0
+    historic.update(aprendidas)
+    return nuevas, repetidas
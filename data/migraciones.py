@@ -0,0 +1,395 @@
+from __future__ import annotations
+
+import logging
+from typing import Callable, List, Tuple
+
+import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
+
+from data.clases import CLASE_SQL
+from data.database import (
+    _RESUMEN_SELECT,
+    _TRGM,
+    _aprender_clasificacion,
+    _claves_naturales,
+    _refrescar_contadores,
+)
+
+# ============================================================
+# Versioned schema migrations.
+#   schema_version — one row per applied step
+# On connect, migrar() issues one SELECT of the current version
+# (which also says whether a degraded step 8 is due for a retry);
+# only when it is behind are the pending steps applied,
+# in order, in one transaction under an advisory lock (so two
+# app instances starting together don't race).
+# To change the schema, append a step — never edit an applied one.
+# Steps must tolerate objects that already exist: databases created
+# before this table existed replay every step once.
+# ============================================================
+
+_log = logging.getLogger(__name__)
+
+_LOCK_ID = 0x63617274  # pg_advisory_xact_lock key ("cart")
+
+# schema_version flag row: step 8 ran without its trigram index (pg_trgm
+# missing, or this role may not CREATE EXTENSION). `aplicada` is the last
+# attempt; migrar() retries once it is older than _TRGM_REINTENTO, the
+# admin page (reintentar_trgm) on demand.
+_TRGM_PENDIENTE = -8
+_TRGM_REINTENTO = "1 day"
+
+
+# ---------------------------------------------------------------------------
+# Steps
+# ---------------------------------------------------------------------------
+
+def _v1_tablas_base(cur) -> None:
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS transacciones (
+            id              SERIAL PRIMARY KEY,
+            ORIGEN          TEXT NOT NULL,
+            TITULAR_NOMBRE  TEXT,
+            FECHA_OPERACION TEXT,
+            DESCRIPCION     TEXT,
+            CIUDAD          TEXT,
+            PAIS            TEXT,
+            REF_INTERNACIONAL TEXT,
+            MONTO_ORIGEN    REAL,
+            MONTO_OPERACION REAL,
+            MONTO_TOTAL     REAL,
+            MONTO_CLP       REAL,
+            MONEDA          TEXT,
+            TIPO_GASTO      TEXT,
+            CONCILIADO      INTEGER NOT NULL DEFAULT 0,
+            FACT_KAME       INTEGER NOT NULL DEFAULT 0,
+            TRASPASADO      INTEGER NOT NULL DEFAULT 0,
+            ARCHIVO_ORIGEN  TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_tx_origen     ON transacciones(ORIGEN);
+        CREATE INDEX IF NOT EXISTS idx_tx_fact_kame  ON transacciones(FACT_KAME);
+        CREATE INDEX IF NOT EXISTS idx_tx_archivo    ON transacciones(ARCHIVO_ORIGEN);
+        CREATE INDEX IF NOT EXISTS idx_tx_traspasado ON transacciones(TRASPASADO);
+
+        CREATE TABLE IF NOT EXISTS estados_cuenta (
+            id              SERIAL PRIMARY KEY,
+            ORIGEN          TEXT NOT NULL,
+            TITULAR_NOMBRE  TEXT,
+            ARCHIVO_ORIGEN  TEXT UNIQUE NOT NULL,
+            FECHA_ESTADO    TEXT,
+            PERIODO_DESDE   TEXT,
+            PERIODO_HASTA   TEXT,
+            DEUDA_TOTAL     REAL,
+            MONEDA          TEXT,
+            TRASPASO_ESTADO TEXT NOT NULL DEFAULT 'PENDIENTE',
+            MATCH_RID       INTEGER,
+            MATCH_ARCHIVO   TEXT,
+            TASA_CAMBIO     REAL
+        );
+
+        CREATE TABLE IF NOT EXISTS archivos_procesados (
+            nombre          TEXT PRIMARY KEY,
+            fecha_procesado TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+
+        ALTER TABLE transacciones  ADD COLUMN IF NOT EXISTS MONTO_CLP   REAL;
+        ALTER TABLE estados_cuenta ADD COLUMN IF NOT EXISTS TASA_CAMBIO REAL;
+        """
+    )
+
+
+def _v2_fechas(cur) -> None:
+    """DATE twins of the text dates, back-filled, plus their indexes."""
+    cur.execute(
+        r"""
+        ALTER TABLE transacciones  ADD COLUMN IF NOT EXISTS FECHA_OPERACION_DT DATE;
+        ALTER TABLE estados_cuenta ADD COLUMN IF NOT EXISTS FECHA_ESTADO_DT    DATE;
+        ALTER TABLE estados_cuenta ADD COLUMN IF NOT EXISTS PERIODO_DESDE_DT   DATE;
+        ALTER TABLE estados_cuenta ADD COLUMN IF NOT EXISTS PERIODO_HASTA_DT   DATE;
+
+        UPDATE transacciones
+        SET FECHA_OPERACION_DT = to_date(FECHA_OPERACION, 'MM/DD/YY')
+        WHERE FECHA_OPERACION_DT IS NULL
+          AND FECHA_OPERACION ~ '^\d{2}/\d{2}/\d{2}$';
+        """
+    )
+    for col in ("FECHA_ESTADO", "PERIODO_DESDE", "PERIODO_HASTA"):
+        cur.execute(
+            rf"""
+            UPDATE estados_cuenta
+            SET {col}_DT = to_date({col}, 'DD-MM-YYYY')
+            WHERE {col}_DT IS NULL AND {col} ~ '^\d{{2}}-\d{{2}}-\d{{4}}$';
+            """
+        )
+    cur.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_tx_fecha        ON transacciones(FECHA_OPERACION_DT, id);
+        CREATE INDEX IF NOT EXISTS idx_tx_origen_fecha ON transacciones(ORIGEN, FECHA_OPERACION_DT, id);
+        CREATE INDEX IF NOT EXISTS idx_ec_fecha_estado ON estados_cuenta(FECHA_ESTADO_DT);
+        CREATE INDEX IF NOT EXISTS idx_tx_kame_fecha   ON transacciones(ORIGEN, FACT_KAME, FECHA_OPERACION_DT, id);
+        """
+    )
+
+
+def _v3_contadores(cur) -> None:
+    """Per-statement counters on estados_cuenta."""
+    cur.execute(
+        """
+        ALTER TABLE estados_cuenta ADD COLUMN IF NOT EXISTS N_TRANSACCIONES     INTEGER;
+        ALTER TABLE estados_cuenta ADD COLUMN IF NOT EXISTS MONTO_TRANSACCIONES DOUBLE PRECISION;
+        ALTER TABLE estados_cuenta ADD COLUMN IF NOT EXISTS N_PENDIENTES_KAME   INTEGER;
+        SELECT ARCHIVO_ORIGEN FROM estados_cuenta WHERE N_TRANSACCIONES IS NULL;
+        """
+    )
+    _refrescar_contadores(cur, [r[0] for r in cur.fetchall()])
+
+
+def _v4_resumen_mensual(cur) -> None:
+    cur.execute("SELECT to_regclass('resumen_mensual') IS NULL;")
+    nuevo = cur.fetchone()[0]
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS resumen_mensual (
+            ORIGEN          TEXT NOT NULL,
+            TITULAR_NOMBRE  TEXT NOT NULL,
+            MES             DATE NOT NULL,      -- first day of month; -infinity if undated
+            TIPO_GASTO      TEXT NOT NULL,
+            SIGNO           SMALLINT NOT NULL,  -- sign(MONTO_TOTAL): 1 expense, -1 payment
+            N               INTEGER NOT NULL DEFAULT 0,
+            MONTO_TOTAL     NUMERIC NOT NULL DEFAULT 0,
+            MONTO_OPERACION NUMERIC NOT NULL DEFAULT 0,
+            MONTO_CLP       NUMERIC NOT NULL DEFAULT 0,
+            N_CONCILIADO    INTEGER NOT NULL DEFAULT 0,
+            N_KAME          INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (ORIGEN, TITULAR_NOMBRE, MES, TIPO_GASTO, SIGNO)
+        );
+        """
+    )
+    if nuevo:
+        cur.execute(f"INSERT INTO resumen_mensual {_RESUMEN_SELECT.format(where='TRUE')};")
+
+
+def _v5_clasificacion_descripcion(cur) -> None:
+    cur.execute("SELECT to_regclass('clasificacion_descripcion') IS NULL;")
+    nueva = cur.fetchone()[0]
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS clasificacion_descripcion (
+            DESCRIPCION TEXT PRIMARY KEY,
+            TIPO_GASTO  TEXT NOT NULL
+        );
+        """
+    )
+    if nueva:
+        _aprender_clasificacion(cur, "TRUE", [])
+
+
+def _v6_match_rid(cur) -> None:
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_ec_match_rid ON estados_cuenta(MATCH_RID);")
+
+
+def _v7_clase(cur) -> None:
+    # CLASE_SQL escapes LIKE's % as %%; the (empty) params make psycopg2
+    # apply that escaping instead of sending %% to the server verbatim.
+    cur.execute(
+        f"""
+        ALTER TABLE transacciones ADD COLUMN IF NOT EXISTS CLASE TEXT;
+        UPDATE transacciones SET CLASE = {CLASE_SQL} WHERE CLASE IS NULL;
+        CREATE INDEX IF NOT EXISTS idx_tx_clase ON transacciones(ORIGEN, CLASE, FECHA_OPERACION_DT);
+        """,
+        (),
+    )
+
+
+def _v8_trgm(cur) -> None:
+    # Optional: without pg_trgm, search falls back to substring scans. The
+    # step still counts as applied (later steps don't depend on it); a
+    # failure is recorded as the _TRGM_PENDIENTE flag row instead.
+    cur.execute("SAVEPOINT trgm;")
+    try:
+        cur.execute(
+            """
+            CREATE EXTENSION IF NOT EXISTS pg_trgm;
+            CREATE INDEX IF NOT EXISTS idx_tx_desc_trgm ON transacciones
+                USING gin (DESCRIPCION gin_trgm_ops);
+            """
+        )
+        cur.execute("RELEASE SAVEPOINT trgm;")
+        cur.execute("DELETE FROM schema_version WHERE version = %s;", (_TRGM_PENDIENTE,))
+    except psycopg2.Error as e:
+        cur.execute("ROLLBACK TO SAVEPOINT trgm;")
+        cur.execute(
+            """
+            INSERT INTO schema_version (version, descripcion) VALUES (%s, 'pg_trgm index pending')
+            ON CONFLICT (version) DO UPDATE SET aplicada = NOW();
+            """,
+            (_TRGM_PENDIENTE,),
+        )
+        _log.warning("pg_trgm unavailable; description search uses substring scans (%s)",
+                     str(e).splitlines()[0])
+
+
+def _v9_clave_natural(cur) -> None:
+    """Natural-key hash for rows loaded before it existed, then the unique index."""
+    cur.execute(
+        """
+        ALTER TABLE transacciones ADD COLUMN IF NOT EXISTS CLAVE_NATURAL TEXT;
+        SELECT id, TITULAR_NOMBRE, FECHA_OPERACION, REF_INTERNACIONAL,
+               DESCRIPCION, MONTO_TOTAL, ARCHIVO_ORIGEN
+        FROM transacciones WHERE CLAVE_NATURAL IS NULL ORDER BY id;
+        """
+    )
+    filas = cur.fetchall()
+    if filas:
+        campos = ("TITULAR_NOMBRE", "FECHA_OPERACION", "REF_INTERNACIONAL",
+                  "DESCRIPCION", "MONTO_TOTAL", "ARCHIVO_ORIGEN")
+        claves = _claves_naturales(dict(zip(campos, f[1:], strict=True)) for f in filas)
+        cur.execute(
+            """
+            UPDATE transacciones t SET CLAVE_NATURAL = u.clave
+            FROM unnest(%s::int[], %s::text[]) AS u(id, clave)
+            WHERE t.id = u.id;
+            """,
+            ([f[0] for f in filas], claves),
+        )
+        _log.info("Back-filled natural keys for %d transacciones", len(filas))
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS uq_tx_clave ON transacciones(CLAVE_NATURAL);")
+
+
+def _v10_version_datos(cur) -> None:
+    """One-row counter bumped by every write the traspaso lists depend on."""
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS version_datos (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            n  BIGINT NOT NULL
+        );
+        INSERT INTO version_datos (id, n) VALUES (1, 0) ON CONFLICT (id) DO NOTHING;
+        """
+    )
+
+
+MIGRACIONES: List[Tuple[int, str, Callable]] = [
+    (1, "base tables", _v1_tablas_base),
+    (2, "DATE columns and date indexes", _v2_fechas),
+    (3, "estados_cuenta counters", _v3_contadores),
+    (4, "resumen_mensual rollup", _v4_resumen_mensual),
+    (5, "clasificacion_descripcion lookup", _v5_clasificacion_descripcion),
+    (6, "estados_cuenta.MATCH_RID index", _v6_match_rid),
+    (7, "transacciones.CLASE kind code", _v7_clase),
+    (8, "pg_trgm description index", _v8_trgm),
+    (9, "transacciones.CLAVE_NATURAL unique key", _v9_clave_natural),
+    (10, "version_datos counter", _v10_version_datos),
+]
+VERSION_ACTUAL = MIGRACIONES[-1][0]
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+_ESTADO_SQL = """
+    SELECT COALESCE(max(version), 0),
+           COALESCE(bool_or(version = %s AND aplicada < NOW() - %s::interval), FALSE)
+    FROM schema_version;
+"""
+
+
+def _estado_esquema(conn) -> Tuple[int, bool]:
+    """(applied version, step 8 degraded and due for a retry) — 0 if never migrated.
+
+    One query on an idle connection; inside an open transaction a failed
+    probe would abort it, so the table is looked up first.
+    """
+    params = (_TRGM_PENDIENTE, _TRGM_REINTENTO)
+    if conn.status != psycopg2.extensions.STATUS_READY:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('schema_version') IS NOT NULL;")
+            if not cur.fetchone()[0]:
+                return 0, False
+            cur.execute(_ESTADO_SQL, params)
+            return cur.fetchone()
+
+    autocommit = conn.autocommit
+    conn.autocommit = True  # no BEGIN/ROLLBACK around the probe
+    try:
+        with conn.cursor() as cur:
+            cur.execute(_ESTADO_SQL, params)
+            return cur.fetchone()
+    except psycopg2.errors.UndefinedTable:
+        return 0, False
+    finally:
+        conn.autocommit = autocommit
+
+
+def version_esquema(conn) -> int:
+    """Applied schema version (0 on a database never migrated)."""
+    return _estado_esquema(conn)[0]
+
+
+def reintentar_trgm(conn) -> bool:
+    """Re-run the optional step 8; True if the trigram index now exists.
+
+    Clears the degraded flag on success and refreshes its timestamp otherwise.
+    """
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(%s);", (_LOCK_ID,))
+            _v8_trgm(cur)
+            cur.execute("SELECT to_regclass('idx_tx_desc_trgm') IS NOT NULL;")
+            creado = cur.fetchone()[0]
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    if creado:
+        _log.info("pg_trgm available: description trigram index in place")
+        _TRGM.clear()  # search picks the fuzzy path up without a restart
+    return creado
+
+
+def migrar(conn) -> int:
+    """Bring the schema up to VERSION_ACTUAL; returns the number of steps applied.
+
+    When step 8 ran without pg_trgm, its index is retried at most once per
+    _TRGM_REINTENTO here; reintentar_trgm() forces it.
+    """
+    version, reintentar = _estado_esquema(conn)
+    if version >= VERSION_ACTUAL:
+        # reintentar_trgm commits: never inside the caller's transaction
+        if reintentar and conn.status == psycopg2.extensions.STATUS_READY:
+            reintentar_trgm(conn)
+        return 0
+
+    aplicadas = 0
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(%s);", (_LOCK_ID,))
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version     INTEGER PRIMARY KEY,
+                    descripcion TEXT NOT NULL,
+                    aplicada    TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                );
+                SELECT COALESCE(max(version), 0) FROM schema_version;
+                """
+            )
+            actual = cur.fetchone()[0]  # another instance may have migrated meanwhile
+            for version, descripcion, paso in MIGRACIONES:
+                if version <= actual:
+                    continue
+                _log.info("Applying schema migration %d: %s", version, descripcion)
+                paso(cur)
+                cur.execute(
+                    "INSERT INTO schema_version (version, descripcion) VALUES (%s, %s);",
+                    (version, descripcion),
+                )
+                aplicadas += 1
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return aplicadas
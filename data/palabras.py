@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, List
+
+# ============================================================
+# Word-position extraction engine (opt-in: CARTOLAS_MOTOR=palabras).
+# Each page is read once as positioned words, grouped into visual
+# lines; extractors then parse only the lines inside the
+# transaction table (from its section anchor on) and split
+# columns by the x position of the table's header words instead
+# of token heuristics. A page whose layout isn't recognised is
+# parsed by the text engine from the same lines.
+# ============================================================
+
+TEXTO = "texto"
+PALABRAS = "palabras"
+MOTORES = (TEXTO, PALABRAS)
+
+Palabra = Dict[str, Any]
+
+# Max vertical gap (pt) between consecutive words of one line — same
+# clustering as pdfplumber's extract_text (y_tolerance=3).
+TOLERANCIA_Y = 3.0
+
+
+def motor_extraccion() -> str:
+    """Engine from CARTOLAS_MOTOR ('texto' or 'palabras'), 'texto' by default."""
+    motor = os.environ.get("CARTOLAS_MOTOR", "").strip().lower()
+    return motor if motor in MOTORES else TEXTO
+
+
+def palabras_pagina(page) -> List[Palabra]:
+    """Positioned words of a page; releases the page's cached objects."""
+    words = page.extract_words()
+    page.close()
+    return words
+
+
+def lineas(words: List[Palabra], tolerancia: float = TOLERANCIA_Y) -> List[List[Palabra]]:
+    """Group words into lines top to bottom, each sorted left to right."""
+    out: List[List[Palabra]] = []
+    ultima = None
+    for w in sorted(words, key=lambda w: (w["top"], w["x0"])):
+        if ultima is None or w["top"] - ultima > tolerancia:
+            out.append([])
+        out[-1].append(w)
+        ultima = w["top"]
+    return [sorted(linea, key=lambda w: w["x0"]) for linea in out]
+
+
+def texto(linea: List[Palabra]) -> str:
+    return " ".join(w["text"] for w in linea)
@@ -0,0 +1,65 @@
+"""Shared fixtures for tests that need a real PostgreSQL server.
+
+Set CARTOLAS_TEST_DB_URL to a server the tests may create databases on, e.g.
+
+    CARTOLAS_TEST_DB_URL=postgresql://postgres:pw@127.0.0.1:5432/postgres?sslmode=disable
+
+Each session gets a throw-away database (migrated by the code under test),
+dropped at the end. Without the variable, database tests are skipped.
+"""
+from __future__ import annotations
+
+import os
+from urllib.parse import urlparse, urlunparse
+
+import pytest
+
+from data.database import _connect
+
+ENV_URL = "CARTOLAS_TEST_DB_URL"
+
+
+@pytest.fixture(scope="session")
+def admin_url() -> str:
+    url = os.environ.get(ENV_URL)
+    if not url:
+        pytest.skip(f"{ENV_URL} not set")
+    return url
+
+
+def _base_temporal(admin_url: str, nombre: str):
+    """Create database `nombre`, yield its URL, drop it afterwards."""
+    admin = _connect(admin_url)
+    admin.autocommit = True
+    with admin.cursor() as cur:
+        cur.execute(f"DROP DATABASE IF EXISTS {nombre};")
+        cur.execute(f"CREATE DATABASE {nombre};")
+    try:
+        yield urlunparse(urlparse(admin_url)._replace(path="/" + nombre))
+    finally:
+        with admin.cursor() as cur:
+            cur.execute(f"DROP DATABASE IF EXISTS {nombre} WITH (FORCE);")
+        admin.close()
+
+
+@pytest.fixture(scope="session")
+def db_url(admin_url):
+    """URL of a fresh, empty database for this test session."""
+    yield from _base_temporal(admin_url, f"cartolas_test_{os.getpid()}")
+
+
+@pytest.fixture
+def db_vacia(admin_url):
+    """URL of an empty database for one test (e.g. to build an old schema)."""
+    yield from _base_temporal(admin_url, f"cartolas_test_{os.getpid()}_vacia")
+
+
+@pytest.fixture
+def admin_conn(admin_url):
+    """Autocommit connection to the admin database (e.g. to kill backends)."""
+    conn = _connect(admin_url)
+    conn.autocommit = True
+    try:
+        yield conn
+    finally:
+        conn.close()
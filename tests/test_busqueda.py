@@ -0,0 +1,163 @@
+"""Description search and the optional pg_trgm index (live PostgreSQL).
+
+The fuzzy tests need a server where pg_trgm can be installed; elsewhere
+they are skipped (or fail, with CARTOLAS_TEST_TRGM set, as in CI) and only
+the substring fallback is exercised.
+"""
+from __future__ import annotations
+
+import logging
+import os
+
+import psycopg2
+import pytest
+
+from data import database
+from data.database import buscar_descripciones, init_db, insertar_transacciones, reset_db
+from data.migraciones import _TRGM_PENDIENTE, migrar, reintentar_trgm
+from tests.test_traspasos import _fila
+
+DESCRIPCIONES = [
+    ("NETFLIX.COM", 3), ("UBER TRIP", 2), ("UBER EATS", 5), ("SPOTIFY AB", 1),
+    ("AMAZON WEB SERVICES", 1),
+]
+
+
+def _indice_trgm(conn) -> bool:
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('idx_tx_desc_trgm') IS NOT NULL;")
+        return cur.fetchone()[0]
+
+
+def _intento_trgm(conn):
+    """Timestamp of the pending-index flag row (None when step 8 succeeded)."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT aplicada FROM schema_version WHERE version = %s;", (_TRGM_PENDIENTE,))
+        row = cur.fetchone()
+    conn.rollback()
+    return row[0] if row else None
+
+
+def _envejecer_intento(conn) -> None:
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO schema_version (version, descripcion, aplicada)
+            VALUES (%s, 'pg_trgm index pending', NOW() - interval '2 days')
+            ON CONFLICT (version) DO UPDATE SET aplicada = EXCLUDED.aplicada;
+            """,
+            (_TRGM_PENDIENTE,),
+        )
+    conn.commit()
+
+
+@pytest.fixture
+def conn(db_url):
+    c = init_db(db_url)
+    reset_db(c)
+    filas = [
+        _fila("INTERNACIONAL", desc, 10.0 + k, "BCI_INT_X", fecha=f"03/{k + 1:02d}/24")
+        for desc, n in DESCRIPCIONES for k in range(n)
+    ]
+    insertar_transacciones(c, filas)
+    database._TRGM.clear()
+    try:
+        yield c
+    finally:
+        c.close()
+
+
+@pytest.fixture
+def trgm(conn):
+    """Skip unless pg_trgm is installed (init_db's migration installs it when available)."""
+    if not database._tiene_trgm(conn):
+        if os.environ.get("CARTOLAS_TEST_TRGM"):
+            pytest.fail("CARTOLAS_TEST_TRGM is set but pg_trgm is not installed")
+        pytest.skip("pg_trgm is not available on this server")
+    return conn
+
+
+@pytest.fixture
+def sin_trgm(conn):
+    """Skip where pg_trgm can be installed (the degraded path can't be reached)."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm');")
+        disponible = cur.fetchone()[0]
+    conn.rollback()
+    if disponible:
+        pytest.skip("pg_trgm is available on this server")
+    return conn
+
+
+def test_substring_hits_rank_by_count(conn):
+    hits = buscar_descripciones(conn, "uber", fuzzy=False)
+    assert [(h["descripcion"], h["n"], h["exacta"]) for h in hits] == [
+        ("UBER EATS", 5, True), ("UBER TRIP", 2, True),
+    ]
+    assert hits[0]["total"] == pytest.approx(sum(10.0 + k for k in range(5)))
+
+
+def test_fuzzy_without_pg_trgm_falls_back_to_substring(conn, monkeypatch):
+    monkeypatch.setitem(database._TRGM, conn.dsn, (False, float("inf")))
+    assert buscar_descripciones(conn, "netflx") == []
+    assert [h["descripcion"] for h in buscar_descripciones(conn, "netflix")] == ["NETFLIX.COM"]
+
+
+def test_fuzzy_finds_typos_below_substring_hits(trgm):
+    assert _indice_trgm(trgm)
+    hits = buscar_descripciones(trgm, "netflx")
+    assert hits and hits[0]["descripcion"] == "NETFLIX.COM"
+    assert not hits[0]["exacta"] and 0 < hits[0]["score"] < 1
+
+    hits = buscar_descripciones(trgm, "uber trp")
+    assert hits[0]["descripcion"] == "UBER TRIP"
+
+    # A substring hit always ranks above fuzzy ones
+    hits = buscar_descripciones(trgm, "spotify")
+    assert hits[0]["descripcion"] == "SPOTIFY AB" and hits[0]["exacta"]
+    assert all(not h["exacta"] for h in hits[1:])
+
+
+def test_fuzzy_respects_limit_and_origen(trgm):
+    assert len(buscar_descripciones(trgm, "uber", limite=1)) == 1
+    assert buscar_descripciones(trgm, "netflx", origen="NACIONAL") == []
+
+
+def test_migrar_rebuilds_missing_trgm_index(trgm):
+    # As if step 8 had run before the extension was available
+    with trgm.cursor() as cur:
+        cur.execute("DROP EXTENSION pg_trgm CASCADE;")
+    trgm.commit()
+    _envejecer_intento(trgm)
+    database._TRGM.clear()
+    assert not database._tiene_trgm(trgm)
+
+    assert migrar(trgm) == 0
+    assert _indice_trgm(trgm)
+    assert _intento_trgm(trgm) is None
+    assert database._tiene_trgm(trgm)   # cache was reset, no restart needed
+    assert buscar_descripciones(trgm, "netflx")[0]["descripcion"] == "NETFLIX.COM"
+
+
+def test_failed_trgm_step_is_retried_only_after_the_interval(sin_trgm, caplog):
+    conn = sin_trgm
+    intento = _intento_trgm(conn)
+    assert intento is not None   # step 8 ran degraded when the database was created
+
+    with caplog.at_level(logging.WARNING, logger="data.migraciones"):
+        assert migrar(conn) == 0
+    assert conn.status == psycopg2.extensions.STATUS_READY   # no transaction left open
+    assert _intento_trgm(conn) == intento and not caplog.records
+
+    _envejecer_intento(conn)
+    with caplog.at_level(logging.WARNING, logger="data.migraciones"):
+        assert migrar(conn) == 0
+    assert _intento_trgm(conn) > intento   # retried once, attempt re-stamped
+    assert len(caplog.records) == 1
+    assert not _indice_trgm(conn)
+
+
+def test_reintentar_trgm_reports_failure(sin_trgm):
+    assert not reintentar_trgm(sin_trgm)
+    assert _intento_trgm(sin_trgm) is not None
+    assert sin_trgm.status == psycopg2.extensions.STATUS_READY
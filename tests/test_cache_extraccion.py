@@ -0,0 +1,41 @@
+"""CacheExtraccion on a temporary directory (no database needed)."""
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from data import cache_extraccion
+from data.cache_extraccion import CacheExtraccion
+from data.extractor_nacional import leer_cartola_nacional
+
+PDF = b"%PDF-1.4 cartola"
+ROWS = [{"DESCRIPCION": "UBER TRIP", "ARCHIVO_ORIGEN": "a.pdf"}]
+META = {"ARCHIVO_ORIGEN": "a.pdf"}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return CacheExtraccion(str(tmp_path))
+
+
+def test_put_then_get_rebinds_the_fallback_file_name(cache):
+    cache.put(PDF, leer_cartola_nacional, "a.pdf", ROWS, META)
+    rows, meta = cache.get(PDF, leer_cartola_nacional, "b.pdf")
+    assert meta["ARCHIVO_ORIGEN"] == "b.pdf" and rows[0]["ARCHIVO_ORIGEN"] == "b.pdf"
+
+
+def test_failed_serialisation_leaves_no_temp_file(cache):
+    with pytest.raises(TypeError):
+        cache.put(PDF, leer_cartola_nacional, "a.pdf", ROWS, {"x": object()})
+    assert os.listdir(cache.directorio) == []
+
+
+def test_failed_replace_leaves_no_temp_file(cache, monkeypatch):
+    def _falla(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(cache_extraccion.os, "replace", _falla)
+    cache.put(PDF, leer_cartola_nacional, "a.pdf", ROWS, META)   # logged, not raised
+    assert os.listdir(cache.directorio) == []
+    assert cache.get(PDF, leer_cartola_nacional, "a.pdf") is None
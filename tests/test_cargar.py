@@ -0,0 +1,60 @@
+"""cargar.py bulk loads against a live PostgreSQL, on synthetic statements."""
+from __future__ import annotations
+
+import pytest
+
+import cargar
+from bench.cartolas_sinteticas import cartola_internacional, cartola_nacional
+from data.database import init_db, reset_db
+
+
+@pytest.fixture
+def conn(db_url):
+    c = init_db(db_url)
+    reset_db(c)
+    try:
+        yield c
+    finally:
+        c.close()
+
+
+@pytest.fixture
+def carpeta(tmp_path):
+    nacional = cartola_nacional(1)
+    (tmp_path / "intl.pdf").write_bytes(cartola_internacional(1))
+    (tmp_path / "nac.pdf").write_bytes(nacional)
+    (tmp_path / "roto.pdf").write_bytes(b"%PDF-1.4 truncado")
+    (tmp_path / "z_copia.pdf").write_bytes(nacional)   # same statement, another name
+    return tmp_path
+
+
+def _stats(s):
+    return s.archivos, s.omitidos, s.errores
+
+
+@pytest.mark.parametrize("por_paginas", [False, True])
+def test_cargar_isolates_bad_files_and_skips_loaded_ones(conn, carpeta, por_paginas):
+    s = cargar.cargar(conn, [str(carpeta)], workers=1, por_paginas=por_paginas)
+    assert _stats(s) == (2, 1, 1)   # z_copia skipped as already loaded, roto fails alone
+    assert s.filas > 0
+
+    # Re-run: processed files are skipped by name before any parsing
+    s = cargar.cargar(conn, [str(carpeta)], workers=1, por_paginas=por_paginas)
+    assert _stats(s) == (0, 3, 1) and s.filas == 0
+
+
+def test_cargar_survives_a_database_error_on_one_statement(conn, carpeta, monkeypatch):
+    guardar = cargar.guardar_extraccion
+
+    def _falla_intl(c, res, *args, **kwargs):
+        if res.nombre == "intl.pdf":
+            with c.cursor() as cur:
+                cur.execute("SELECT 1 / 0;")   # aborts the transaction
+        return guardar(c, res, *args, **kwargs)
+
+    monkeypatch.setattr(cargar, "guardar_extraccion", _falla_intl)
+    s = cargar.cargar(conn, [str(carpeta)], workers=1)
+    assert _stats(s) == (1, 1, 2)   # nac.pdf still stored after the rolled-back failure
+    with conn.cursor() as cur:
+        cur.execute("SELECT nombre FROM archivos_procesados ORDER BY nombre;")
+        assert cur.fetchall() == [("nac.pdf",)]
@@ -0,0 +1,79 @@
+"""Storing statements: whole-document vs page-by-page (live PostgreSQL)."""
+from __future__ import annotations
+
+import pytest
+
+from bench import cartolas_sinteticas as sint
+from data import extractor_internacional, palabras
+from data.database import init_db, reset_db
+from data.deteccion import INTERNACIONAL, NACIONAL
+from data.ingest import ResultadoExtraccion, extractor_para, guardar_extraccion, guardar_por_paginas
+
+
+@pytest.fixture
+def conn(db_url):
+    c = init_db(db_url)
+    reset_db(c)
+    try:
+        yield c
+    finally:
+        c.close()
+
+
+def _guardado(conn):
+    """Everything stored for the statement, ids aside, in natural-key order."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_jsonb(t) - 'id' FROM transacciones t ORDER BY CLAVE_NATURAL;")
+        filas = [r[0] for r in cur.fetchall()]
+        cur.execute("SELECT to_jsonb(e) - 'id' FROM estados_cuenta e;")
+        estados = [r[0] for r in cur.fetchall()]
+    conn.rollback()
+    return filas, estados
+
+
+def _internacional_con_repetida() -> bytes:
+    """Two pages; page 2 reprints page 1's charge with another REF and CIUDAD."""
+    encabezado = sint._fila(sint._COL_INT, "TARJ", "REFERENCIA", "FECHA", "DESCRIPCION",
+                            "CIUDAD", "PAIS", "MONTO ORIGEN", "MONTO US$")
+
+    def cargo(ref, ciudad):
+        return sint._fila(sint._COL_INT, "1234", ref, "05/03/24", "NETFLIX.COM", ciudad, "US",
+                          "10,00", "10,00")
+
+    cabecera = [sint._texto(t) for t in (
+        "ESTADO DE CUENTA INTERNACIONAL DE TARJETA DE CREDITO",
+        f"NOMBRE DEL TITULAR {sint.TITULAR} N° DE TARJETA XXXX XXXX XXXX 1234",
+        f"FECHA ESTADO DE CUENTA {sint.FECHA_ESTADO}",
+        "DEUDA TOTAL US$ 10,00",
+        "2. INFORMACION DE TRANSACCIONES",
+    )]
+    return sint._pdf([
+        cabecera + [encabezado, cargo("1111111111111", "SEATTLE")],
+        [encabezado, cargo("2222222222222", "BOSTON")],
+    ])
+
+
+@pytest.mark.parametrize("motor", palabras.MOTORES)
+@pytest.mark.parametrize("origen", [NACIONAL, INTERNACIONAL])
+def test_por_paginas_stores_what_guardar_extraccion_stores(conn, monkeypatch, origen, motor):
+    monkeypatch.setenv("CARTOLAS_MOTOR", motor)
+    pdf = sint.GENERADORES[origen](3)   # international: rows reprinted across pages
+    rows, meta = extractor_para(origen)(pdf, filename="c.pdf")
+    entera = guardar_extraccion(conn, ResultadoExtraccion("c.pdf", rows, meta), {})
+    esperado = _guardado(conn)
+
+    reset_db(conn)
+    assert guardar_por_paginas(conn, "c.pdf", origen, pdf, {}, filas_por_lote=25) == entera
+    assert _guardado(conn) == esperado
+    assert entera[0] == len(rows)
+
+
+@pytest.mark.parametrize("motor", palabras.MOTORES)
+def test_international_dedup_keeps_the_first_occurrence(motor):
+    pdf = _internacional_con_repetida()
+    rows, _ = extractor_internacional._leer(pdf, "c.pdf", motor)
+    streamed = [r for _, filas in extractor_internacional.iterar_cartola_internacional(
+        pdf, "c.pdf", motor=motor) for r in filas]
+    assert streamed == rows
+    netflix = [(r["REF_INTERNACIONAL"], r["CIUDAD"]) for r in rows if r["DESCRIPCION"] == "NETFLIX.COM"]
+    assert netflix == [("1111111111111", "SEATTLE")]
@@ -0,0 +1,115 @@
+"""Schema migrations against a live PostgreSQL: upgrading an old database."""
+from __future__ import annotations
+
+import datetime
+import logging
+
+import psycopg2
+import psycopg2.extras
+import pytest
+
+from data import migraciones
+from data.clases import clase_transaccion
+from data.database import _connect, insertar_transacciones, verificar_resumen
+from data.migraciones import VERSION_ACTUAL, migrar, version_esquema
+
+# (ORIGEN, DESCRIPCION, MONTO_TOTAL, TIPO_GASTO, ARCHIVO_ORIGEN) as a v1 app stored them
+FILAS_V1 = [
+    ("NACIONAL", "TRASPASO DEUDA INTERNACIONAL", 95000.0, "", "BCI_NAC_X"),
+    ("INTERNACIONAL", "AMAZON", 10.0, "Software", "BCI_INT_X"),
+    ("INTERNACIONAL", "AMAZON", 10.0, "Software", "BCI_INT_X"),   # same-day repeat
+    ("INTERNACIONAL", "PAGO PESOS TEF", -50.0, "", "BCI_INT_X"),
+]
+
+
+def _filas(conn, sql):
+    with conn.cursor() as cur:
+        cur.execute(sql)
+        return cur.fetchall()
+
+
+@pytest.fixture
+def conn_v1(db_vacia, monkeypatch):
+    """A database migrated to step 1 only, holding rows written by that schema."""
+    monkeypatch.setattr(migraciones, "MIGRACIONES", migraciones.MIGRACIONES[:1])
+    monkeypatch.setattr(migraciones, "VERSION_ACTUAL", 1)
+    conn = _connect(db_vacia)
+    assert migrar(conn) == 1
+    monkeypatch.undo()
+
+    with conn.cursor() as cur:
+        for origen, desc, monto, tipo, archivo in FILAS_V1:
+            cur.execute(
+                """
+                INSERT INTO transacciones (ORIGEN, TITULAR_NOMBRE, FECHA_OPERACION, DESCRIPCION,
+                    MONTO_OPERACION, MONTO_TOTAL, MONEDA, TIPO_GASTO, ARCHIVO_ORIGEN)
+                VALUES (%s, 'Juan', '03/05/24', %s, %s, %s, 'USD', %s, %s);
+                """,
+                (origen, desc, monto, monto, tipo, archivo),
+            )
+        cur.execute(
+            """
+            INSERT INTO estados_cuenta (ORIGEN, TITULAR_NOMBRE, ARCHIVO_ORIGEN, FECHA_ESTADO,
+                DEUDA_TOTAL, MONEDA)
+            VALUES ('INTERNACIONAL', 'Juan', 'BCI_INT_X', '15-05-2024', -30.0, 'USD');
+            """
+        )
+    conn.commit()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def test_upgrade_from_v1_backfills_every_step(conn_v1):
+    conn = conn_v1
+    assert version_esquema(conn) == 1
+    assert migrar(conn) == VERSION_ACTUAL - 1
+    assert version_esquema(conn) == VERSION_ACTUAL
+    assert migrar(conn) == 0
+
+    filas = _filas(conn, "SELECT DESCRIPCION, MONTO_TOTAL, CLASE, FECHA_OPERACION_DT, CLAVE_NATURAL "
+                         "FROM transacciones ORDER BY id")
+    assert [f[2] for f in filas] == [clase_transaccion(f[0], f[1]) for f in filas]
+    assert {f[3] for f in filas} == {datetime.date(2024, 3, 5)}
+    assert len({f[4] for f in filas}) == len(FILAS_V1)   # repeats kept apart by the ordinal
+
+    assert _filas(conn, "SELECT FECHA_ESTADO_DT, N_TRANSACCIONES FROM estados_cuenta") == [
+        (datetime.date(2024, 5, 15), 3),
+    ]
+    assert _filas(conn, "SELECT DESCRIPCION, TIPO_GASTO FROM clasificacion_descripcion") == [
+        ("AMAZON", "Software"),
+    ]
+    assert verificar_resumen(conn) == []
+
+    # Back-filled keys match what ingest computes: re-loading the rows is a no-op
+    cols = ("ORIGEN", "DESCRIPCION", "MONTO_TOTAL", "TIPO_GASTO", "ARCHIVO_ORIGEN")
+    rows = [dict(zip(cols, f, strict=True), TITULAR_NOMBRE="Juan", FECHA_OPERACION="03/05/24",
+                 MONTO_OPERACION=f[2], MONEDA="USD", CLASE=clase_transaccion(f[1], f[2]))
+            for f in FILAS_V1]
+    assert insertar_transacciones(conn, [r for r in rows if r["ARCHIVO_ORIGEN"] == "BCI_INT_X"]) == (0, 3)
+
+
+def test_up_to_date_connect_is_one_query(db_url):
+    conn = _connect(db_url)
+    migrar(conn)   # current, and any due pg_trgm retry already done
+    conn.close()
+
+    consultas = []
+
+    class _Registro(logging.Handler):
+        def emit(self, record):
+            consultas.append(record.getMessage())
+
+    logger = logging.getLogger("tests.consultas")
+    logger.setLevel(logging.DEBUG)
+    handler = _Registro()
+    logger.addHandler(handler)
+    conn = psycopg2.connect(db_url, connection_factory=psycopg2.extras.LoggingConnection)
+    try:
+        conn.initialize(logger)
+        assert migrar(conn) == 0
+    finally:
+        conn.close()
+        logger.removeHandler(handler)
+    assert len(consultas) == 1 and "schema_version" in consultas[0]
@@ -0,0 +1,113 @@
+"""ConnectionPool against a live PostgreSQL (see conftest.py)."""
+from __future__ import annotations
+
+import threading
+import time
+
+import psycopg2
+import psycopg2.pool
+import pytest
+
+from data.database import ConnectionPool
+
+
+@pytest.fixture
+def pool(db_url):
+    p = ConnectionPool(db_url, minconn=1, maxconn=2, timeout=0.5)
+    try:
+        yield p
+    finally:
+        p.closeall()
+
+
+def _pid(conn) -> int:
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_backend_pid();")
+        return cur.fetchone()[0]
+
+
+def test_checkout_times_out_at_maxconn(pool):
+    a, b = pool.getconn(), pool.getconn()
+    t0 = time.monotonic()
+    with pytest.raises(psycopg2.pool.PoolError, match="exhausted"):
+        pool.getconn()
+    assert time.monotonic() - t0 >= pool.timeout
+    pool.putconn(a)
+    pool.putconn(b)
+
+
+def test_checkout_blocks_until_putconn(pool):
+    a, b = pool.getconn(), pool.getconn()
+    threading.Timer(0.1, pool.putconn, args=(a,)).start()
+    t0 = time.monotonic()
+    c = pool.getconn()
+    assert 0.05 <= time.monotonic() - t0 < pool.timeout
+    assert c is a   # the returned connection is handed out again, not a new one
+    pool.putconn(b)
+    pool.putconn(c)
+
+
+def test_putconn_returns_connection_for_reuse(pool):
+    conn = pool.getconn()
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1;")   # leaves a transaction open
+    pool.putconn(conn)
+    assert pool._in_use == 0
+    again = pool.getconn()
+    assert again is conn
+    assert again.status == psycopg2.extensions.STATUS_READY   # rolled back on return
+    pool.putconn(again)
+
+
+def test_concurrent_checkouts_never_exceed_maxconn(pool):
+    pool.timeout = 10
+    vistos, maximo, lock = set(), [0], threading.Lock()
+
+    def trabajo():
+        for _ in range(5):
+            with pool.connection() as conn:
+                with lock:
+                    maximo[0] = max(maximo[0], pool._in_use)
+                vistos.add(_pid(conn))
+                time.sleep(0.01)
+
+    hilos = [threading.Thread(target=trabajo) for _ in range(6)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    assert maximo[0] <= pool.maxconn
+    assert len(vistos) <= pool.maxconn
+    assert pool._in_use == 0
+
+
+def test_idle_connections_are_reaped(db_url):
+    pool = ConnectionPool(db_url, minconn=1, maxconn=2, max_idle=0.1)
+    try:
+        viejo = pool.getconn()
+        pool.putconn(viejo)
+        time.sleep(0.2)
+        nuevo = pool.getconn()
+        assert nuevo is not viejo
+        assert viejo.closed
+        pool.putconn(nuevo)
+    finally:
+        pool.closeall()
+
+
+def test_killed_backend_is_discarded_and_replaced(pool, admin_conn):
+    with pool.connection() as conn:
+        muerto = _pid(conn)
+    with admin_conn.cursor() as cur:
+        cur.execute("SELECT pg_terminate_backend(%s);", (muerto,))
+        assert cur.fetchone()[0]
+
+    with pytest.raises(psycopg2.OperationalError):
+        with pool.connection() as conn:
+            assert _pid(conn) == muerto   # same (now dead) connection handed out
+    assert conn.closed
+    assert pool._in_use == 0
+
+    with pool.connection() as conn2:
+        assert conn2 is not conn
+        assert _pid(conn2) != muerto
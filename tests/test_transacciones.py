@@ -0,0 +1,50 @@
+"""Natural-key deduplication of stored transactions (live PostgreSQL)."""
+from __future__ import annotations
+
+import pytest
+
+from data import database
+from data.database import init_db, insertar_transacciones, reset_db
+from tests.test_traspasos import _fila
+
+
+@pytest.fixture
+def conn(db_url):
+    c = init_db(db_url)
+    reset_db(c)
+    try:
+        yield c
+    finally:
+        c.close()
+
+
+def _cartola():
+    return [
+        _fila("INTERNACIONAL", "NETFLIX.COM", 15.99, "BCI_INT_X"),
+        _fila("INTERNACIONAL", "UBER TRIP", 7.5, "BCI_INT_X"),
+        _fila("INTERNACIONAL", "UBER TRIP", 7.5, "BCI_INT_X"),   # same day, same amount
+    ]
+
+
+def _n(conn) -> int:
+    with conn.cursor() as cur:
+        cur.execute("SELECT count(*) FROM transacciones;")
+        return cur.fetchone()[0]
+
+
+@pytest.mark.parametrize("copy", [False, True])
+def test_reingesting_a_statement_inserts_nothing(conn, monkeypatch, copy):
+    monkeypatch.setattr(database, "COPY_THRESHOLD", 1 if copy else 10 ** 6)
+    assert insertar_transacciones(conn, _cartola()) == (3, 0)
+    assert insertar_transacciones(conn, _cartola()) == (0, 3)
+    assert _n(conn) == 3
+
+
+def test_identical_purchases_are_kept_apart_by_their_ordinal(conn):
+    assert insertar_transacciones(conn, _cartola()) == (3, 0)
+    # A later version of the statement prints the purchase a third time
+    assert insertar_transacciones(conn, _cartola() + _cartola()[-1:]) == (1, 3)
+    # The same purchase in another statement is another transaction
+    otra = [dict(r, ARCHIVO_ORIGEN="BCI_INT_Y") for r in _cartola()]
+    assert insertar_transacciones(conn, otra) == (3, 0)
+    assert _n(conn) == 7
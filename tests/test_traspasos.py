@@ -0,0 +1,118 @@
+"""Traspaso marking guards and the shared reconciliation fingerprint (live PostgreSQL)."""
+from __future__ import annotations
+
+import pytest
+
+from data.clases import clase_transaccion
+from data.database import (
+    desmarcar_traspaso,
+    init_db,
+    insertar_transacciones,
+    marcar_traspaso,
+    marcar_traspasos,
+    reset_db,
+    upsert_estado_cuenta,
+    verificar_resumen,
+    version_conciliacion,
+)
+
+
+def _fila(origen, desc, monto, archivo, fecha="03/05/24"):
+    return {
+        "ORIGEN": origen, "TITULAR_NOMBRE": "Juan", "FECHA_OPERACION": fecha,
+        "DESCRIPCION": desc, "CIUDAD": "", "PAIS": "", "REF_INTERNACIONAL": "",
+        "MONTO_ORIGEN": None, "MONTO_OPERACION": monto, "MONTO_TOTAL": monto,
+        "MONEDA": "USD" if origen == "INTERNACIONAL" else "CLP", "TIPO_GASTO": "",
+        "CONCILIADO": 0, "FACT_KAME": 0, "TRASPASADO": 0,
+        "CLASE": clase_transaccion(desc, monto), "ARCHIVO_ORIGEN": archivo,
+    }
+
+
+def _estado(conn, archivo, deuda):
+    insertar_transacciones(conn, [_fila("INTERNACIONAL", "AMAZON", deuda, archivo)])
+    upsert_estado_cuenta(conn, {
+        "ORIGEN": "INTERNACIONAL", "TITULAR_NOMBRE": "Juan", "ARCHIVO_ORIGEN": archivo,
+        "FECHA_ESTADO": "15-03-2024", "DEUDA_TOTAL": deuda, "MONEDA": "USD",
+    })
+    with conn.cursor() as cur:
+        cur.execute("SELECT id FROM estados_cuenta WHERE ARCHIVO_ORIGEN = %s", (archivo,))
+        return cur.fetchone()[0]
+
+
+def _linea_nacional(conn, archivo, clp):
+    insertar_transacciones(conn, [_fila("NACIONAL", "TRASPASO DEUDA INTERNACIONAL", clp, archivo)])
+    with conn.cursor() as cur:
+        cur.execute("SELECT max(id) FROM transacciones WHERE ARCHIVO_ORIGEN = %s", (archivo,))
+        return cur.fetchone()[0]
+
+
+@pytest.fixture
+def conn(db_url):
+    c = init_db(db_url)
+    reset_db(c)
+    try:
+        yield c
+    finally:
+        c.close()
+
+
+def test_marcar_traspasos_skips_lines_and_statements_already_matched(conn):
+    a = _estado(conn, "BCI_INT_A", 100.0)
+    b = _estado(conn, "BCI_INT_B", 100.0)
+    c = _estado(conn, "BCI_INT_C", 50.0)
+    l1 = _linea_nacional(conn, "BCI_NAC_1", 95000)
+    l2 = _linea_nacional(conn, "BCI_NAC_2", 47000)
+
+    # One line proposed for two statements in the same batch: the first wins
+    aplicados, conflictos = marcar_traspasos(conn, [(a, l1, "BCI_NAC_1"), (b, l1, "BCI_NAC_1")])
+    assert (aplicados, conflictos) == (1, [(b, l1)])
+
+    # Stale proposals: the line is already matched, the statement already traspasado
+    assert not marcar_traspaso(conn, c, l1, "BCI_NAC_1")
+    assert not marcar_traspaso(conn, a, l2, "BCI_NAC_2")
+    with conn.cursor() as cur:
+        cur.execute("SELECT id, TRASPASO_ESTADO, MATCH_RID FROM estados_cuenta ORDER BY id")
+        assert cur.fetchall() == [(a, "TRASPASADO", l1), (b, "PENDIENTE", None), (c, "PENDIENTE", None)]
+
+    assert marcar_traspaso(conn, c, l2, "BCI_NAC_2")
+    assert verificar_resumen(conn) == []
+
+
+def test_marcar_traspasos_counts_only_statements_it_updated(conn):
+    a = _estado(conn, "BCI_INT_A", 100.0)
+    b = _estado(conn, "BCI_INT_B", 50.0)
+    l1 = _linea_nacional(conn, "BCI_NAC_1", 95000)
+    l2 = _linea_nacional(conn, "BCI_NAC_2", 47000)
+
+    # A pair repeated in the batch is applied once and is no conflict
+    assert marcar_traspasos(conn, [(a, l1, "BCI_NAC_1"), (a, l1, "BCI_NAC_1")]) == (1, [])
+    # Already in place: nothing updated, nothing to report
+    assert marcar_traspasos(conn, [(a, l1, "BCI_NAC_1"), (b, l2, "BCI_NAC_2")]) == (1, [])
+    assert marcar_traspasos(conn, [(b, l2, "BCI_NAC_2")]) == (0, [])
+    assert not marcar_traspaso(conn, b, l2, "BCI_NAC_2")
+
+
+def test_version_conciliacion_tracks_every_relevant_change(conn):
+    vistas = [version_conciliacion(conn)]
+
+    def cambia():
+        v = version_conciliacion(conn)
+        assert v > vistas[-1]
+        vistas.append(v)
+
+    a = _estado(conn, "BCI_INT_A", 100.0)
+    cambia()
+    l1 = _linea_nacional(conn, "BCI_NAC_1", 95000)
+    cambia()
+    assert version_conciliacion(conn) == vistas[-1]   # stable while nothing changes
+
+    # Re-loading what is already stored writes nothing
+    _estado(conn, "BCI_INT_A", 100.0)
+    assert version_conciliacion(conn) == vistas[-1]
+
+    marcar_traspaso(conn, a, l1, "BCI_NAC_1")
+    cambia()
+    desmarcar_traspaso(conn, a)
+    cambia()
+    reset_db(conn)
+    cambia()   # never back to an earlier value, so old cache entries can't be hit